@@ -138,6 +138,9 @@ class BrainSimApp:
     def new_project(self) -> None:
         """Clear network, UKS and modules creating a fresh project."""
         self.network = Network()
+        # stop the old scheduler and TTL threads before dropping their store
+        self.module_handler.shutdown()
+        self.uks.shutdown()
         ThingLabels.clear_label_list()
         self.module_handler = ModuleHandler()
         self.uks = self.module_handler.the_uks
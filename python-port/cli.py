@@ -23,6 +23,10 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("project", nargs="?", help="Project file to load")
     parser.add_argument("--ticks", type=int, default=0,
                         help="Number of simulation ticks to run before exiting")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print per-module timing and resource statistics on exit")
+    parser.add_argument("--stats-sample", type=int, default=10, metavar="N",
+                        help="Measure allocations on every Nth call of a module (0 disables)")
     args = parser.parse_args(argv)
 
     handler = ModuleHandler()
@@ -34,12 +38,18 @@ def main(argv: list[str] | None = None) -> int:
     else:
         ThingLabels.clear_label_list()
 
+    if args.stats:
+        handler.enable_stats(args.stats_sample)
+
     for _ in range(args.ticks):
         handler.fire_modules()
         network.step()
 
     network.stop()
+    handler.shutdown()
     handler.reset_all()
+    if args.stats:
+        print(handler.instrumentation.report())
     return 0
 
 
@@ -1,7 +1,10 @@
 """Module framework for BrainSimIII Python port."""
-from .module_base import ModuleBase
+from .module_base import ALL_RESOURCES, ModuleBase
 from .module_description import ModuleDescription
-from .module_handler import ModuleHandler
+from .module_handler import ModuleHandler, step_dependencies
+from .agent_pass import AgentPass, AgentVisitor, PassContext
+from .scheduler import AgentScheduler, ScheduledJob
+from .instrumentation import LatencyHistogram, ModuleInstrumentation, ModuleStats
 from .module_uks import ModuleUKS
 from .module_add_counts import ModuleAddCounts
 from .module_balance_tree import ModuleBalanceTree
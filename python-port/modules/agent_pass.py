@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+"""Single-traversal passes shared by the UKS agent modules.
+
+The attribute bubbler, count adder, redundancy remover, class creator and
+tree balancer each used to copy ``UKSList`` and walk the whole store on their
+own, recomputing ``Children``, ``Parents`` and ancestor lists as they went.
+They now implement :class:`AgentVisitor`, and an :class:`AgentPass` visits
+every Thing once, parents before children, calling each registered visitor
+in turn with a shared :class:`PassContext`.  A visitor that only needs some
+Things says so through :meth:`AgentVisitor.scope`; when every visitor of a
+pass does, only those Things and their ancestors are visited, and an idle
+pass visits nothing.
+
+:class:`PassContext` caches per-Thing structure for the duration of the pass
+(children, parents, ancestors, child relationships grouped by reltype and
+target, inherited relationships).  Ancestors are also available as arrays of
+small integer ids, a columnar view that lets visitors count them with
+``numpy.unique``.  Visitors change the store as they go, so
+the context listens to the UKS events and drops the entries a change makes
+stale.
+"""
+
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+try:  # optional vectorised ancestor counting
+    import numpy as np  # type: ignore
+    _HAVE_NUMPY = True
+except Exception:  # pragma: no cover - optional dependency
+    _HAVE_NUMPY = False
+
+from uks import UKS, Relationship, Thing
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .instrumentation import ModuleInstrumentation
+
+Group = Tuple[Thing, Optional[Thing]]
+
+
+class PassContext:
+    """Per-Thing structure shared by the visitors of one :class:`AgentPass`."""
+
+    def __init__(self, uks: UKS) -> None:
+        self.uks = uks
+        self._children: Dict[Thing, List[Thing]] = {}
+        self._parents: Dict[Thing, List[Thing]] = {}
+        self._ancestors: Dict[Thing, List[Thing]] = {}
+        self._ancestor_labels: Dict[Thing, FrozenSet[str]] = {}
+        self._grouped: Dict[Thing, Dict[Group, List[Relationship]]] = {}
+        self._inherited: Dict[Thing, List[Relationship]] = {}
+        # dense ids for Things, used by ancestor_ids()
+        self._ids: Dict[Thing, int] = {}
+        self._things: List[Thing] = []
+        self._ancestor_ids: Dict[Thing, Sequence[int]] = {}
+
+    # ------------------------------------------------------------------
+    # Cached structure
+    # ------------------------------------------------------------------
+    def children(self, t: Thing) -> List[Thing]:
+        found = self._children.get(t)
+        if found is None:
+            found = self._children[t] = t.Children
+        return found
+
+    def parents(self, t: Thing) -> List[Thing]:
+        found = self._parents.get(t)
+        if found is None:
+            found = self._parents[t] = t.Parents
+        return found
+
+    def ancestors(self, t: Thing) -> List[Thing]:
+        """Return ``t.AncestorList()``, computed once per pass."""
+        found = self._ancestors.get(t)
+        if found is None:
+            found = self._ancestors[t] = t.AncestorList()
+        return found
+
+    def thing_id(self, t: Thing) -> int:
+        """Dense id of *t*, valid for this pass."""
+        i = self._ids.get(t)
+        if i is None:
+            i = self._ids[t] = len(self._things)
+            self._things.append(t)
+        return i
+
+    def thing(self, i: int) -> Thing:
+        return self._things[i]
+
+    def ancestor_ids(self, t: Thing) -> Sequence[int]:
+        """Ids of *t*'s ancestors, a NumPy array when NumPy is installed."""
+        found = self._ancestor_ids.get(t)
+        if found is None:
+            ids = [self.thing_id(a) for a in self.ancestors(t)]
+            found = np.array(ids, dtype=np.int64) if _HAVE_NUMPY else tuple(ids)
+            self._ancestor_ids[t] = found
+        return found
+
+    def has_ancestor(self, t: Thing, label: str) -> bool:
+        labels = self._ancestor_labels.get(t)
+        if labels is None:
+            labels = self._ancestor_labels[t] = frozenset(a.Label for a in self.ancestors(t))
+        return label in labels
+
+    def grouped(self, t: Thing) -> Dict[Group, List[Relationship]]:
+        """Relationships of *t*'s children by ``(reltype, target)``.
+
+        ``has-child`` links are left out; groups keep first-seen order.
+        """
+
+        found = self._grouped.get(t)
+        if found is None:
+            found = {}
+            for child in self.children(t):
+                for r in child.relationships:
+                    if r.reltype.Label == "has-child":
+                        continue
+                    found.setdefault((r.reltype, r.target), []).append(r)
+            self._grouped[t] = found
+        return found
+
+    def inherited(self, t: Thing) -> List[Relationship]:
+        """Relationships of *t* and its ancestors, see ``UKS.get_all_relationships``."""
+        found = self._inherited.get(t)
+        if found is None:
+            found = self._inherited[t] = self.uks.get_all_relationships([t], False)
+        return found
+
+    # ------------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------------
+    def attach(self) -> None:
+        for event in ("add", "remove"):
+            self.uks.on(event, self._on_changed)
+
+    def detach(self) -> None:
+        for event in ("add", "remove"):
+            self.uks.off(event, self._on_changed)
+
+    def _on_changed(self, rel: Relationship) -> None:
+        # inherited lists hold relationship objects, any add or remove
+        # anywhere above a Thing can change them
+        self._inherited.clear()
+        if rel.reltype.Label == "has-child":
+            parent, child = rel.source, rel.target
+            self._children.pop(parent, None)
+            self._grouped.pop(parent, None)
+            self._parents.pop(child, None)
+            if child is not None:
+                self._forget_ancestors(child)
+        else:
+            for parent in self._parents.get(rel.source) or rel.source.Parents:
+                self._grouped.pop(parent, None)
+
+    def _forget_ancestors(self, t: Thing) -> None:
+        # everything below *t* has new ancestors
+        if not self._ancestors:
+            return
+        stack = [t]
+        seen = {id(t)}
+        while stack:
+            t = stack.pop()
+            self._ancestors.pop(t, None)
+            self._ancestor_labels.pop(t, None)
+            self._ancestor_ids.pop(t, None)
+            for c in t.Children:
+                if id(c) not in seen:
+                    seen.add(id(c))
+                    stack.append(c)
+
+
+class AgentVisitor:
+    """Mixin for modules that do their work one Thing at a time.
+
+    ``begin_pass`` and ``end_pass`` bracket a traversal and ``visit`` is
+    called for each Thing in between.  :meth:`run_pass` runs a traversal with
+    this visitor alone, which is what the modules' ``do_the_work`` uses; the
+    :class:`~modules.module_handler.ModuleHandler` instead runs the agents
+    that are due together in one :class:`AgentPass`.
+    """
+
+    the_uks: Optional[UKS]
+
+    def begin_pass(self, ctx: PassContext) -> None:
+        pass
+
+    def scope(self, ctx: PassContext) -> Optional[Iterable[Thing]]:
+        """Things this pass needs to visit, or ``None`` for the whole store.
+
+        Called after ``begin_pass``.
+        """
+        return None
+
+    def visit(self, t: Thing, ctx: PassContext) -> None:  # pragma: no cover - to be overridden
+        raise NotImplementedError
+
+    def end_pass(self, ctx: PassContext) -> None:
+        pass
+
+    def run_pass(self) -> Optional[AgentPass]:
+        if self.the_uks is None:
+            return None
+        agent_pass = AgentPass(self.the_uks, [self])
+        agent_pass.run()
+        return agent_pass
+
+
+def topological_order(things: Iterable[Thing], parents=lambda t: t.Parents) -> List[Thing]:
+    """Order *things* so every Thing follows its parents.
+
+    Things keep their relative order where the hierarchy allows it; parents
+    outside *things* are included, and a cycle is broken where it is found.
+    """
+
+    order: List[Thing] = []
+    seen: set = set()
+    for t in things:
+        if id(t) in seen:
+            continue
+        seen.add(id(t))
+        stack = [(t, iter(parents(t)))]
+        while stack:
+            node, pending = stack[-1]
+            for p in pending:
+                if id(p) not in seen:
+                    seen.add(id(p))
+                    stack.append((p, iter(parents(p))))
+                    break
+            else:
+                stack.pop()
+                order.append(node)
+    return order
+
+
+class _VisitorTimer:
+    """Each visitor's time, mutations and allocations over one pass."""
+
+    def __init__(self, instrumentation: "ModuleInstrumentation", visitors: Sequence[AgentVisitor]) -> None:
+        self.instrumentation = instrumentation
+        self.stats = [instrumentation.stats_for(getattr(v, "label", type(v).__name__), "work") for v in visitors]
+        self.seconds = [0.0] * len(visitors)
+        self.failed = [False] * len(visitors)
+        # allocations are measured when the pass itself is sampled; the peak
+        # is the largest net growth of one call
+        self.tracing = tracemalloc.is_tracing()
+        self.alloc = [0] * len(visitors)
+        self.peak = [0] * len(visitors)
+
+    def wrap(self, i: int, func: Callable[..., Any]) -> Callable[..., Any]:
+        stats = self.stats[i]
+        attribute = self.instrumentation.attribute
+        tracing = self.tracing
+
+        def timed(*args: Any) -> Any:
+            outer = attribute(stats)
+            before = tracemalloc.get_traced_memory()[0] if tracing else 0
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            except BaseException:
+                self.failed[i] = True
+                raise
+            finally:
+                self.seconds[i] += time.perf_counter() - start
+                if tracing:
+                    grown = tracemalloc.get_traced_memory()[0] - before
+                    self.alloc[i] += grown
+                    self.peak[i] = max(self.peak[i], grown)
+                attribute(outer)
+
+        return timed
+
+    def record(self) -> None:
+        for i, stats in enumerate(self.stats):
+            alloc = (self.alloc[i], self.peak[i]) if self.tracing else None
+            self.instrumentation.record(stats, self.seconds[i], self.failed[i], alloc)
+
+
+class AgentPass:
+    """Visit every Thing in the store once for several visitors.
+
+    With an enabled *instrumentation*, each visitor's share of a run is
+    recorded as one ``"work"`` call of that module.
+    """
+
+    def __init__(
+        self,
+        uks: UKS,
+        visitors: Sequence[AgentVisitor] = (),
+        instrumentation: Optional["ModuleInstrumentation"] = None,
+    ) -> None:
+        self.uks = uks
+        self.visitors: List[AgentVisitor] = list(visitors)
+        self.instrumentation = instrumentation
+        # Things visited by the last run
+        self.visited = 0
+
+    def register(self, visitor: AgentVisitor) -> None:
+        if visitor not in self.visitors:
+            self.visitors.append(visitor)
+
+    def unregister(self, visitor: AgentVisitor) -> None:
+        if visitor in self.visitors:
+            self.visitors.remove(visitor)
+
+    def run(self) -> PassContext:
+        """Run one traversal and return the context it used.
+
+        Things created during the pass are not visited until the next one.
+        Unless a visitor wants the whole store, only the union of the
+        visitors' scopes is visited, with its ancestors.
+        """
+
+        ctx = PassContext(self.uks)
+        visitors = list(self.visitors)
+        begin = [v.begin_pass for v in visitors]
+        visit = [v.visit for v in visitors]
+        end = [v.end_pass for v in visitors]
+        timer = None
+        if self.instrumentation is not None and self.instrumentation.enabled:
+            timer = _VisitorTimer(self.instrumentation, visitors)
+            begin, visit, end = ([timer.wrap(i, f) for i, f in enumerate(calls)] for calls in (begin, visit, end))
+        ctx.attach()
+        try:
+            for f in begin:
+                f(ctx)
+            scopes = [v.scope(ctx) for v in visitors]
+            if any(s is None for s in scopes):
+                things = list(self.uks.UKSList)
+            else:
+                things = list({id(t): t for s in scopes for t in s}.values())
+            order = topological_order(things, ctx.parents)
+            for t in order:
+                for f in visit:
+                    f(t, ctx)
+            for f in end:
+                f(ctx)
+        finally:
+            ctx.detach()
+            if timer is not None:
+                timer.record()
+        self.visited = len(order)
+        return ctx
+
+
+__all__ = ["AgentPass", "AgentVisitor", "PassContext", "topological_order"]
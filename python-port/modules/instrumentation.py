@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+"""Per-module timing and resource statistics.
+
+:class:`ModuleInstrumentation` is owned by the
+:class:`~modules.module_handler.ModuleHandler` and wraps each module step
+(``pre_step``/``fire``/``post_step``) and each background ``do_the_work``
+run.  For every module and kind of call it records a call count, a latency
+histogram, the errors raised, and the UKS relationships added, removed or
+updated while the call ran.  Mutations are attributed through a thread-local
+"current call", so concurrent steps and background passes are counted
+separately; changes to any other UKS are ignored.
+
+Allocations are sampled: every ``sample_every``-th call of a module is run
+with :mod:`tracemalloc` tracing, which is otherwise left off.  Only one call
+is sampled at a time, and allocations made by other threads during that call
+are included, so the figures are indicative rather than exact.
+
+Agent modules run together in one :class:`~modules.agent_pass.AgentPass`.
+The pass as a whole is timed under ``"AgentPass"``, and each visitor's share
+of it (its time, the mutations it made and, in sampled passes, its
+allocations) as one ``"work"`` call of that module.  Mutations are charged
+only to the visitor that made them.
+
+When instrumentation is disabled the handler calls modules directly and the
+only cost is one attribute check per call.
+"""
+
+import bisect
+import math
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from uks import UKS, Relationship
+from uks.thing import owner_of
+
+# upper bounds of the latency buckets: 10µs doubling up to about 42 seconds
+BUCKET_BOUNDS: Tuple[float, ...] = tuple(1e-5 * 2 ** k for k in range(23))
+
+_EVENTS = ("add", "remove", "update")
+
+
+class LatencyHistogram:
+    """Latencies bucketed on a log2 scale."""
+
+    def __init__(self) -> None:
+        # the last bucket holds latencies above BUCKET_BOUNDS[-1]
+        self.buckets: List[int] = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the *q*-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100.0))
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max  # pragma: no cover - counts always add up
+
+    def copy(self) -> "LatencyHistogram":
+        other = LatencyHistogram()
+        other.buckets = list(self.buckets)
+        other.count, other.total, other.max = self.count, self.total, self.max
+        return other
+
+
+@dataclass
+class ModuleStats:
+    """Statistics for one module and kind of call (``"step"`` or ``"work"``)."""
+
+    module: str
+    kind: str
+    calls: int = 0
+    errors: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    # UKS relationships added, removed or updated during the calls
+    mutations: int = 0
+    # sampled calls and the net bytes they left allocated, and the largest
+    # peak seen in one of them
+    alloc_samples: int = 0
+    alloc_bytes: int = 0
+    alloc_peak: int = 0
+
+    @property
+    def alloc_per_call(self) -> float:
+        return self.alloc_bytes / self.alloc_samples if self.alloc_samples else 0.0
+
+    def copy(self) -> "ModuleStats":
+        other = ModuleStats(self.module, self.kind)
+        other.__dict__.update(self.__dict__)
+        other.latency = self.latency.copy()
+        return other
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "module": self.module,
+            "kind": self.kind,
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_seconds": self.latency.total,
+            "mean_seconds": self.latency.mean,
+            "p50_seconds": self.latency.percentile(50),
+            "p95_seconds": self.latency.percentile(95),
+            "max_seconds": self.latency.max,
+            "histogram": list(self.latency.buckets),
+            "mutations": self.mutations,
+            "alloc_samples": self.alloc_samples,
+            "alloc_bytes_per_call": self.alloc_per_call,
+            "alloc_peak": self.alloc_peak,
+        }
+
+
+class ModuleInstrumentation:
+    """Collect :class:`ModuleStats` for the calls a handler makes."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.sample_every = 0
+        self._uks: Optional[UKS] = None
+        self._stats: Dict[Tuple[str, str], ModuleStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sampling = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Switching on and off
+    # ------------------------------------------------------------------
+    def enable(self, uks: Optional[UKS] = None, sample_every: int = 10) -> None:
+        """Start recording; *sample_every* of ``0`` turns allocation sampling off."""
+        self.disable()
+        self.sample_every = sample_every
+        self._uks = uks
+        if uks is not None:
+            for event in _EVENTS:
+                uks.on(event, self._on_mutation)
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Stop recording; statistics gathered so far are kept."""
+        self.enabled = False
+        if self._uks is not None:
+            for event in _EVENTS:
+                self._uks.off(event, self._on_mutation)
+            self._uks = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def stats_for(self, module: str, kind: str) -> ModuleStats:
+        """The live :class:`ModuleStats` of *module* and *kind*."""
+        key = (module, kind)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = ModuleStats(module, kind)
+            return stats
+
+    def attribute(self, stats: Optional[ModuleStats]) -> Optional[ModuleStats]:
+        """Charge this thread's UKS mutations to *stats*; returns the previous target."""
+        outer = getattr(self._local, "current", None)
+        self._local.current = stats
+        return outer
+
+    def record(
+        self,
+        stats: ModuleStats,
+        seconds: float,
+        failed: bool = False,
+        alloc: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        """Record one call timed by the caller, e.g. a visitor's share of a pass.
+
+        *alloc* is ``(net bytes, peak bytes)`` when the call was sampled.
+        """
+        with self._lock:
+            stats.calls += 1
+            stats.errors += failed
+            stats.latency.add(seconds)
+            if alloc is not None:
+                stats.alloc_samples += 1
+                stats.alloc_bytes += alloc[0]
+                stats.alloc_peak = max(stats.alloc_peak, alloc[1])
+
+    def call(self, module: str, kind: str, func: Callable[..., Any], *args: Any) -> Any:
+        """Run ``func(*args)`` and record it against *module* and *kind*."""
+        stats = self.stats_for(module, kind)
+        with self._lock:
+            sample = bool(self.sample_every) and stats.calls % self.sample_every == 0
+        # one sampled call at a time, and never one inside another
+        sample = sample and self._sampling.acquire(blocking=False)
+        started_tracing = False
+        if sample:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        outer = self.attribute(stats)
+        failed = False
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.attribute(outer)
+            if sample:
+                current, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                self._sampling.release()
+            with self._lock:
+                stats.calls += 1
+                stats.errors += failed
+                stats.latency.add(elapsed)
+                if sample:
+                    stats.alloc_samples += 1
+                    stats.alloc_bytes += current - before
+                    stats.alloc_peak = max(stats.alloc_peak, peak - before)
+
+    def _on_mutation(self, rel: Relationship) -> None:
+        stats = getattr(self._local, "current", None)
+        # only changes to the instrumented store count against the module
+        if stats is None or owner_of(rel) is not self._uks:
+            return
+        with self._lock:
+            stats.mutations += 1
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def snapshot(self) -> List[ModuleStats]:
+        """Copies of the statistics, most total time first."""
+        with self._lock:
+            stats = [s.copy() for s in self._stats.values()]
+        stats.sort(key=lambda s: s.latency.total, reverse=True)
+        return stats
+
+    def report(self) -> str:
+        """Plain-text table of :meth:`snapshot`."""
+        header = (
+            f"{'module':<32} {'kind':<5} {'calls':>7} {'total ms':>10} {'mean ms':>9} "
+            f"{'p95 ms':>9} {'max ms':>9} {'mutations':>9} {'alloc/call':>11}"
+        )
+        lines = [header, "-" * len(header)]
+        for s in self.snapshot():
+            lat = s.latency
+            alloc = f"{s.alloc_per_call / 1024:.1f} KiB" if s.alloc_samples else "-"
+            lines.append(
+                f"{s.module:<32} {s.kind:<5} {s.calls:>7} {lat.total * 1e3:>10.2f} "
+                f"{lat.mean * 1e3:>9.3f} {lat.percentile(95) * 1e3:>9.3f} {lat.max * 1e3:>9.3f} "
+                f"{s.mutations:>9} {alloc:>11}"
+            )
+        return "\n".join(lines)
+
+
+__all__ = ["BUCKET_BOUNDS", "LatencyHistogram", "ModuleInstrumentation", "ModuleStats"]
@@ -9,21 +9,29 @@ encoded into the relationship type label, mirroring the behaviour of the
 original module which stored the count as a relationship type property.
 """
 
-import threading
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+from .agent_pass import AgentVisitor, PassContext, _HAVE_NUMPY
 from .module_base import ModuleBase
 from uks import UKS, Thing, Relationship
 
+if _HAVE_NUMPY:
+    import numpy as np
 
-class ModuleAddCounts(ModuleBase):
+# Fewest targets for which counting goes through ``numpy.unique``.
+NUMPY_MIN_TARGETS = 16
+
+
+class ModuleAddCounts(ModuleBase, AgentVisitor):
     """Periodically add count relationships to Things."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self) -> None:
         super().__init__(label="ModuleAddCounts")
         self.is_enabled: bool = False
         self.debug_string = "Initialized\n"
-        self._timer: threading.Timer | None = None
         self.interval: float = 10.0
 
     # ------------------------------------------------------------------
@@ -32,57 +40,39 @@ class ModuleAddCounts(ModuleBase):
     def initialize(self) -> None:
         pass
 
-    def on_start(self) -> None:
-        self._setup()
-
-    def on_stop(self) -> None:
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
-        super().on_stop()
-
     def fire(self) -> None:
         if not self.initialized:
             self.initialize()
             self.initialized = True
 
     # ------------------------------------------------------------------
-    def _setup(self) -> None:
-        if self._timer is None:
-            self._timer = threading.Timer(self.interval, self._same_thread_callback)
-            self._timer.daemon = True
-            self._timer.start()
+    def do_the_work(self) -> None:
+        self.run_pass()
 
-    def _same_thread_callback(self) -> None:
-        if not self.is_enabled:
-            self._setup()
-            return
-        self.start_worker(self.do_the_work)
+    def begin_pass(self, ctx: PassContext) -> None:
+        self.debug_string = "Agent Started\n"
 
-        self._setup()
+    def visit(self, t: Thing, ctx: PassContext) -> None:
+        self._add_count_relationships(t, ctx)
 
-    # ------------------------------------------------------------------
-    def do_the_work(self) -> None:
-        if self.the_uks is None:
-            return
-        self.debug_string = "Agent Started\n"
-        for t in list(self.the_uks.UKSList):
-            self._add_count_relationships(t)
+    def end_pass(self, ctx: PassContext) -> None:
         self.debug_string += "Agent Finished\n"
 
     # ------------------------------------------------------------------
-    def _add_count_relationships(self, t: Thing) -> None:
+    def _add_count_relationships(self, t: Thing, ctx: Optional[PassContext] = None) -> None:
+        ctx = ctx or PassContext(self.the_uks)
         has_child = self.the_uks.labeled("has-child") if self.the_uks else None
+        # targets of t's relationships grouped by instance type, built once
+        targets: Dict[Thing, List[Thing]] = {}
+        rel_types: Dict[Thing, None] = {}
         for r in list(t.relationships):
-            if has_child is not None and r.reltype is has_child:
-                continue
             use_rel_type = self._get_instance_type(r.reltype)
-            targets = [
-                rel.target
-                for rel in t.relationships
-                if rel.target is not None and self._get_instance_type(rel.reltype) is use_rel_type
-            ]
-            best_matches = self._get_attribute_counts(targets)
+            if r.target is not None:
+                targets.setdefault(use_rel_type, []).append(r.target)
+            if has_child is None or r.reltype is not has_child:
+                rel_types[use_rel_type] = None
+        for use_rel_type in rel_types:
+            best_matches = self._get_attribute_counts(targets.get(use_rel_type, []), ctx)
             for match, count in best_matches:
                 rel_label = f"{use_rel_type.Label}.{count}"
                 existing = self.the_uks.get_relationship(t, rel_label, match)
@@ -91,19 +81,40 @@ class ModuleAddCounts(ModuleBase):
                     self.debug_string += f"Added: {t.Label} {rel_label} {match.Label}\n"
 
     # ------------------------------------------------------------------
-    def _get_attribute_counts(self, ts: List[Thing]) -> List[Tuple[Thing, int]]:
-        ret: List[Tuple[Thing, int]] = []
+    def _get_attribute_counts(
+        self, ts: List[Thing], ctx: Optional[PassContext] = None
+    ) -> List[Tuple[Thing, int]]:
+        """Return ``(ancestor, count)`` for ancestors shared by several of *ts*.
+
+        Only ancestors below ``unknownObject`` are reported, in the order they
+        are first met.  Ancestors are counted through the pass context's
+        cached ancestor-id arrays, with ``numpy.unique`` when NumPy is
+        installed and there are enough targets for it to pay off.
+        """
+
         if not ts:
-            return ret
-        counts: Dict[Thing, int] = {}
-        for t in ts:
-            for anc in t.AncestorList():
-                counts[anc] = counts.get(anc, 0) + 1
+            return []
+        ctx = ctx or PassContext(self.the_uks)
         unknown = self.the_uks.labeled("unknownObject") if self.the_uks else None
-        for k, v in counts.items():
-            if unknown and unknown in k.AncestorList() and k is not unknown and v > 1:
-                ret.append((k, v))
-        return ret
+        if unknown is None:
+            return []
+        if _HAVE_NUMPY and len(ts) >= NUMPY_MIN_TARGETS:
+            ids = np.concatenate([ctx.ancestor_ids(t) for t in ts])
+            uniq, first, counts = np.unique(ids, return_index=True, return_counts=True)
+            shared = np.flatnonzero(counts > 1)
+            shared = shared[np.argsort(first[shared], kind="stable")]
+            candidates = [(ctx.thing(int(uniq[i])), int(counts[i])) for i in shared]
+        else:
+            tally: Dict[int, int] = {}
+            for t in ts:
+                for i in ctx.ancestor_ids(t):
+                    tally[i] = tally.get(i, 0) + 1
+            candidates = [(ctx.thing(int(i)), v) for i, v in tally.items() if v > 1]
+        return [
+            (k, v)
+            for k, v in candidates
+            if k is not unknown and ctx.has_ancestor(k, unknown.Label)
+        ]
 
     def _get_instance_type(self, t: Thing) -> Thing:
         use = t
@@ -116,12 +127,6 @@ class ModuleAddCounts(ModuleBase):
             use = use.Parents[0]
         return use
 
-    # Utility for tests to cancel timer
-    def cancel_timer(self) -> None:
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
-
     def get_parameters(self) -> dict:
         return {"interval": self.interval}
 
@@ -2,18 +2,31 @@ from __future__ import annotations
 
 """Port of the C# ``ModuleAttributeBubble``.
 
-The module examines all Things in the UKS and bubbles up child relationships to
-parent Things when enough children share the same relationship.  Conflicting
-relationships and weighted counts are taken into account to emulate the
-behaviour of the original module.
+The module bubbles up child relationships to parent Things when enough
+children share the same relationship.  Conflicting relationships and weighted
+counts are taken into account to emulate the behaviour of the original module.
+
+Unlike the C# module, which rescans every Thing on each pass, the module
+listens to the UKS ``add``/``update``/``remove`` events and keeps a dirty set
+of Things whose own or children's relationships were added, removed or
+re-weighted.  A pass re-bubbles only those Things; edges it changes dirty
+their parents in turn, which are handled in the same pass unless already
+bubbled in it, and the Thing itself for the next pass until its bubbled
+weights settle.  The pass visits only the dirty Things and their ancestors,
+so a pass with nothing dirty does not walk the store at all.
+The first pass after :meth:`set_uks` scans the whole store, as does the pass
+after any ``hasProperty`` change since that can alter which attributes
+conflict anywhere in the tree.  Passes run through :mod:`modules.agent_pass`,
+so the module can share one traversal with the other agents.
 """
 
 import threading
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List, Optional
 
+from .agent_pass import AgentVisitor, PassContext
 from .module_base import ModuleBase
-from uks import Thing, Relationship
+from uks import UKS, Thing, ThingLabels, Relationship
 
 
 @dataclass
@@ -23,76 +36,233 @@ class RelDest:
     relationships: List[Relationship] = field(default_factory=list)
 
 
-class ModuleAttributeBubble(ModuleBase):
+class _ConflictMemo:
+    """Properties :meth:`ModuleAttributeBubble._relationships_conflict` needs.
+
+    Each is computed at most once per Thing during a bubbling pass.  The
+    exclusive groups of a Thing are its parents marked ``isExclusive`` (or
+    ``allowMultiple``), so two Things are alternatives of each other when
+    their groups intersect.
+    """
+
+    def __init__(self, uks: Optional[UKS]) -> None:
+        self.is_exclusive = uks.labeled("isExclusive") if uks else None
+        self.allow_multiple = uks.labeled("allowMultiple") if uks else None
+        self._exclusive: Dict[Thing, frozenset] = {}
+        self._groups: Dict[Thing, frozenset] = {}
+        self._attributes: Dict[Thing, List[Thing]] = {}
+        self._number: Dict[Thing, bool] = {}
+        self._has_property: Dict[tuple, bool] = {}
+
+    def _property(self, t: Thing, prop: Optional[Thing]) -> bool:
+        if prop is None:
+            return False
+        key = (t, prop)
+        found = self._has_property.get(key)
+        if found is None:
+            found = self._has_property[key] = t.has_property(prop)
+        return found
+
+    def exclusive_parents(self, t: Optional[Thing]) -> frozenset:
+        """Parents of *t* marked ``isExclusive``."""
+        if t is None:
+            return frozenset()
+        found = self._exclusive.get(t)
+        if found is None:
+            found = self._exclusive[t] = frozenset(
+                p for p in t.Parents if self._property(p, self.is_exclusive)
+            )
+        return found
+
+    def groups(self, t: Optional[Thing]) -> frozenset:
+        """Parents of *t* marked ``isExclusive`` or ``allowMultiple``."""
+        if t is None:
+            return frozenset()
+        found = self._groups.get(t)
+        if found is None:
+            found = self._groups[t] = self.exclusive_parents(t) | frozenset(
+                p for p in t.Parents if self._property(p, self.allow_multiple)
+            )
+        return found
+
+    def attributes(self, t: Thing) -> List[Thing]:
+        found = self._attributes.get(t)
+        if found is None:
+            found = self._attributes[t] = t.get_attributes()
+        return found
+
+    def negated(self, t: Thing) -> bool:
+        return any(x.Label in {"not", "no"} for x in self.attributes(t))
+
+    def is_number(self, t: Thing) -> bool:
+        found = self._number.get(t)
+        if found is None:
+            found = self._number[t] = t.has_ancestor_labeled("number")
+        return found
+
+
+class ModuleAttributeBubble(ModuleBase, AgentVisitor):
     """Periodically bubble child attributes to their parent."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self) -> None:
         super().__init__(label="ModuleAttributeBubble")
         self.is_enabled: bool = False
         self.debug_string = "Initialized\n"
-        self._timer: threading.Timer | None = None
+        self.interval: float = 10.0
+        # parents to re-bubble, keyed by id() to keep insertion order
+        self._dirty: Dict[int, Thing] = {}
+        self._full_scan = True
+        self._dirty_lock = threading.Lock()
+        # the Things to bubble in the running pass and those already bubbled
+        self._pending: Dict[int, Thing] = {}
+        self._done: set = set()
+        # number of Things bubbled by the last pass
+        self.last_processed = 0
+        # conflict-check cache, only kept for the duration of a pass
+        self._memo: Optional[_ConflictMemo] = None
 
     # ------------------------------------------------------------------
     # Lifecycle
     # ------------------------------------------------------------------
     def initialize(self) -> None:
-        self._setup()
+        pass
 
     def fire(self) -> None:
+        # the work itself runs every ``interval`` seconds on the
+        # ModuleHandler's scheduler
         if not self.initialized:
             self.initialize()
             self.initialized = True
 
-    def _setup(self) -> None:
-        if self._timer is None:
-            self._timer = threading.Timer(10.0, self._same_thread_callback)
-            self._timer.daemon = True
-            self._timer.start()
+    def set_uks(self, uks: Optional[UKS]) -> None:
+        if self.the_uks is not None:
+            for event in ("add", "update", "remove"):
+                self.the_uks.off(event, self._on_relationship_changed)
+        super().set_uks(uks)
+        with self._dirty_lock:
+            self._dirty.clear()
+            self._full_scan = True
+        if uks is not None:
+            for event in ("add", "update", "remove"):
+                uks.on(event, self._on_relationship_changed)
 
-    def _same_thread_callback(self) -> None:
-        if not self.is_enabled:
-            self._setup()
-            return
-        threading.Thread(target=self.do_the_work, daemon=True).start()
-        self._setup()
+    # ------------------------------------------------------------------
+    # Dirty tracking
+    # ------------------------------------------------------------------
+    def _on_relationship_changed(self, rel: Relationship) -> None:
+        with self._dirty_lock:
+            if self._full_scan:
+                return
+            if rel.reltype.Label.lower() == "hasproperty":
+                self._full_scan = True
+                self._dirty.clear()
+            else:
+                # a Thing's own edges feed its next bubbling (the current
+                # weight and conflicting edges) and, unless the edge is a
+                # child link, its parents' bubbling as well
+                self._mark(rel.source)
+                if rel.reltype.Label != "has-child":
+                    for parent in rel.source.Parents:
+                        self._mark(parent)
+
+    def _mark(self, t: Thing) -> None:
+        stack = [t]
+        while stack:
+            t = stack.pop()
+            if id(t) in self._dirty:
+                continue
+            self._dirty[id(t)] = t
+            # ChildrenWithSubclasses of a parent expands children that are
+            # instances of it, so their changes reach the grandparent too
+            stack.extend(p for p in t.Parents if t.Label.startswith(p.Label))
 
-    def cancel_timer(self) -> None:
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
+    def _take_dirty(self, done: set) -> List[Thing]:
+        with self._dirty_lock:
+            ready = [k for k in self._dirty if k not in done]
+            return [self._dirty.pop(k) for k in ready]
 
     # ------------------------------------------------------------------
     def do_the_work(self) -> None:
-        if self.the_uks is None:
-            return
+        self.run_pass()
+
+    def begin_pass(self, ctx: PassContext) -> None:
         self.debug_string = "Bubbler Started\n"
-        for t in list(self.the_uks.UKSList):
-            if t.has_ancestor("Object"):
-                self._bubble_child_attributes(t)
+        with self._dirty_lock:
+            if self._full_scan:
+                self._pending = {id(t): t for t in self.the_uks.UKSList}
+                self._full_scan = False
+            else:
+                self._pending = dict(self._dirty)
+            self._dirty.clear()
+        # Things bubbled in this pass; if they are dirtied again they wait
+        # for the next pass, as they would have with a full rescan
+        self._done = set()
+        self._memo = _ConflictMemo(self.the_uks)
+
+    def scope(self, ctx: PassContext) -> List[Thing]:
+        return list(self._pending.values())
+
+    def visit(self, t: Thing, ctx: PassContext) -> None:
+        if id(t) in self._done:
+            return
+        if id(t) not in self._pending:
+            # dirtied earlier in this traversal by a Thing bubbled before it
+            with self._dirty_lock:
+                if self._dirty.pop(id(t), None) is None:
+                    return
+        self._bubble(t, ctx)
+
+    def end_pass(self, ctx: PassContext) -> None:
+        try:
+            pending = [t for k, t in self._pending.items() if k not in self._done]
+            while pending:
+                for t in pending:
+                    if id(t) not in self._done:
+                        self._bubble(t, ctx)
+                pending = self._take_dirty(self._done)
+        finally:
+            self._memo = None
+        self.last_processed = len(self._done)
+        self._pending = {}
         self.debug_string += "Bubbler Finished\n"
 
+    def _bubble(self, t: Thing, ctx: PassContext) -> None:
+        self._done.add(id(t))
+        if ThingLabels.get_thing(t.Label) is t and ctx.has_ancestor(t, "Object"):
+            self._bubble_child_attributes(t)
+
     # ------------------------------------------------------------------
     def _bubble_child_attributes(self, t: Thing) -> None:
         if not t.Children or t.Label == "unknownObject":
             return
-        item_counts: List[RelDest] = []
+        # (reltype, target) -> bucket, in first-seen order
+        item_counts: Dict[tuple, RelDest] = {}
         has_child = self.the_uks.labeled("has-child") if self.the_uks else None
         for child in t.ChildrenWithSubclasses:
             for r in child.relationships:
                 if has_child and r.reltype is has_child:
                     continue
                 use_rel_type = self._get_instance_type(r.reltype)
-                found = next(
-                    (x for x in item_counts if x.rel_type is use_rel_type and x.target is r.target),
-                    None,
-                )
-                if not found:
-                    found = RelDest(use_rel_type, r.target)
-                    item_counts.append(found)
+                key = (id(use_rel_type), id(r.target))
+                found = item_counts.get(key)
+                if found is None:
+                    found = item_counts[key] = RelDest(use_rel_type, r.target)
                 found.relationships.append(r)
         if not item_counts:
             return
-        sorted_items = sorted(item_counts, key=lambda x: len(x.relationships), reverse=True)
+        sorted_items = sorted(item_counts.values(), key=lambda x: len(x.relationships), reverse=True)
+        # Buckets can only conflict when they share a reltype or a target, so
+        # each bucket is compared against those two groups only.  Positions
+        # keep the sums below in the order of ``sorted_items``.
+        position = {id(item): i for i, item in enumerate(sorted_items)}
+        by_type: Dict[int, List[RelDest]] = {}
+        by_target: Dict[int, List[RelDest]] = {}
+        for item in sorted_items:
+            by_type.setdefault(id(item.rel_type), []).append(item)
+            by_target.setdefault(id(item.target), []).append(item)
         exclude = {"hasProperty", "isTransitive", "isCommutative", "inverseOf", "hasAttribute", "hasDigit"}
         for rr in sorted_items:
             if rr.rel_type.Label in exclude:
@@ -105,9 +275,10 @@ class ModuleAttributeBubble(ModuleBase):
             positive_weight = sum(rel.weight for rel in rr.relationships)
             negative_count = 0
             negative_weight = 0
-            for other in sorted_items:
-                if other is rr:
-                    continue
+            related = {id(x): x for x in by_type[id(rr.rel_type)]}
+            related.update((id(x), x) for x in by_target[id(rr.target)])
+            related.pop(id(rr))
+            for other in sorted(related.values(), key=lambda x: position[id(x)]):
                 if self._relationships_conflict(rr, other):
                     negative_count += len(other.relationships)
                     negative_weight += sum(rel.weight for rel in other.relationships)
@@ -146,6 +317,8 @@ class ModuleAttributeBubble(ModuleBase):
                     for existing in list(t.relationships):
                         if existing is r:
                             continue
+                        if existing.reltype is not rr.rel_type and existing.target is not rr.target:
+                            continue
                         tmp = RelDest(existing.reltype, existing.target, [existing])
                         if self._relationships_conflict(tmp, rr):
                             t.remove_relationship(existing)
@@ -155,42 +328,23 @@ class ModuleAttributeBubble(ModuleBase):
     def _relationships_conflict(self, r1: RelDest, r2: RelDest) -> bool:
         if r1.rel_type is r2.rel_type and r1.target is r2.target:
             return False
-        is_exclusive = self.the_uks.labeled("isExclusive") if self.the_uks else None
-        allow_multiple = self.the_uks.labeled("allowMultiple") if self.the_uks else None
+        memo = self._memo or _ConflictMemo(self.the_uks)
         if r1.rel_type is r2.rel_type:
-            parents = self._find_common_parents(r1.target, r2.target)
-            for parent in parents:
-                if (
-                    is_exclusive
-                    and parent.has_property(is_exclusive)
-                    or (allow_multiple and parent.has_property(allow_multiple))
-                ):
-                    return True
+            # the targets share a parent marked isExclusive or allowMultiple
+            if memo.groups(r1.target) & memo.groups(r2.target):
+                return True
         if r1.target is r2.target:
-            parents = self._find_common_parents(r1.target, r2.target)
-            for parent in parents:
-                if is_exclusive and parent.has_property(is_exclusive):
-                    return True
-            r1_attrs = r1.rel_type.get_attributes()
-            r2_attrs = r2.rel_type.get_attributes()
-            r1_not = next((x for x in r1_attrs if x.Label in {"not", "no"}), None)
-            r2_not = next((x for x in r2_attrs if x.Label in {"not", "no"}), None)
-            if (r1_not is None) != (r2_not is None):
+            if memo.exclusive_parents(r1.target):
+                return True
+            r1_attrs = memo.attributes(r1.rel_type)
+            r2_attrs = memo.attributes(r2.rel_type)
+            if memo.negated(r1.rel_type) != memo.negated(r2.rel_type):
                 return True
             for a1 in r1_attrs:
                 for a2 in r2_attrs:
-                    if a1 is a2:
-                        continue
-                    for p in self._find_common_parents(a1, a2):
-                        if (
-                            is_exclusive
-                            and p.has_property(is_exclusive)
-                            or (allow_multiple and p.has_property(allow_multiple))
-                        ):
-                            return True
-            has_number1 = any(x.has_ancestor_labeled("number") for x in r1_attrs)
-            has_number2 = any(x.has_ancestor_labeled("number") for x in r2_attrs)
-            if has_number1 or has_number2:
+                    if a1 is not a2 and memo.groups(a1) & memo.groups(a2):
+                        return True
+            if any(memo.is_number(x) for x in r1_attrs) or any(memo.is_number(x) for x in r2_attrs):
                 return True
         return False
 
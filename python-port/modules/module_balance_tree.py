@@ -4,24 +4,51 @@ This module ensures that Things in the UKS do not end up with an excessive
 number of direct children.  When a Thing exceeds ``max_children`` a new parent
 Thing is created (sharing the original label with an auto-incremented suffix)
 so that the children are distributed more evenly between the old and new
-parents.  The original implementation uses a timer to periodically scan the
-knowledge base; that behaviour is reproduced using ``threading.Timer``.
+parents.  The whole split is planned up front with :func:`plan_partition` and
+applied with a single :meth:`UKS.reparent` call.  The original implementation
+uses a timer to periodically scan the knowledge base; here the scan runs every
+``interval`` seconds on the :class:`~modules.module_handler.ModuleHandler`'s
+scheduler.
 """
 from __future__ import annotations
 
-import threading
-from typing import Optional
+from collections import deque
+from typing import List, Optional
 
+from .agent_pass import AgentVisitor, PassContext
 from .module_base import ModuleBase
 from uks import UKS, Thing
 
 
-class ModuleBalanceTree(ModuleBase):
+def plan_partition(count: int, max_children: int) -> List[List[int]]:
+    """Plan how a Thing with *count* children is split.
+
+    Returns one list per new parent, in creation order, of the nodes it
+    takes over from the Thing.  Node ``i < count`` is the Thing's ``i``-th
+    child and node ``count + k`` the ``k``-th new parent, which starts out as
+    a child of the Thing and may itself be moved under a later one.  While
+    the Thing has more than *max_children* children a new parent is added
+    and takes the first *max_children* of them.
+    """
+
+    if max_children < 2:
+        return []
+    queue = deque(range(count))
+    groups: List[List[int]] = []
+    while len(queue) > max_children:
+        queue.append(count + len(groups))
+        groups.append([queue.popleft() for _ in range(max_children)])
+    return groups
+
+
+class ModuleBalanceTree(ModuleBase, AgentVisitor):
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self, label: Optional[str] = None) -> None:
         super().__init__(label)
         self.max_children: int = 6
         self.interval: float = 10.0
-        self._timer: Optional[threading.Timer] = None
         self.debug_string = "Initialized\n"
 
     # ------------------------------------------------------------------
@@ -30,54 +57,42 @@ class ModuleBalanceTree(ModuleBase):
     def initialize(self) -> None:
         pass
 
-    def on_start(self) -> None:
-        self._setup_timer()
-
-    def on_stop(self) -> None:
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
-        super().on_stop()
-
-    def fire(self) -> None:  # timer driven
+    def fire(self) -> None:  # scheduler driven
         if not self.initialized:
             self.initialize()
 
-    def _setup_timer(self) -> None:
-        if self._timer is None:
-            self._timer = threading.Timer(self.interval, self._callback)
-            self._timer.daemon = True
-            self._timer.start()
-
-    def _callback(self) -> None:
-        if self.is_enabled and self.the_uks is not None:
-            threading.Thread(target=self.do_the_work, daemon=True).start()
-        # Reschedule
-        self._timer = None
-        self._setup_timer()
-
     # ------------------------------------------------------------------
     # Core behaviour
     # ------------------------------------------------------------------
     def do_the_work(self) -> None:
-        if self.the_uks is None:
-            return
+        self.run_pass()
+
+    def begin_pass(self, ctx: PassContext) -> None:
         self.debug_string = "Agent Started\n"
-        for t in list(self.the_uks.UKSList):
-            if t.has_ancestor("Object") and "." not in t.Label:
-                self.handle_excessive_children(t)
+
+    def visit(self, t: Thing, ctx: PassContext) -> None:
+        if "." not in t.Label and ctx.has_ancestor(t, "Object"):
+            self.handle_excessive_children(t)
+
+    def end_pass(self, ctx: PassContext) -> None:
         self.debug_string += "Agent Finished\n"
 
     def handle_excessive_children(self, t: Thing) -> None:
-        if self.the_uks is None:
+        if self.the_uks is None or self.max_children < 2:
+            return
+        children = t.Children
+        groups = plan_partition(len(children), self.max_children)
+        if not groups:
             return
-        while len(t.Children) > self.max_children:
+        new_parents = []
+        for _ in groups:
             new_parent = self.the_uks.add_thing(t.Label, t)
+            new_parents.append(new_parent)
             self.debug_string += f"Created new class: {new_parent.Label}\n"
-            while len(new_parent.Children) < self.max_children and t.Children:
-                child = t.Children[0]
-                child.remove_parent(t)
-                child.add_parent(new_parent)
+        nodes = children + new_parents
+        self.the_uks.reparent(
+            (nodes[i], t, new_parents[k]) for k, group in enumerate(groups) for i in group
+        )
 
     # ------------------------------------------------------------------
     # Parameters
@@ -6,18 +6,31 @@ type, providing lifecycle hooks such as ``initialize``, ``fire`` and
 the shared :class:`~uks.UKS` instance used for knowledge storage.  Additional
 hooks ``pre_step`` and ``post_step`` are invoked around each ``fire`` call to
 allow fine‑grained control over execution.
+
+Modules declare the resources their step reads and writes in ``reads`` and
+``writes`` (for example ``"uks"``, ``"vision"`` or ``"network"``) so the
+:class:`~modules.module_handler.ModuleHandler` can step independent modules
+concurrently.  Modules that declare nothing are treated as touching every
+resource and keep stepping in list order.
 """
 from __future__ import annotations
 
 import threading
-from typing import Any, Dict, Optional
+from typing import Any, Dict, FrozenSet, Optional
 
 from uks import UKS
 
+# resource name that conflicts with every other resource
+ALL_RESOURCES = "*"
+
 
 class ModuleBase:
     """Abstract base class for all modules with lifecycle hooks."""
 
+    # resources read and written by pre_step, fire and post_step
+    reads: FrozenSet[str] = frozenset({ALL_RESOURCES})
+    writes: FrozenSet[str] = frozenset({ALL_RESOURCES})
+
     def __init__(self, label: Optional[str] = None) -> None:
         self.label = label or self.__class__.__name__
         self.is_enabled: bool = True
@@ -27,6 +40,13 @@ class ModuleBase:
         # perform a graceful shutdown.  Modules can spawn workers via
         # :meth:`start_worker`.
         self._workers: list[threading.Thread] = []
+        # Background work run by the ModuleHandler's scheduler: seconds
+        # between runs of ``do_the_work`` (``None`` for none), the priority
+        # among jobs due at the same time and the fraction of one CPU the
+        # work may use (``None`` for no limit).
+        self.interval: Optional[float] = None
+        self.priority: int = 0
+        self.cpu_budget: Optional[float] = None
 
     # -- lifecycle -----------------------------------------------------
     def initialize(self) -> None:  # pragma: no cover - to be overridden
@@ -96,3 +116,16 @@ class ModuleBase:
         self._workers.append(thread)
         return thread
 
+    def conflicts_with(self, other: "ModuleBase") -> bool:
+        """Return ``True`` if this module and *other* must not step at once.
+
+        Two modules conflict when one writes a resource the other reads or
+        writes.
+        """
+
+        mine = self.reads | self.writes
+        theirs = other.reads | other.writes
+        if ALL_RESOURCES in mine or ALL_RESOURCES in theirs:
+            return bool(mine and theirs)
+        return bool(self.writes & theirs or other.writes & mine)
+
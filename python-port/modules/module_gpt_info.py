@@ -18,6 +18,9 @@ from gpt import GPTClient
 
 
 class ModuleGPTInfo(ModuleBase):
+    reads = frozenset()
+    writes = frozenset()
+
     Output: str = ""
 
     def initialize(self, local_model: Optional[str] = None) -> None:
@@ -1,17 +1,40 @@
 """Module loading and execution support."""
 from __future__ import annotations
 
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, List, Type, Any
+from typing import Dict, List, Optional, Sequence, Set, Type, Any
 import importlib
 import inspect
+import os
 import pkgutil
 
+from .agent_pass import AgentPass, AgentVisitor
+from .instrumentation import ModuleInstrumentation, ModuleStats
 from .module_base import ModuleBase
 from .module_description import ModuleDescription
+from .scheduler import AgentScheduler
 from uks import UKS
 
 
+def step_dependencies(modules: Sequence[ModuleBase]) -> List[Set[int]]:
+    """Return, for each module, the indices of earlier modules it must follow.
+
+    A module waits for every earlier module it conflicts with (see
+    :meth:`ModuleBase.conflicts_with`), so conflicting modules keep their
+    list order and independent ones may step at the same time.
+    """
+
+    return [
+        {j for j in range(i) if module.conflicts_with(modules[j])}
+        for i, module in enumerate(modules)
+    ]
+
+
+# scheduler job running the agent modules' combined traversal
+AGENT_PASS_JOB = "AgentPass"
+
+
 @dataclass
 class RegisteredModule:
     name: str
@@ -20,12 +43,28 @@ class RegisteredModule:
 
 
 class ModuleHandler:
-    """Manage active modules and dispatch their ``fire`` methods."""
+    """Manage active modules and dispatch their ``fire`` methods.
+
+    Modules with a positive ``interval`` and a ``do_the_work`` method also get
+    a job on :attr:`scheduler`, which runs that work in the background while
+    the module is enabled.  Agent modules (:class:`AgentVisitor`) share one
+    job, :data:`AGENT_PASS_JOB`: each run makes a single :class:`AgentPass`
+    over the store for every agent whose own interval has elapsed.
+
+    ``step_workers`` bounds the threads :meth:`fire_modules` uses to step
+    independent modules at once; ``1`` steps every module in list order.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self, max_workers: int = 2, step_workers: Optional[int] = None) -> None:
         self.registry: Dict[str, RegisteredModule] = {}
         self.active_modules: List[ModuleBase] = []
         self.the_uks = UKS()
+        self.scheduler = AgentScheduler(max_workers)
+        self.step_workers = step_workers or min(4, os.cpu_count() or 1)
+        self._step_pool: Optional[ThreadPoolExecutor] = None
+        self.instrumentation = ModuleInstrumentation()
+        # agent label -> scheduler clock time its next pass is due
+        self._agent_due: Dict[str, float] = {}
         self.discover()
 
     # -- registration --------------------------------------------------
@@ -56,21 +95,179 @@ class ModuleHandler:
         module._ensure_initialized()
         module.on_start()
         self.active_modules.append(module)
+        self.schedule(module)
         return module
 
     def deactivate(self, label: str) -> None:
+        self.scheduler.remove(label)
         for m in list(self.active_modules):
             if m.label == label:
                 m.on_stop()
         self.active_modules = [m for m in self.active_modules if m.label != label]
+        self._agent_due.pop(label, None)
+        self._schedule_agent_pass()
+
+    # -- background work -----------------------------------------------
+    def schedule(self, module: ModuleBase) -> bool:
+        """(Re)schedule *module*'s background work from its current settings.
+
+        Returns ``False`` when the module has no interval or no work to run.
+        Agent modules are (re)scheduled through the shared agent pass job.
+        """
+
+        interval = module.interval
+        if isinstance(module, AgentVisitor):
+            self.scheduler.remove(module.label)
+            self._schedule_agent_pass()
+            self.scheduler.start()
+            return bool(interval)
+        if not interval or not hasattr(module, "do_the_work"):
+            self.scheduler.remove(module.label)
+            return False
+
+        def work() -> None:
+            if module.is_enabled and module.the_uks is not None:
+                if self.instrumentation.enabled:
+                    self.instrumentation.call(module.label, "work", module.do_the_work)
+                else:
+                    module.do_the_work()
+
+        self.scheduler.add(
+            module.label, work, interval, priority=module.priority, cpu_budget=module.cpu_budget
+        )
+        self.scheduler.start()
+        return True
+
+    def _scheduled_agents(self) -> List[ModuleBase]:
+        return [m for m in self.active_modules if isinstance(m, AgentVisitor) and m.interval]
+
+    def _schedule_agent_pass(self) -> None:
+        """Fit the agent pass job to the active agents' settings.
+
+        The job runs as often as the most frequent agent, at the highest
+        agent priority.  Its CPU budget is the sum of the agents' budgets,
+        or none if any agent has no limit.
+        """
+
+        agents = self._scheduled_agents()
+        if not agents:
+            self.scheduler.remove(AGENT_PASS_JOB)
+            return
+        budgets = [m.cpu_budget for m in agents]
+        interval = min(m.interval for m in agents)
+        priority = max(m.priority for m in agents)
+        cpu_budget = None if None in budgets else sum(budgets)
+        job = self.scheduler.get(AGENT_PASS_JOB)
+        if job is not None and (job.interval, job.priority, job.cpu_budget) == (interval, priority, cpu_budget):
+            return
+        self.scheduler.add(AGENT_PASS_JOB, self._agent_pass_work, interval, priority=priority, cpu_budget=cpu_budget)
+
+    def _agent_pass_work(self) -> None:
+        now = self.scheduler.clock()
+        due = [
+            m
+            for m in self._scheduled_agents()
+            if m.is_enabled and m.the_uks is not None and self._agent_due.get(m.label, 0.0) <= now
+        ]
+        if not due:
+            return
+        for m in due:
+            self._agent_due[m.label] = now + m.interval
+        self.run_agent_pass(due)
+
+    def shutdown(self) -> None:
+        """Stop the background scheduler and the step thread pool."""
+        self.scheduler.stop()
+        self.instrumentation.disable()
+        if self._step_pool is not None:
+            self._step_pool.shutdown()
+            self._step_pool = None
 
     # -- execution -----------------------------------------------------
     def fire_modules(self) -> None:
-        for module in list(self.active_modules):
-            if module.is_enabled:
-                module.pre_step()
-                module.fire()
-                module.post_step()
+        """Step every enabled module once.
+
+        Modules whose declared resources do not conflict step concurrently
+        on a thread pool; a module that conflicts with an earlier one waits
+        for it.  The call returns once every module has stepped, and the
+        first exception raised, in list order, is re-raised then.
+        """
+
+        modules = [m for m in self.active_modules if m.is_enabled]
+        if self.step_workers < 2 or len(modules) < 2:
+            for module in modules:
+                self._step(module)
+            return
+
+        waiting = dict(enumerate(step_dependencies(modules)))
+        if all(i - 1 in deps for i, deps in waiting.items() if i):
+            # every module waits for the one before it
+            for module in modules:
+                self._step(module)
+            return
+
+        if self._step_pool is None:
+            self._step_pool = ThreadPoolExecutor(self.step_workers, thread_name_prefix="module-step")
+        running: Dict[Future, int] = {}
+        done: Set[int] = set()
+        errors: Dict[int, BaseException] = {}
+        while waiting or running:
+            for i in [i for i, deps in waiting.items() if deps <= done]:
+                del waiting[i]
+                running[self._step_pool.submit(self._step, modules[i])] = i
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                i = running.pop(future)
+                done.add(i)
+                error = future.exception()
+                if error is not None:
+                    errors[i] = error
+        if errors:
+            raise errors[min(errors)]
+
+    def _step(self, module: ModuleBase) -> None:
+        if self.instrumentation.enabled:
+            self.instrumentation.call(module.label, "step", self._step_module, module)
+        else:
+            self._step_module(module)
+
+    @staticmethod
+    def _step_module(module: ModuleBase) -> None:
+        module.pre_step()
+        module.fire()
+        module.post_step()
+
+    def run_agent_pass(self, agents: Optional[Sequence[AgentVisitor]] = None) -> AgentPass:
+        """Run *agents* over the store in one traversal.
+
+        By default every enabled agent module takes part.  The scheduler's
+        agent pass job calls this with the agents that are due.
+        """
+        if agents is None:
+            agents = [m for m in self.active_modules if m.is_enabled and isinstance(m, AgentVisitor)]
+        agent_pass = AgentPass(self.the_uks, agents, self.instrumentation)
+        if self.instrumentation.enabled:
+            self.instrumentation.call(AGENT_PASS_JOB, "work", agent_pass.run)
+        else:
+            agent_pass.run()
+        return agent_pass
+
+    # -- instrumentation -----------------------------------------------
+    def enable_stats(self, sample_every: int = 10) -> None:
+        """Record per-module statistics for steps and background work.
+
+        Every *sample_every*-th call of a module also measures its
+        allocations with ``tracemalloc``; ``0`` skips that.
+        """
+
+        self.instrumentation.enable(self.the_uks, sample_every)
+
+    def disable_stats(self) -> None:
+        self.instrumentation.disable()
+
+    def stats(self) -> List[ModuleStats]:
+        """Statistics recorded so far, most total time first."""
+        return self.instrumentation.snapshot()
 
     # -- lifecycle utilities -----------------------------------------
     def reset_all(self) -> None:
@@ -82,7 +279,11 @@ class ModuleHandler:
         return [m.serialize() for m in self.active_modules]
 
     def load_active(self, data: List[Dict[str, Any]]) -> None:
+        for module in self.active_modules:
+            self.scheduler.remove(module.label)
         self.active_modules = []
+        self._agent_due.clear()
+        self._schedule_agent_pass()
         for mdata in data:
             name = mdata.get("class")
             reg = self.registry.get(name)
@@ -94,3 +295,4 @@ class ModuleHandler:
             module.set_parameters(mdata.get("params", {}))
             module.on_start()
             self.active_modules.append(module)
+            self.schedule(module)
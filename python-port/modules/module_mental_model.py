@@ -59,6 +59,9 @@ class ModuleMentalModel(ModuleBase):
     - Abstract conceptual structures
     """
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self, label: Optional[str] = None):
         super().__init__(label)
         
@@ -280,28 +283,35 @@ class ModuleMentalModel(ModuleBase):
         """Update UKS with current mental model state."""
         if not self.the_uks:
             return
-            
-        try:
-            # Add objects to UKS
-            for obj in self.objects.values():
-                obj_thing = self.the_uks.get_or_add_thing(obj.name, obj.object_type)
-                
-                # Add properties as relationships
-                for prop_name, prop_value in obj.properties.items():
-                    prop_thing = self.the_uks.get_or_add_thing(str(prop_value), prop_name)
-                    self.the_uks.add_relationship(obj_thing, prop_name, prop_thing)
-                    
-            # Add spatial relationships
-            for rel in self.spatial_relationships[-10:]:  # Only recent relationships
-                obj1_thing = self.the_uks.get_thing(rel.object1)
-                obj2_thing = self.the_uks.get_thing(rel.object2)
-                if obj1_thing and obj2_thing:
-                    self.the_uks.add_relationship(obj1_thing, rel.relation_type, obj2_thing)
-                    
-        except Exception:
-            # Handle UKS errors gracefully
-            pass
-    
+
+        # Add objects to UKS
+        for obj in self.objects.values():
+            obj_thing = self.the_uks.get_or_add_thing(obj.name, obj.object_type)
+
+            # Numeric properties go to typed value columns when numpy is
+            # available; anything else, or a value the column cannot hold,
+            # becomes a relationship to a value Thing
+            for prop_name, prop_value in obj.properties.items():
+                if (
+                    self.the_uks.values.enabled
+                    and isinstance(prop_value, (int, float))
+                    and not isinstance(prop_value, bool)
+                ):
+                    try:
+                        self.the_uks.values.set(obj_thing, prop_name, prop_value)
+                        continue
+                    except (TypeError, ValueError):
+                        pass
+                prop_thing = self.the_uks.get_or_add_thing(str(prop_value), prop_name)
+                self.the_uks.add_relationship(obj_thing, prop_name, prop_thing)
+
+        # Add spatial relationships
+        for rel in self.spatial_relationships[-10:]:  # Only recent relationships
+            obj1_thing = self.the_uks.labeled(rel.object1)
+            obj2_thing = self.the_uks.labeled(rel.object2)
+            if obj1_thing and obj2_thing:
+                self.the_uks.add_relationship(obj1_thing, rel.relation_type, obj2_thing)
+
     def query_spatial_relations(self, obj_name: str, relation_type: str) -> List[str]:
         """Query objects that have a specific spatial relationship with the given object."""
         results = []
@@ -16,6 +16,9 @@ from .module_base import ModuleBase
 class ModuleMine(ModuleBase):
     """Minimal module that performs no actions each step."""
 
+    reads = frozenset()
+    writes = frozenset()
+
     def initialize(self) -> None:  # pragma: no cover - nothing to set up
         """No initialisation required for the template module."""
 
@@ -1,5 +1,4 @@
 from __future__ import annotations
-import threading
 import json
 from typing import Any, Dict
 
@@ -13,31 +12,30 @@ from uks import UKS
 
 
 class ModuleOnlineInfo(ModuleBase):
-    """Query Wikipedia for information about words and add summaries to UKS."""
+    """Query Wikipedia for information about words and add summaries to UKS.
+
+    With no ``interval`` queries are answered as they are added.  Otherwise
+    they are queued and the ModuleHandler's scheduler answers one every
+    ``interval`` seconds through :meth:`do_the_work`.
+    """
+
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
 
     def __init__(self, interval: float = 0.0):
         super().__init__()
         self.interval = interval
         self._queue: list[str] = []
-        self._timer: threading.Timer | None = None
         self.uks: UKS | None = None
 
-    def initialize(self, uks: UKS) -> None:  # type: ignore[override]
-        self.uks = uks
-        if self.interval:
-            self._schedule()
+    def initialize(self, uks: UKS | None = None) -> None:  # type: ignore[override]
+        self.uks = uks or self.the_uks
 
-    # worker scheduling
-    def _schedule(self) -> None:
-        if self.interval and self._timer is None:
-            self._timer = threading.Timer(self.interval, self.fire)
-            self._timer.daemon = True
-            self._timer.start()
+    def set_uks(self, uks: UKS) -> None:
+        super().set_uks(uks)
+        self.uks = uks
 
     def reset(self) -> None:
-        if self._timer:
-            self._timer.cancel()
-            self._timer = None
         self._queue.clear()
 
     def add_query(self, term: str) -> None:
@@ -45,17 +43,16 @@ class ModuleOnlineInfo(ModuleBase):
         if not self.interval:
             self.fire()
 
+    def do_the_work(self) -> None:
+        self.fire()
+
     def fire(self) -> None:  # type: ignore[override]
         if not self._queue or self.uks is None:
-            self._timer = None
             return
         term = self._queue.pop(0)
         summary = self._get_summary(term)
         if summary:
             self.uks.add_statement(term, "hasSummary", summary)
-        self._timer = None
-        if self.interval and self._queue:
-            self._schedule()
 
     def _get_summary(self, term: str) -> str:
         url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{term}"
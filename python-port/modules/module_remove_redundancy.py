@@ -8,21 +8,42 @@ relationship exists on a parent with sufficient confidence.  It helps maintain a
 compact knowledge store by avoiding duplicate information on child nodes.
 """
 
-import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
+from .agent_pass import AgentVisitor, PassContext
 from .module_base import ModuleBase
 from uks import UKS, Thing, Relationship
+from uks.thing import remove_relationships
 
 
-class ModuleRemoveRedundancy(ModuleBase):
+@dataclass
+class RedundancyStats:
+    """What one pass of :class:`ModuleRemoveRedundancy` did."""
+
+    things: int = 0
+    weakened: int = 0
+    removed: int = 0
+    # time spent in the module itself, excluding other agents sharing the pass
+    seconds: float = 0.0
+
+
+class ModuleRemoveRedundancy(ModuleBase, AgentVisitor):
     """Periodically prune redundant attributes from Things."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self) -> None:
         super().__init__(label="ModuleRemoveRedundancy")
         self.is_enabled: bool = False
         self.debug_string = "Initialized\n"
-        self._timer: threading.Timer | None = None
         self.interval: float = 10.0
+        self.last_stats = RedundancyStats()
+        self._stats: Optional[RedundancyStats] = None
+        # parent -> (inherited list it was built from, (reltype, target) -> rels)
+        self._indexes: Dict[Thing, Tuple[List[Relationship], Dict[tuple, List[Relationship]]]] = {}
 
     # ------------------------------------------------------------------
     # Lifecycle
@@ -30,79 +51,93 @@ class ModuleRemoveRedundancy(ModuleBase):
     def initialize(self) -> None:
         pass
 
-    def on_start(self) -> None:
-        self._setup()
-
-    def on_stop(self) -> None:
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
-        super().on_stop()
-
     def fire(self) -> None:
-        # The original module performs all work on a timer; ``fire`` merely
+        # The original module performs all work on a timer, here the
+        # ModuleHandler's scheduler; ``fire`` merely
         # ensures initialization and updates the dialog (not implemented here).
         if not self.initialized:
             self.initialize()
             self.initialized = True
 
-    # ------------------------------------------------------------------
-    def _setup(self) -> None:
-        if self._timer is None:
-            self._timer = threading.Timer(self.interval, self._same_thread_callback)
-            self._timer.daemon = True
-            self._timer.start()
-
-    def _same_thread_callback(self) -> None:
-        if not self.is_enabled:
-            # Reschedule the timer and exit
-            self._setup()
-            return
-        self.start_worker(self.do_the_work)
-        self._setup()
-
     # ------------------------------------------------------------------
     def do_the_work(self) -> None:
-        if self.the_uks is None:
-            return
+        self.run_pass()
+
+    def begin_pass(self, ctx: PassContext) -> None:
         self.debug_string = "Agent Started\n"
-        for t in list(self.the_uks.UKSList):
-            self._remove_redundant_attributes(t)
+        self._stats = RedundancyStats()
+        self._indexes = {}
+
+    def visit(self, t: Thing, ctx: PassContext) -> None:
+        start = time.perf_counter()
+        self._remove_redundant_attributes(t, ctx)
+        self._stats.things += 1
+        self._stats.seconds += time.perf_counter() - start
+
+    def end_pass(self, ctx: PassContext) -> None:
+        stats = self.last_stats = self._stats
+        self._stats = None
+        self._indexes = {}
+        self.debug_string += (
+            f"Weakened {stats.weakened}, removed {stats.removed} in {stats.seconds:.3f}s\n"
+        )
         self.debug_string += "Agent  Finished\n"
 
     # ------------------------------------------------------------------
-    def _remove_redundant_attributes(self, t: Thing) -> None:
-        for parent in t.Parents:
-            rels_with_inheritance = self.the_uks.get_all_relationships([parent], False)
-            for r in list(t.relationships):
-                match = next(
-                    (
-                        x
-                        for x in rels_with_inheritance
-                        if x.source is not r.source
-                        and x.reltype is r.reltype
-                        and x.target is r.target
-                    ),
-                    None,
-                )
-                if match and match.weight > 0.8:
-                    r.weight -= 0.1
-                    if r.weight < 0.5:
-                        t.remove_relationship(r)
-                        self.debug_string += f"Removed: {r}\n"
-                        # restart scanning from scratch since list changed
-                        return self._remove_redundant_attributes(t)
-                    else:
-                        self.debug_string += f"{r}   ({r.weight:0.00})\n"
+    def _inherited_index(self, parent: Thing, ctx: PassContext) -> Dict[tuple, List[Relationship]]:
+        rels = ctx.inherited(parent)
+        cached = self._indexes.get(parent)
+        # the context rebuilds the list whenever a relationship is added or
+        # removed, which is also when the index has to be rebuilt
+        if cached is None or cached[0] is not rels:
+            index: Dict[tuple, List[Relationship]] = {}
+            for x in rels:
+                index.setdefault((x.reltype, x.target), []).append(x)
+            cached = self._indexes[parent] = (rels, index)
+        return cached[1]
+
+    def _remove_redundant_attributes(self, t: Thing, ctx: Optional[PassContext] = None) -> None:
+        """Weaken relationships of *t* that a parent already holds firmly.
+
+        Each relationship loses 0.1 of weight for every parent that has (or
+        inherits) the same reltype and target with a weight above 0.8, and
+        is removed once its weight falls below 0.5.  All decisions are made
+        against the relationships as they were before the sweep, and the
+        removals are applied in one batch.
+        """
+
+        if ctx is None:
+            ctx = PassContext(self.the_uks)
+            self._indexes = {}
+        stats = self._stats or RedundancyStats()
+        strong_parents: Dict[int, int] = {}
+        rels = list(t.relationships)
+        for parent in ctx.parents(t):
+            index = self._inherited_index(parent, ctx)
+            for r in rels:
+                matches = index.get((r.reltype, r.target))
+                if matches and max((x.weight for x in matches if x.source is not t), default=0.0) > 0.8:
+                    strong_parents[id(r)] = strong_parents.get(id(r), 0) + 1
+        doomed: List[Relationship] = []
+        for r in rels:
+            n = strong_parents.get(id(r))
+            if not n:
+                continue
+            weight = r.weight
+            for _ in range(n):
+                weight -= 0.1
+            if weight < 0.5:
+                doomed.append(r)
+                self.debug_string += f"Removed: {r}\n"
+            else:
+                r.weight = weight
+                stats.weakened += 1
+                self.debug_string += f"{r}   ({r.weight:0.00})\n"
+        if doomed:
+            stats.removed += len(remove_relationships(doomed))
 
     def get_parameters(self) -> dict:
         return {"interval": self.interval}
 
     def set_parameters(self, params: dict) -> None:
         self.interval = float(params.get("interval", self.interval))
-
-    # Utility for tests to cancel timer
-    def cancel_timer(self) -> None:
-        if self._timer is not None:
-            self._timer.cancel()
-            self._timer = None
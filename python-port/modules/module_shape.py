@@ -13,6 +13,9 @@ from vision.point_plus import PointPlus
 class ModuleShape(ModuleBase):
     """Combine geometric primitives into simple shapes."""
 
+    reads = frozenset({"vision.segments"})
+    writes = frozenset({"vision.shapes"})
+
     def __init__(self, segments: Iterable[Segment] | None = None, arcs: Iterable[Arc] | None = None):
         super().__init__()
         self.segments: List[Segment] = list(segments) if segments else []
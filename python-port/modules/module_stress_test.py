@@ -17,6 +17,9 @@ from uks import UKS
 class ModuleStressTest(ModuleBase):
     """Module providing utility methods for stress testing the UKS."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     Output: str = ""
 
     def __init__(self) -> None:
@@ -10,6 +10,9 @@ from .module_base import ModuleBase
 class ModuleUKS(ModuleBase):
     """Manage UKS persistence via ``UKS.save`` and ``UKS.load``."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self, label: str | None = None) -> None:
         super().__init__(label)
         self.file_name: str = ""
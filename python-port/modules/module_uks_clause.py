@@ -46,6 +46,9 @@ except Exception:  # pragma: no cover - fallback simple rules
 class ModuleUKSClause(ModuleBase):
     """Expose clause utilities for UKS manipulation."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self) -> None:
         super().__init__(label="ModuleUKSClause")
 
@@ -9,6 +9,11 @@ from uks import UKS
 class ModuleUKSQuery(ModuleBase):
     """Module providing regex-based queries over the UKS."""
 
+    reads = frozenset({"uks"})
+    # querying the UKS updates the hits, misses and last_used of the
+    # relationships it examines, so it must not overlap other UKS users
+    writes = frozenset({"uks"})
+
     def __init__(self):
         super().__init__()
         self.uks: UKS | None = None
@@ -7,6 +7,9 @@ from uks import UKS
 class ModuleUKSStatement(ModuleBase):
     """Module to parse simple statements and store them in the UKS."""
 
+    reads = frozenset({"uks"})
+    writes = frozenset({"uks"})
+
     def __init__(self):
         super().__init__()
         self.uks: UKS | None = None
@@ -165,6 +165,9 @@ class ModuleVision(ModuleBase):
     - Arc fitting and geometric analysis
     """
 
+    reads = frozenset({"vision.image"})
+    writes = frozenset({"vision.edges"})
+
     def __init__(self, image_path: Optional[str] = None):
         super().__init__()
         self.image_path = image_path
@@ -47,6 +47,9 @@ class ModuleVisionFindSegmentsAndArcs(ModuleBase):
     - Robust error handling
     """
 
+    reads = frozenset({"vision.edges"})
+    writes = frozenset({"vision.segments"})
+
     def __init__(self, edges: Iterable[PointPlus] | None = None):
         super().__init__()
         self.edges: List[PointPlus] = list(edges) if edges else []
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+"""Shared scheduler for the modules' background work.
+
+The agent modules used to run their work on ``threading.Timer`` chains: every
+tick created a new timer thread, which then started yet another thread for
+``do_the_work``, and nothing stopped a second pass from starting while the
+previous one was still running.  :class:`AgentScheduler` replaces those chains
+with a fixed pool of worker threads owned by the
+:class:`~modules.module_handler.ModuleHandler`.
+
+Each :class:`ScheduledJob` has its own interval and priority.  Workers take
+the highest priority job that is due, and a job is never started while its
+previous run is still going.  Runs missed while a job was busy (or while every
+worker was) are coalesced into a single run and counted in
+:attr:`ScheduledJob.coalesced`.  A CPU budget, the fraction of one CPU a job
+may use, pushes the next run back after an expensive one.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class ScheduledJob:
+    """A callable run every ``interval`` seconds by an :class:`AgentScheduler`."""
+
+    name: str
+    func: Callable[[], None]
+    interval: float
+    priority: int = 0
+    # fraction of one CPU the job may use, ``None`` for no limit
+    cpu_budget: Optional[float] = None
+    next_run: float = 0.0
+    running: bool = False
+    runs: int = 0
+    # due times that passed without a run of their own
+    coalesced: int = 0
+    last_seconds: float = 0.0
+    last_cpu: float = 0.0
+    last_error: Optional[BaseException] = None
+    removed: bool = False
+
+
+class AgentScheduler:
+    """Run :class:`ScheduledJob` objects on a bounded pool of threads.
+
+    Parameters
+    ----------
+    max_workers:
+        Number of worker threads, and so the most jobs running at once.
+    clock:
+        Monotonic time source, replaceable in tests.
+    """
+
+    def __init__(self, max_workers: int = 2, clock: Callable[[], float] = time.monotonic) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.clock = clock
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._cond = threading.Condition()
+        self._workers: List[threading.Thread] = []
+        self._stopping = False
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+    def add(
+        self,
+        name: str,
+        func: Callable[[], None],
+        interval: float,
+        *,
+        priority: int = 0,
+        cpu_budget: Optional[float] = None,
+        delay: Optional[float] = None,
+    ) -> ScheduledJob:
+        """Schedule *func* every *interval* seconds under *name*.
+
+        The first run is *delay* seconds from now, one interval by default.
+        A job already registered under *name* is replaced; if it is running
+        the new job waits for it to finish before its own first run.
+        """
+
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if cpu_budget is not None and cpu_budget <= 0:
+            raise ValueError("cpu_budget must be positive")
+        job = ScheduledJob(name, func, interval, priority, cpu_budget)
+        job.next_run = self.clock() + (interval if delay is None else delay)
+        with self._cond:
+            old = self._jobs.get(name)
+            if old is not None:
+                old.removed = True
+                job.running = old.running
+            self._jobs[name] = job
+            self._cond.notify_all()
+        return job
+
+    def remove(self, name: str) -> bool:
+        """Stop scheduling *name*; a run in progress is left to finish."""
+        with self._cond:
+            job = self._jobs.pop(name, None)
+            if job is None:
+                return False
+            job.removed = True
+            self._cond.notify_all()
+        return True
+
+    def get(self, name: str) -> Optional[ScheduledJob]:
+        with self._cond:
+            return self._jobs.get(name)
+
+    @property
+    def jobs(self) -> List[ScheduledJob]:
+        with self._cond:
+            return list(self._jobs.values())
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Start the worker threads if they are not running yet."""
+        with self._cond:
+            if self._workers:
+                return
+            self._stopping = False
+            for i in range(self.max_workers):
+                thread = threading.Thread(target=self._work, name=f"agent-scheduler-{i}", daemon=True)
+                self._workers.append(thread)
+                thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop the workers, waiting up to *timeout* for running jobs."""
+        with self._cond:
+            self._stopping = True
+            workers, self._workers = self._workers, []
+            self._cond.notify_all()
+        for thread in workers:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def run_due(self) -> int:
+        """Run every job that is due now in the calling thread.
+
+        Useful when driving modules step by step.  Each job runs at most
+        once per call; returns the number of jobs run.
+        """
+
+        now = self.clock()
+        count = 0
+        while True:
+            with self._cond:
+                job = self._claim(now)
+            if job is None:
+                return count
+            self._run(job)
+            count += 1
+
+    def _work(self) -> None:
+        with self._cond:
+            while not self._stopping:
+                now = self.clock()
+                job = self._claim(now)
+                if job is None:
+                    self._cond.wait(self._wait_time(now))
+                    continue
+                self._cond.release()
+                try:
+                    self._run(job)
+                finally:
+                    self._cond.acquire()
+
+    def _claim(self, now: float) -> Optional[ScheduledJob]:
+        # called with the lock held
+        best: Optional[ScheduledJob] = None
+        for job in self._jobs.values():
+            if job.running or job.next_run > now:
+                continue
+            if best is None or (-job.priority, job.next_run) < (-best.priority, best.next_run):
+                best = job
+        if best is not None:
+            best.running = True
+        return best
+
+    def _wait_time(self, now: float) -> Optional[float]:
+        # called with the lock held; ``None`` waits for a notify
+        pending = [j.next_run for j in self._jobs.values() if not j.running]
+        if not pending:
+            return None
+        return max(0.0, min(pending) - now)
+
+    def _run(self, job: ScheduledJob) -> None:
+        start = self.clock()
+        cpu = time.thread_time()
+        error: Optional[BaseException] = None
+        try:
+            job.func()
+        except Exception as exc:  # keep the worker alive
+            error = exc
+        end = self.clock()
+        cpu = time.thread_time() - cpu
+        with self._cond:
+            job.running = False
+            job.runs += 1
+            job.last_seconds = end - start
+            job.last_cpu = cpu
+            job.last_error = error
+            # one catch-up run for however many due times were missed
+            missed = int((end - job.next_run) // job.interval)
+            if missed > 0:
+                job.coalesced += missed
+            job.next_run = max(start + job.interval, end)
+            if job.cpu_budget is not None:
+                job.next_run = max(job.next_run, start + cpu / job.cpu_budget)
+            replacement = self._jobs.get(job.name)
+            if job.removed and replacement is not None:
+                replacement.running = False
+            self._cond.notify_all()
+
+
+__all__ = ["AgentScheduler", "ScheduledJob"]
@@ -41,7 +41,10 @@ class DummyMenu:
     assert application.mru[0] == project
 
     # reset everything
+    old_handler = application.module_handler
     application.new_project()
+    assert not old_handler.scheduler.running
+    assert application.module_handler is not old_handler
     assert not application.network.neurons
     assert all(t.Label != "A" for t in application.uks.UKSList)
 
@@ -9,3 +9,16 @@ def test_cli_runs(tmp_path):
     project.write_text(json.dumps({"network": {}, "uks": {}, "modules": []}), encoding="utf-8")
     root = Path(__file__).resolve().parents[1]
     subprocess.run([sys.executable, "cli.py", str(project), "--ticks", "0"], cwd=root, check=True)
+
+
+def test_cli_stats_report(tmp_path):
+    project = tmp_path / "proj.json"
+    modules = [{"class": "ModuleMine", "label": "ModuleMine", "params": {}}]
+    project.write_text(json.dumps({"network": {}, "uks": {}, "modules": modules}), encoding="utf-8")
+    root = Path(__file__).resolve().parents[1]
+    result = subprocess.run(
+        [sys.executable, "cli.py", str(project), "--ticks", "3", "--stats"],
+        cwd=root, check=True, capture_output=True, text=True,
+    )
+    row = next(line for line in result.stdout.splitlines() if line.startswith("ModuleMine"))
+    assert row.split()[1:3] == ["step", "3"]
@@ -31,3 +31,33 @@ def test_module_add_counts_creates_aggregate_relationships():
     assert uks.get_relationship("thing", "has-attr.2", "group") is not None
 
 
+
+
+def test_add_counts_vectorised_and_plain_counting_agree():
+    import modules.module_add_counts as add_counts
+    from modules.agent_pass import PassContext
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    unknown = uks.labeled("unknownObject")
+    fruit = uks.add_thing("fruit", unknown)
+    berry = uks.add_thing("berry", fruit)
+    nut = uks.add_thing("nut", fruit)
+    targets = [uks.add_thing(f"berry{i}", berry) for i in range(12)]
+    targets += [uks.add_thing(f"nut{i}", nut) for i in range(8)]
+    targets.append(uks.add_thing("lonely", unknown))
+
+    mod = ModuleAddCounts()
+    mod.set_uks(uks)
+    # first-seen order, as the ancestors of berry0 are met first
+    expected = [(berry, 12), (fruit, 20), (nut, 8)]
+    assert len(targets) >= add_counts.NUMPY_MIN_TARGETS
+    assert mod._get_attribute_counts(targets, PassContext(uks)) == expected
+    threshold = add_counts.NUMPY_MIN_TARGETS
+    add_counts.NUMPY_MIN_TARGETS = len(targets) + 1
+    try:
+        assert mod._get_attribute_counts(targets, PassContext(uks)) == expected
+    finally:
+        add_counts.NUMPY_MIN_TARGETS = threshold
+    uks.shutdown()
@@ -39,3 +39,70 @@ def test_attribute_bubble_conflicting_children():
     mod.do_the_work()
     assert uks.get_relationship(parent, color, red) is None
     assert uks.get_relationship(parent, color, blue) is None
+
+
+def test_attribute_bubble_only_revisits_dirty_parents():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    mod = ModuleAttributeBubble()
+    mod.set_uks(uks)
+    color = uks.get_or_add_thing("color", uks.labeled("Object"))
+    red = uks.get_or_add_thing("red", color)
+    green = uks.get_or_add_thing("green", color)
+    fruit = uks.get_or_add_thing("Fruit", uks.labeled("Object"))
+    for i in range(20):
+        uks.get_or_add_thing(f"Tool{i}", uks.labeled("Object"))
+    apples = [uks.get_or_add_thing(f"apple{i}", fruit) for i in range(3)]
+    for apple in apples:
+        apple.add_relationship(color, red)
+    mod.do_the_work()
+    assert mod.last_processed == len(uks.UKSList)
+    for _ in range(10):
+        mod.do_the_work()
+    # the bubbled weight has converged and nothing else changed, so the
+    # pass does not walk the store
+    assert mod.run_pass().visited == 0
+    assert mod.last_processed == 0
+    assert uks.get_relationship(fruit, color, red).weight == 0.99
+
+    pear = uks.get_or_add_thing("pear", fruit)
+    pear.add_relationship(color, green)
+    agent_pass = mod.run_pass()
+    # only Fruit and the ancestors its bubbled edges touched are revisited
+    assert 1 <= mod.last_processed <= 3
+    assert agent_pass.visited < len(uks.UKSList) // 2
+    mod.set_uks(None)
+    uks.shutdown()
+
+
+def test_relationships_conflict_uses_exclusive_groups():
+    from modules.module_attribute_bubble import RelDest, _ConflictMemo
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    mod = ModuleAttributeBubble()
+    mod.set_uks(uks)
+    root = uks.labeled("Object")
+    has_prop = uks.get_or_add_thing("hasProperty", root)
+    color = uks.get_or_add_thing("color", root)
+    size = uks.get_or_add_thing("size", root)
+    color.add_relationship(has_prop, uks.get_or_add_thing("isExclusive", root))
+    red = uks.get_or_add_thing("red", color)
+    blue = uks.get_or_add_thing("blue", color)
+    big = uks.get_or_add_thing("big", size)
+    small = uks.get_or_add_thing("small", size)
+    is_ = uks.get_or_add_thing("is", root)
+    is_not = uks.get_or_add_thing("isNot", root)
+    is_not.add_relationship(uks.get_or_add_thing("hasAttribute", root), uks.get_or_add_thing("not", root))
+
+    mod._memo = _ConflictMemo(uks)
+    assert mod._memo.groups(red) == {color}
+    assert mod._relationships_conflict(RelDest(is_, red), RelDest(is_, blue))
+    assert not mod._relationships_conflict(RelDest(is_, big), RelDest(is_, small))
+    assert not mod._relationships_conflict(RelDest(is_, red), RelDest(is_, big))
+    assert mod._relationships_conflict(RelDest(is_, big), RelDest(is_not, big))
+    mod._memo = None
+    mod.set_uks(None)
+    uks.shutdown()
@@ -1,4 +1,5 @@
 from modules.module_balance_tree import ModuleBalanceTree
+from modules.module_handler import AGENT_PASS_JOB, ModuleHandler
 from uks import UKS, ThingLabels, transient_relationships
 
 
@@ -20,18 +21,21 @@ def test_balance_tree_splits_children():
     assert any(t.Label.startswith("root") and t is not root for t in nodes)
 
 
-def test_balance_tree_timer_reset():
+def test_balance_tree_scheduled_by_handler():
     ThingLabels.clear_label_list()
     transient_relationships.clear()
-    uks = UKS()
-    module = ModuleBalanceTree()
-    module.set_uks(uks)
-    module.interval = 0.1
-    module.on_start()
-    assert module._timer is not None
-    module.reset()
-    assert module._timer is None
-    module.on_stop()
+    handler = ModuleHandler()
+    module = handler.activate("ModuleBalanceTree")
+    # agents run in the handler's shared agent pass, not a job of their own
+    assert handler.scheduler.get(module.label) is None
+    job = handler.scheduler.get(AGENT_PASS_JOB)
+    assert job is not None and job.interval == module.interval
+    module.interval = 0.5
+    handler.schedule(module)
+    assert handler.scheduler.get(AGENT_PASS_JOB).interval == 0.5
+    handler.deactivate(module.label)
+    assert handler.scheduler.get(AGENT_PASS_JOB) is None
+    handler.shutdown()
 
 
 def test_balance_tree_parameter_roundtrip():
@@ -39,3 +43,36 @@ def test_balance_tree_parameter_roundtrip():
     module.set_parameters({"max_children": 3, "interval": 5.0})
     params = module.get_parameters()
     assert params["max_children"] == 3 and params["interval"] == 5.0
+
+
+def _reference_split(children, max_children):
+    # the original one-child-at-a-time algorithm, on plain lists
+    kids = {"t": list(children)}
+    made = 0
+    while len(kids["t"]) > max_children:
+        new = f"t{made}"
+        made += 1
+        kids["t"].append(new)
+        kids[new] = []
+        while len(kids[new]) < max_children and kids["t"]:
+            kids[new].append(kids["t"].pop(0))
+    return kids
+
+
+def test_balance_tree_plan_matches_incremental_split():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    t = uks.get_or_add_thing("t", uks.labeled("Object"))
+    for i in range(40):
+        uks.get_or_add_thing(f"c{i}", t)
+    module = ModuleBalanceTree()
+    module.set_uks(uks)
+    module.max_children = 6
+    module.handle_excessive_children(t)
+
+    expected = _reference_split([f"c{i}" for i in range(40)], 6)
+    for label, kids in expected.items():
+        assert [c.Label for c in uks.labeled(label).Children] == kids
+    uks.shutdown()
+
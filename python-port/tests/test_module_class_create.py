@@ -25,4 +25,4 @@ def test_module_class_create_creates_subclass():
     assert new_parent is not None
     assert new_parent in cat.Parents and new_parent in dog.Parents
     assert animal not in cat.Parents
-    module.cancel_timer()
+    handler.shutdown()
@@ -5,7 +5,7 @@ from pathlib import Path
 # Allow importing modules from the python-port directory
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from modules import ModuleBase, ModuleHandler
+from modules import ModuleBase, ModuleHandler, step_dependencies
 from uks import UKS, ThingLabels, transient_relationships
 
 
@@ -81,3 +81,242 @@ def test_uks_relationships():
     a = uks.labeled("A")
     assert a.relationships[0].reltype.Label == "parent"
     assert a.relationships[0].target.Label == "B"
+
+
+def test_agent_modules_share_one_pass():
+    from modules import AgentVisitor, PassContext
+    from modules.agent_pass import topological_order
+
+    class Recorder(ModuleBase, AgentVisitor):
+        def initialize(self) -> None:
+            self.seen = []
+
+        def fire(self) -> None:
+            pass
+
+        def visit(self, t, ctx: PassContext) -> None:
+            self.seen.append(t)
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    handler = ModuleHandler()
+    handler.register(Recorder)
+    uks = handler.the_uks
+    agents = [handler.activate(name) for name in (
+        "ModuleAttributeBubble", "ModuleAddCounts", "ModuleRemoveRedundancy",
+        "ModuleClassCreate", "ModuleBalanceTree", "Recorder")]
+    for m in agents:
+        m.is_enabled = True
+    handler.shutdown()
+    recorder = agents[-1]
+    agents[3].min_common_attributes = 2
+
+    animal = uks.get_or_add_thing("Animal", uks.labeled("Object"))
+    color = uks.get_or_add_thing("color", uks.labeled("Object"))
+    brown = uks.get_or_add_thing("brown", color)
+    # created before its parent links exist, so list order is not topological
+    puppy = uks.get_or_add_thing("puppy")
+    dog = uks.get_or_add_thing("dog", animal)
+    puppy.add_parent(dog)
+    for name in ("cat", "cow"):
+        uks.get_or_add_thing(name, animal).add_relationship(color, brown)
+
+    agent_pass = handler.run_agent_pass()
+    assert agent_pass.visited == len(recorder.seen)
+    assert len({id(t) for t in recorder.seen}) == len(recorder.seen)
+    order = [id(t) for t in recorder.seen]
+    assert [t.Label for t in topological_order([puppy, dog])] == ["Object", "Animal", "dog", "puppy"]
+    assert order.index(id(dog)) < order.index(id(puppy))
+    # the class creator grouped the brown animals and the bubbler saw them
+    assert uks.labeled("Animal.color.brown") is not None
+    assert "Bubbler Finished" in agents[0].debug_string
+    for m in agents:
+        handler.deactivate(m.label)
+
+
+def test_scheduled_agents_run_together_when_due():
+    from modules import AgentScheduler, AgentVisitor
+    from modules.module_handler import AGENT_PASS_JOB
+
+    class Clock:
+        now = 0.0
+
+        def __call__(self) -> float:
+            return self.now
+
+    passes = []
+
+    class Fast(ModuleBase, AgentVisitor):
+        def initialize(self) -> None:
+            self.interval = 1.0
+
+        def fire(self) -> None:
+            pass
+
+        def begin_pass(self, ctx) -> None:
+            passes[-1].append(self.label)
+
+        def visit(self, t, ctx) -> None:
+            pass
+
+    class Slow(Fast):
+        def initialize(self) -> None:
+            self.interval = 3.0
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    clock = Clock()
+    handler = ModuleHandler()
+    handler.scheduler = AgentScheduler(clock=clock)
+    for cls in (Fast, Slow):
+        handler.register(cls)
+        handler.activate(cls.__name__)
+    handler.scheduler.stop()
+    # one job for both agents, as often as the more frequent one
+    assert [(j.name, j.interval) for j in handler.scheduler.jobs] == [(AGENT_PASS_JOB, 1.0)]
+
+    for now in (1.0, 2.0, 3.0, 4.0):
+        clock.now = now
+        passes.append([])
+        assert handler.scheduler.run_due() == 1
+    assert passes == [["Fast", "Slow"], ["Fast"], ["Fast"], ["Fast", "Slow"]]
+    handler.shutdown()
+
+
+def test_fire_modules_steps_independent_modules_concurrently():
+    import threading
+
+    both_running = threading.Barrier(2, timeout=5)
+    order = []
+
+    class Vision(ModuleBase):
+        reads = frozenset({"vision.image"})
+        writes = frozenset({"vision.edges"})
+
+        def initialize(self) -> None:
+            pass
+
+        def fire(self) -> None:
+            both_running.wait()
+            order.append(self.label)
+
+    class Knowledge(Vision):
+        reads = frozenset({"uks"})
+        writes = frozenset({"uks"})
+
+    class Shapes(Vision):
+        reads = frozenset({"vision.edges"})
+        writes = frozenset({"vision.shapes"})
+
+        def fire(self) -> None:
+            order.append(self.label)
+
+    handler = ModuleHandler(step_workers=4)
+    for cls in (Vision, Knowledge, Shapes, DummyModule):
+        handler.register(cls)
+    vision, knowledge, shapes, dummy = (
+        handler.activate(n) for n in ("Vision", "Knowledge", "Shapes", "DummyModule"))
+    assert step_dependencies(handler.active_modules) == [set(), set(), {0}, {0, 1, 2}]
+
+    # Vision and Knowledge meet at the barrier, so they must run at once
+    handler.fire_modules()
+    assert set(order[:2]) == {"Vision", "Knowledge"} and order[2] == "Shapes"
+    assert dummy.counter == 3
+    handler.shutdown()
+
+
+def test_module_stats_record_steps_mutations_and_allocations():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    # a second store the module also writes to; its changes are not counted
+    other = UKS()
+    a, likes, b = (other.get_or_add_thing(label) for label in ("a", "likes", "b"))
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+
+    class Writer(ModuleBase):
+        reads = frozenset({"uks"})
+        writes = frozenset({"uks"})
+
+        def initialize(self) -> None:
+            self.ticks = 0
+
+        def fire(self) -> None:
+            self.ticks += 1
+            self.the_uks.add_statement(f"thing{self.ticks}", "is-a", "Object")
+            a.remove_relationship(a.add_relationship(likes, b))
+            self.junk = [object() for _ in range(1000)]
+
+    handler = ModuleHandler(step_workers=1)
+    handler.register(Writer)
+    writer = handler.activate("Writer")
+    handler.fire_modules()
+    assert handler.stats() == []
+
+    seen = []
+    for event in ("add", "remove", "update"):
+        handler.the_uks.on(event, seen.append)
+    handler.enable_stats(sample_every=2)
+    for _ in range(4):
+        handler.fire_modules()
+    handler.disable_stats()
+    for event in ("add", "remove", "update"):
+        handler.the_uks.off(event, seen.append)
+    handler.fire_modules()
+
+    (stats,) = handler.stats()
+    assert (stats.module, stats.kind, stats.calls, stats.errors) == ("Writer", "step", 4, 0)
+    assert stats.latency.count == 4 and stats.latency.total > 0
+    assert stats.mutations == len(seen) >= 4
+    assert stats.alloc_samples == 2 and stats.alloc_peak > 0
+    assert "Writer" in handler.instrumentation.report()
+    assert stats.to_dict()["calls"] == 4
+    assert writer.ticks == 6
+    handler.shutdown()
+    other.shutdown()
+
+
+def test_agent_pass_stats_break_down_by_module():
+    from modules import AgentVisitor, PassContext
+    from modules.module_handler import AGENT_PASS_JOB
+
+    class Tagger(ModuleBase, AgentVisitor):
+        def initialize(self) -> None:
+            pass
+
+        def fire(self) -> None:
+            pass
+
+        def visit(self, t, ctx: PassContext) -> None:
+            pass
+
+        def end_pass(self, ctx: PassContext) -> None:
+            self.the_uks.add_statement("tagged", "is-a", "Object")
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    handler = ModuleHandler()
+    handler.register(Tagger)
+    names = ("ModuleAttributeBubble", "ModuleAddCounts", "ModuleRemoveRedundancy",
+             "ModuleClassCreate", "ModuleBalanceTree", "Tagger")
+    agents = [handler.activate(name) for name in names]
+    for m in agents:
+        m.is_enabled = True
+    handler.shutdown()
+    handler.the_uks.get_or_add_thing("dog", handler.the_uks.get_or_add_thing("Animal"))
+
+    handler.enable_stats(sample_every=1)
+    handler.run_agent_pass()
+    handler.run_agent_pass()
+    handler.disable_stats()
+
+    rows = {(s.module, s.kind): s for s in handler.stats()}
+    assert set(rows) == {(m.label, "work") for m in agents} | {(AGENT_PASS_JOB, "work")}
+    for m in agents:
+        stats = rows[(m.label, "work")]
+        assert stats.calls == 2 and stats.errors == 0 and stats.alloc_samples == 2
+        assert 0 < stats.latency.total <= rows[(AGENT_PASS_JOB, "work")].latency.total
+    assert rows[("Tagger", "work")].mutations >= 1
+    assert rows[(AGENT_PASS_JOB, "work")].calls == 2
+    for m in agents:
+        handler.deactivate(m.label)
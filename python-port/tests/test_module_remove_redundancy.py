@@ -31,3 +31,39 @@ def test_module_remove_redundancy_prunes_child_attributes():
     assert uks.get_relationship("child", "has-color", "red") is None
     assert uks.get_relationship("child", "has-color", "blue") is None
 
+
+
+def test_module_remove_redundancy_single_sweep_and_stats():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    reltype = uks.get_or_add_thing("has-color")
+    red = uks.get_or_add_thing("red")
+    animal = uks.get_or_add_thing("animal")
+    pet = uks.get_or_add_thing("pet")
+    dog = uks.get_or_add_thing("dog")
+    dog.add_parent(animal)
+    dog.add_parent(pet)
+    animal.add_relationship(reltype, red, weight=0.9)
+    pet.add_relationship(reltype, red, weight=0.7)
+    # many attributes that would each have restarted the old sweep
+    shades = [uks.get_or_add_thing(f"shade{i}") for i in range(50)]
+    for shade in shades:
+        animal.add_relationship(reltype, shade, weight=1.0)
+        dog.add_relationship(reltype, shade, weight=0.95)
+    dog.add_relationship(reltype, red, weight=0.9)
+
+    mod = ModuleRemoveRedundancy()
+    mod.set_uks(uks)
+    mod.do_the_work()
+
+    # only the strong parent counts, and each relationship is weakened once
+    assert abs(uks.get_relationship(dog, reltype, red).weight - 0.8) < 1e-9
+    assert all(abs(uks.get_relationship(dog, reltype, s).weight - 0.85) < 1e-9 for s in shades)
+    assert mod.last_stats.weakened == 51 and mod.last_stats.removed == 0
+    for _ in range(4):
+        mod.do_the_work()
+    assert all(uks.get_relationship(dog, reltype, s) is None for s in shades)
+    assert mod.last_stats.removed >= 50
+    assert f"removed {mod.last_stats.removed}" in mod.debug_string
+    uks.shutdown()
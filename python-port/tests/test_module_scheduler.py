@@ -0,0 +1,86 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from modules import AgentScheduler
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_scheduler_priorities_coalescing_and_budget():
+    clock = FakeClock()
+    scheduler = AgentScheduler(clock=clock)
+    order = []
+
+    def slow():
+        order.append("slow")
+        clock.now += 3.5  # three and a half intervals
+
+    scheduler.add("low", lambda: order.append("low"), 1.0)
+    scheduler.add("high", lambda: order.append("high"), 1.0, priority=5)
+    assert scheduler.run_due() == 0
+    clock.now = 1.0
+    assert scheduler.run_due() == 2
+    assert order == ["high", "low"]
+
+    # a run that overruns its interval is followed by one catch-up run
+    job = scheduler.add("slow", slow, 1.0, delay=0.0)
+    scheduler.remove("low")
+    scheduler.remove("high")
+    order.clear()
+    assert scheduler.run_due() == 1
+    assert job.coalesced == 3 and job.next_run == clock.now
+    assert scheduler.run_due() == 1
+    assert order == ["slow", "slow"] and job.runs == 2
+
+    # a CPU budget pushes the next run back after an expensive one
+    def busy():
+        end = time.thread_time() + 0.05
+        while time.thread_time() < end:
+            pass
+
+    scheduler.remove("slow")
+    clock.now = 100.0
+    job = scheduler.add("busy", busy, 0.001, cpu_budget=0.01, delay=0.0)
+    assert scheduler.run_due() == 1
+    assert job.last_cpu >= 0.05
+    assert job.next_run >= 100.0 + job.last_cpu / 0.01
+
+
+def test_scheduler_never_overlaps_a_job():
+    scheduler = AgentScheduler(max_workers=3)
+    lock = threading.Lock()
+    active = []
+    peak = []
+    finished = threading.Event()
+
+    def work():
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+        if len(peak) >= 4:
+            finished.set()
+
+    job = scheduler.add("agent", work, 0.005, delay=0.0)
+    scheduler.start()
+    try:
+        assert finished.wait(5)
+        # the same workers serve every run
+        workers = [t for t in threading.enumerate() if t.name.startswith("agent-scheduler")]
+        assert len(workers) == 3
+    finally:
+        scheduler.stop(timeout=1)
+    assert max(peak) == 1
+    assert job.runs >= 4 and job.coalesced > 0
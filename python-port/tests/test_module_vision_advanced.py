@@ -6,7 +6,7 @@ sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from modules.module_vision_find_segments_and_arcs import ModuleVisionFindSegmentsAndArcs
 from modules.module_shape import ModuleShape
-from modules.module_mental_model import ModuleMentalModel
+from modules.module_mental_model import MentalModelObject, ModuleMentalModel, SpatialRelationship
 from vision import PointPlus, Segment
 
 
@@ -32,3 +32,29 @@ def test_shape_and_mental_model():
     mm = ModuleMentalModel()
     mm.ingest_shapes(shapes)
     assert mm.get_shape_count("rectangle") == 1
+
+
+def test_mental_model_stores_int_then_float_properties():
+    from uks import UKS, ThingLabels, transient_relationships
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    mm = ModuleMentalModel()
+    mm.set_uks(uks)
+    box, ball = MentalModelObject("box", "shape"), MentalModelObject("ball", "shape")
+    box.add_property("area", 4)
+    mm.objects = {"box": box, "ball": ball}
+    mm._update_uks_representations()
+    box.add_property("area", 4.5)
+    mm.spatial_relationships.append(SpatialRelationship("box", "ball", "near"))
+    mm._update_uks_representations()
+    assert uks.values.get(uks.labeled("box"), "area") == 4.5
+    assert uks.get_relationship("box", "near", "ball") is not None
+
+    # without numpy the values are kept as relationships, as before
+    uks.values.enabled = False
+    ball.add_property("radius", 2)
+    mm._update_uks_representations()
+    assert uks.get_relationship("ball", "radius", "2") is not None
+    uks.shutdown()
@@ -0,0 +1,40 @@
+import json
+import sys
+from pathlib import Path
+
+# Allow importing from python-port directory
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from tools.benchmark import compare, main, report, run_suite
+
+
+def test_run_suite_reports_each_benchmark():
+    results = run_suite(
+        [300],
+        ["scale-free", "deep"],
+        only=["query:source", "query:created_after", "agent:ModuleBalanceTree", "save", "load"],
+    )
+    names = {(r.name, r.topology) for r in results}
+    assert ("add_relationship", "deep") in names
+    assert ("agent:ModuleBalanceTree", "scale-free") in names
+    assert ("query:reltype", "deep") not in names
+    for r in results:
+        assert r.size == 300 and r.skipped is None
+        assert r.seconds >= 0 and r.peak_bytes > 0
+    data = report(results)
+    assert json.loads(json.dumps(data))["results"][0]["per_op"] is not None
+
+
+def test_agent_limit_and_regression_check(tmp_path):
+    out = tmp_path / "bench.json"
+    assert main(["--sizes", "100", "--topology", "wide", "--only", "agent", "get_relationship",
+                 "--agent-max", "50", "--no-memory", "--output", str(out)]) == 0
+    data = json.loads(out.read_text())
+    agents = [r for r in data["results"] if r["name"].startswith("agent:")]
+    assert len(agents) == 6 and all(r["skipped"] for r in agents)
+    assert all(r["peak_bytes"] is None for r in data["results"])
+
+    slower = json.loads(out.read_text())
+    for r in slower["results"]:
+        r["seconds"] *= 2
+    assert compare(data, slower) and not compare(slower, data)
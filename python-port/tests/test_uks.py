@@ -1,4 +1,5 @@
 import time
+import pytest
 import sys
 from pathlib import Path
 
@@ -120,3 +121,322 @@ def test_query_regex():
     labels = {r.source.Label for r in res}
     assert labels == {"cat", "car"}
     uks.shutdown()
+
+
+def test_top_k_tracks_weight_and_hits():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    weak = uks.add_relationship("cat", "likes", "fish", weight=0.2)
+    mid = uks.add_relationship("cat", "likes", "milk", weight=0.5)
+    strong = uks.add_relationship("cat", "likes", "mice", weight=0.9)
+    other = uks.add_relationship("dog", "likes", "bones", weight=0.7)
+
+    assert uks.top_k(source="cat", k=2, by="weight") == [strong, mid]
+    assert uks.top_k(reltype="likes", k=2, by="weight") == [strong, other]
+
+    weak.weight = 1.0
+    assert uks.top_k(source="cat", reltype="likes", k=1, by="weight") == [weak]
+
+    # counters changed by hand are reported; query() reports its own
+    mid.hits = 50
+    strong.misses = 50
+    uks.note_usage([mid, strong])
+    assert uks.top_k(source="cat", k=3) == [weak, mid, strong]
+    for _ in range(200):
+        uks.query(source="cat", target="mice")
+    # the query's misses sink the other two
+    assert uks.top_k(source="cat", k=3) == [strong, mid, weak]
+
+    uks.remove_relationship(weak)
+    assert uks.top_k(source="cat", k=5) == [strong, mid]
+    assert uks.top_k(source="unknown thing", k=5) == []
+    uks.shutdown()
+
+
+def test_second_store_leaves_the_first_stores_things_alone():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    uks.add_relationship("cat", "likes", "fish", weight=0.5)
+    second = UKS()
+    assert uks.labeled("cat") in second.UKSList
+
+    strong = uks.add_relationship("cat", "likes", "mice", weight=100)
+    assert uks.top_k(source="cat", k=1, by="weight") == [strong]
+    assert strong not in second.top_k(source="cat", k=5, by="weight")
+    second.shutdown()
+
+    # once the first store is shut down a new one takes its Things over
+    uks.shutdown()
+    third = UKS()
+    newer = third.add_relationship("cat", "likes", "milk", weight=200)
+    assert third.top_k(source="cat", k=1, by="weight") == [newer]
+    third.shutdown()
+
+
+def test_query_time_ranges():
+    from datetime import datetime, timedelta
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    old = uks.add_relationship("cat", "likes", "fish")
+    new = uks.add_relationship("cat", "likes", "milk")
+    day_ago = datetime.now() - timedelta(days=1)
+    old.created = day_ago
+    old.last_used = day_ago
+    uks.note_usage([old])
+
+    recent = uks.query(created_after=datetime.now() - timedelta(seconds=10), reltype="likes")
+    assert [r.target.Label for r in recent] == ["milk"]
+
+    stale = uks.query(last_used_before=datetime.now() - timedelta(hours=1), reltype="likes")
+    assert [r.target.Label for r in stale] == ["fish"]
+    # the query touched the relationship so it is no longer stale
+    assert uks.query(last_used_before=datetime.now() - timedelta(hours=1)) == []
+    uks.shutdown()
+
+
+def test_time_filtered_query_only_counts_examined_relationships():
+    from datetime import datetime, timedelta
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    old = uks.add_relationship("cat", "likes", "fish")
+    new = uks.add_relationship("cat", "likes", "milk")
+    day_ago = datetime.now() - timedelta(days=1)
+    old.created = day_ago
+    untouched = old.last_used
+
+    # a relationship outside the time range is not examined ...
+    uks.query(created_after=datetime.now() - timedelta(hours=1), target="nothing")
+    assert (old.hits, old.misses, old.last_used) == (0, 0, untouched)
+    assert (new.hits, new.misses) == (0, 1)
+
+    # ... while an unfiltered query of the same Thing examines every one
+    uks.query(source="cat", target="nothing")
+    assert (old.misses, new.misses) == (1, 2)
+    uks.shutdown()
+
+
+def test_time_filtered_query_walks_a_selective_source():
+    from datetime import datetime, timedelta
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    for i in range(50):
+        uks.add_relationship(f"dog{i}", "likes", "bone")
+    old = uks.add_relationship("cat", "likes", "fish")
+    new = uks.add_relationship("cat", "likes", "milk")
+    old.created = datetime.now() - timedelta(days=1)
+    index = uks._time_indexes["created"]
+    ranges = []
+    scan = index.range
+    index.range = lambda *args: ranges.append(args) or scan(*args)
+
+    recent = uks.query(source="cat", created_after=datetime.now() - timedelta(hours=1))
+    assert [r.target.Label for r in recent] == ["milk"]
+    assert ranges == []
+    # the relationship outside the range is still not examined
+    assert (old.hits, old.misses, new.hits) == (0, 0, 1)
+    assert uks.query(source="nobody", created_after=datetime.now() - timedelta(hours=1)) == []
+
+    # without a source the time range is read from the index
+    assert len(uks.query(created_after=datetime.now() - timedelta(hours=1), reltype="likes")) == 51
+    assert len(ranges) == 1
+    uks.shutdown()
+
+
+def test_collect_garbage_removes_orphans_and_low_value_things():
+    from uks import GarbagePolicy
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    kept = uks.add_relationship("cat", "likes", "fish", weight=1.0)
+    uks.add_relationship("dog", "likes", "bone", weight=0.1)
+    uks.get_or_add_thing("orphan", uks.labeled("Object"))
+
+    report = uks.collect_garbage(GarbagePolicy(min_age=0.0, ignore_parent_links=True))
+    assert report.things_removed == ["orphan"]
+    assert report.bytes_reclaimed > 0
+    assert uks.labeled("orphan") is None
+
+    report = uks.collect_garbage(GarbagePolicy(min_age=0.0, min_value=0.2, ignore_parent_links=True))
+    assert set(report.things_removed) == {"dog", "bone"}
+    assert report.relationships_removed == 3
+    assert uks.labeled("dog") is None and uks.labeled("cat") is not None
+    assert uks.get_relationship("cat", "likes", "fish") is kept
+    assert uks.labeled("dog") not in uks.UKSList
+    assert uks.collect_garbage(GarbagePolicy()).things_removed == []
+    uks.shutdown()
+
+
+def test_collect_garbage_keeps_taxonomy_leaves():
+    from uks import GarbagePolicy
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    animal = uks.get_or_add_thing("Animal", uks.labeled("Object"))
+    uks.get_or_add_thing("dog", animal)
+
+    assert uks.collect_garbage(GarbagePolicy(min_age=0.0)).things_removed == []
+    assert uks.labeled("dog") in animal.Children
+    uks.shutdown()
+
+
+def test_diff_and_merge_snapshots():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    uks.add_relationship("cat", "likes", "fish", weight=0.5)
+    uks.add_relationship("cat", "likes", "milk")
+    uks.add_relationship("dog", "likes", "bone")
+    snapshot = uks.to_dict()
+    nightly = [dict(s) for s in snapshot["statements"] if (s["reltype"], s["target"]) != ("likes", "bone")]
+    for s in nightly:
+        if (s["reltype"], s["target"]) == ("likes", "fish"):
+            s["weight"] = 0.9
+    nightly.append({"source": "cow", "reltype": "likes", "target": "grass", "weight": 1.0, "ttl": None})
+    nightly = {"statements": nightly}
+
+    delta = uks.diff(nightly)
+    assert delta.summary() == {"added": 1, "removed": 1, "changed": 1}
+    assert not uks.diff(snapshot)
+
+    events = []
+    uks.on("update", events.append)
+    applied = uks.merge(nightly)
+    assert applied.removed == []
+    assert uks.get_relationship("cat", "likes", "fish").weight == 0.9
+    assert uks.get_relationship("cow", "likes", "grass") is not None
+    assert uks.get_relationship("dog", "likes", "bone") is not None
+    assert len(events) == 1
+
+    uks.merge(nightly, strategy="replace")
+    assert uks.get_relationship("dog", "likes", "bone") is None
+    assert not uks.diff(nightly)
+    uks.shutdown()
+
+
+def test_checkpoint_rollback_restores_structure():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    uks.add_relationship("cat", "likes", "fish", weight=0.5)
+    animal = uks.get_or_add_thing("animal")
+    cat = uks.labeled("cat")
+    cat.add_parent(animal)
+    before = uks.to_dict()
+    things = list(uks.UKSList)
+    cp = uks.checkpoint()
+    fish = uks.get_relationship("cat", "likes", "fish")
+    fish.weight = 0.8
+    cat.remove_parent(animal)
+    uks.add_relationship("cat", "chases", "mouse")
+    uks.delete_thing(uks.labeled("fish"))
+    inner = uks.checkpoint()
+    uks.add_relationship("dog", "likes", "bone")
+
+    assert uks.rollback(cp) > 0
+    assert not uks.diff(before)
+    assert set(uks.UKSList) == set(things) and len(uks.UKSList) == len(things)
+    assert uks.get_relationship("cat", "likes", "fish") is fish
+    assert fish.weight == 0.5 and fish.target is uks.labeled("fish")
+    assert animal in cat.Parents
+    assert uks.labeled("mouse") is None and uks.labeled("dog") is None
+    assert uks.top_k(source="cat", reltype="likes") == [fish]
+    with pytest.raises(ValueError):
+        uks.rollback(inner)
+
+    # the checkpoint survives a rollback and can be released to keep changes
+    uks.add_relationship("cat", "likes", "milk")
+    uks.release(cp)
+    assert uks.get_relationship("cat", "likes", "milk") is not None
+    with pytest.raises(ValueError):
+        uks.rollback(cp)
+    assert len(uks._undo) == 0
+    uks.shutdown()
+
+
+def test_typed_value_columns():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    shapes = [uks.get_or_add_thing(f"shape{i}") for i in range(5)]
+    for i, shape in enumerate(shapes):
+        uks.values.set(shape, "area", 10.0 * i)
+        uks.values.set(shape, "color", [i, 0.0, 1.0])
+    uks.values.set(shapes[0], "sides", 3)
+
+    assert uks.values.get(shapes[2], "area") == 20.0
+    assert uks.values.range("area", 15, 35) == shapes[2:4]
+    assert [t for t, _ in uks.values.nearest("color", [3.2, 0, 1], k=2)] == [shapes[3], shapes[4]]
+    assert uks.labeled("20.0") is None
+    # an int column widens to float on the first float write
+    uks.values.set(shapes[1], "sides", 2.5)
+    assert uks.values.columns["sides"].kind == "float"
+    assert (uks.values.get(shapes[0], "sides"), uks.values.get(shapes[1], "sides")) == (3.0, 2.5)
+    with pytest.raises(TypeError):
+        uks.values.set(shapes[1], "sides", [1.0, 2.0, 3.0])
+
+    data = uks.to_dict()
+    uks.delete_thing(shapes[2])
+    assert uks.values.range("area", 15, 35) == [shapes[3]]
+    uks.from_dict(data)
+    restored = uks.labeled("shape2")
+    assert uks.values.items(restored) == {"area": 20.0, "color": pytest.approx([2.0, 0.0, 1.0])}
+
+    # values are outside the checkpoint log: a rollback keeps them as they are
+    cp = uks.checkpoint()
+    uks.values.set(restored, "area", 99.0)
+    uks.rollback(cp)
+    assert uks.values.get(restored, "area") == 99.0
+    uks.shutdown()
+
+
+def test_label_bloom_filter_and_shards():
+    from uks.bloom import BloomFilter
+    from uks import thing_labels
+
+    bloom = BloomFilter(capacity=16)
+    keys = [f"key{i}" for i in range(200)]
+    for key in keys:
+        bloom.add(key)
+    assert bloom.layers > 1
+    assert all(key in bloom for key in keys)
+    false_hits = sum(f"other{i}" in bloom for i in range(2000))
+    assert false_hits < 100
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    things = [uks.get_or_add_thing(f"item{i}") for i in range(100)]
+    # the labels spread over several shards and all resolve case-insensitively
+    assert sum(1 for shard in ThingLabels._shards if shard) > 1
+    assert all(ThingLabels.get_thing(f"ITEM{i}") is t for i, t in enumerate(things))
+    assert ThingLabels.get_thing("never-seen") is None
+    assert not ThingLabels._bloom.might_contain_hash(hash("never-seen"))
+    assert thing_labels.SHARDS == len(ThingLabels._locks)
+    uks.delete_thing(things[0])
+    assert ThingLabels.get_thing("item0") is None
+    assert uks.get_or_add_thing("item1*") is not things[1]
+    uks.shutdown()
+
+
+def test_uks_reparent_moves_children_in_one_batch():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    old = uks.get_or_add_thing("old", uks.labeled("Object"))
+    new = uks.get_or_add_thing("new", uks.labeled("Object"))
+    kids = [uks.get_or_add_thing(f"k{i}", old) for i in range(5)]
+    assert uks.reparent((k, old, new) for k in kids[:3]) == 3
+    assert old.Children == kids[3:]
+    assert new.Children == kids[:3]
+    assert kids[0].Parents == [new]
+    uks.shutdown()
@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from uks import UKS, ThingLabels, transient_relationships, Change, ChangeFeed, FeedGapError, apply_changes
+
+
+def test_change_feed_records_and_replays():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    primary = UKS()
+    feed = ChangeFeed(primary)
+    start = feed.last_seq
+    primary.add_relationship("cat", "likes", "fish", weight=0.5)
+    rel = primary.add_relationship("cat", "likes", "milk")
+    rel.weight = 0.3
+    primary.add_relationship("dog", "likes", "bone")
+    primary.remove_statement("dog", "likes", "bone")
+
+    changes = feed.changes_since(start)
+    likes = [c for c in changes if c.statement.reltype == "likes"]
+    assert [(c.op, c.statement.target) for c in likes] == [("add", "fish"), ("update", "milk"), ("remove", "bone")]
+    assert feed.changes_since(feed.last_seq) == []
+    shipped = [c.to_dict() for c in changes]
+    primary.shutdown()
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    replica = UKS()
+    assert apply_changes(replica, [Change.from_dict(d) for d in shipped]) == max(c.seq for c in changes)
+    assert replica.get_relationship("cat", "likes", "fish").weight == 0.5
+    assert replica.get_relationship("cat", "likes", "milk").weight == 0.3
+    assert replica.get_relationship("dog", "likes", "bone") is None
+    replica.shutdown()
+
+
+def test_change_feed_capacity_gap():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    feed = ChangeFeed(uks, capacity=2)
+    for i in range(5):
+        uks.add_relationship("a", "r", f"t{i}")
+    with pytest.raises(FeedGapError):
+        feed.changes_since(0)
+    assert len(feed.changes_since(feed.last_seq - 2, compact=False)) == 2
+    feed.detach()
+    uks.shutdown()
+
+
+def test_change_feed_replicates_promotion_and_cleared_ttl():
+    from datetime import timedelta
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    primary = UKS()
+    feed = ChangeFeed(primary)
+    inferred = primary.get_or_add_thing("cat").add_relationship(
+        primary.get_or_add_thing("is-a"), primary.get_or_add_thing("animal"), inferred=True
+    )
+    expiring = primary.add_relationship("cat", "wants", "food", ttl=60)
+    start = feed.last_seq
+
+    # promotion with an unchanged weight, and a ttl removed on the primary
+    assert primary.add_statement("cat", "is-a", "animal") is inferred and not inferred.inferred
+    expiring.time_to_live = timedelta.max
+    changes = feed.changes_since(start)
+    assert {(c.op, c.statement.target, c.statement.ttl) for c in changes} == {
+        ("update", "animal", None),
+        ("update", "food", None),
+    }
+    primary.shutdown()
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    replica = UKS()
+    rel = replica.add_relationship("cat", "wants", "food", ttl=60)
+    apply_changes(replica, changes)
+    assert replica.get_relationship("cat", "is-a", "animal") is not None
+    assert rel.time_to_live == timedelta.max and rel not in transient_relationships
+    replica.shutdown()
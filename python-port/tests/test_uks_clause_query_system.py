@@ -22,3 +22,86 @@ def test_clause_and_hits_misses():
     assert rel.hits == 1 and rel.misses == 0
     assert rel2.misses == 1 and rel2.hits == 0
     uks.shutdown()
+
+
+def test_rule_engine_fires_incrementally():
+    from uks import RuleEngine
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    animal = uks.get_or_add_thing("animal")
+    happy = uks.add_relationship("animal", "is", "happy")
+    fed = uks.add_relationship("animal", "has", "food")
+    uks.add_clause(happy, "IF", fed)
+    uks.add_clause(uks.add_relationship("animal", "is", "content"), "IF", happy)
+    rex = uks.get_or_add_thing("rex", animal)
+    tom = uks.get_or_add_thing("tom", animal)
+
+    engine = RuleEngine(uks)
+    assert uks.get_relationship(rex, "is", "happy") is None
+
+    uks.add_relationship(rex, "has", "food")
+    assert uks.get_relationship(rex, "is", "happy") is not None
+    assert uks.get_relationship(rex, "is", "content") is not None
+    assert uks.get_relationship(tom, "is", "happy") is None
+    assert engine.firings == 2
+
+    uks.remove_statement(rex, "has", "food")
+    assert uks.get_relationship(rex, "is", "happy") is None
+    assert uks.get_relationship(rex, "is", "content") is None
+    engine.detach()
+    uks.shutdown()
+
+
+def test_rule_engine_tracks_ground_conditions():
+    from uks import RuleEngine
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    animal = uks.get_or_add_thing("animal")
+    happy = uks.add_relationship("animal", "is", "happy")
+    uks.add_clause(happy, "IF", uks.add_relationship("sun", "is", "shining"))
+    rex = uks.get_or_add_thing("rex", animal)
+
+    engine = RuleEngine(uks)
+    assert uks.get_relationship(rex, "is", "happy") is not None
+
+    # the fact is about the sun, not about rex
+    uks.remove_statement("sun", "is", "shining")
+    assert uks.get_relationship(rex, "is", "happy") is None
+    uks.add_relationship("sun", "is", "shining")
+    assert uks.get_relationship(rex, "is", "happy") is not None
+    uks.remove_statement("sun", "is", "shining")
+    assert uks.get_relationship(rex, "is", "happy") is None
+    engine.detach()
+    uks.shutdown()
+
+
+def test_multi_hop_pattern_match():
+    from uks import PatternQuery
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    fruit = uks.get_or_add_thing("fruit")
+    uks.get_or_add_thing("apple", fruit)
+    uks.get_or_add_thing("banana", fruit)
+    uks.get_or_add_thing("kiwi", fruit)
+    uks.add_relationship("apple", "hasColor", "red")
+    uks.add_relationship("banana", "hasColor", "yellow")
+    uks.add_relationship("kiwi", "hasColor", "green")
+    uks.add_relationship("red", "is", "warm")
+    uks.add_relationship("yellow", "is", "warm")
+
+    patterns = [("?x", "has-child", "?y"), ("?y", "hasColor", "?z"), ("?z", "is", "warm")]
+    results = list(uks.match(patterns))
+    assert {(b["x"].Label, b["y"].Label, b["z"].Label) for b in results} == {
+        ("fruit", "apple", "red"),
+        ("fruit", "banana", "yellow"),
+    }
+    # the most selective pattern is planned first
+    assert PatternQuery(uks, patterns).plan()[0].terms[1].Label == "is"
+    assert list(uks.match([("?x", "hasColor", "purple")])) == []
+    uks.shutdown()
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from uks import UKS, ThingLabels, transient_relationships, InferenceEngine
+
+
+def test_transitive_closure_add_and_remove():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    uks.add_statement("isPartOf", "hasProperty", "isTransitive")
+    engine = InferenceEngine(uks)
+    uks.add_statement("finger", "isPartOf", "hand")
+    uks.add_statement("hand", "isPartOf", "arm")
+    uks.add_statement("arm", "isPartOf", "body")
+
+    rel = uks.get_relationship("finger", "isPartOf", "body")
+    assert rel is not None and rel.inferred
+    assert all(s.target != "body" or s.source != "finger" for s in uks.export_statements())
+
+    uks.remove_statement("hand", "isPartOf", "arm")
+    assert uks.get_relationship("finger", "isPartOf", "body") is None
+    assert uks.get_relationship("finger", "isPartOf", "hand") is not None
+    assert uks.get_relationship("arm", "isPartOf", "body") is not None
+
+    # an asserted edge that is also derivable survives as an inferred one
+    uks.add_statement("hand", "isPartOf", "arm")
+    uks.add_statement("finger", "isPartOf", "arm")
+    uks.remove_statement("finger", "isPartOf", "arm")
+    assert uks.get_relationship("finger", "isPartOf", "arm").inferred
+    engine.detach()
+    uks.shutdown()
+
+
+def test_commutative_and_inverse_edges():
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    engine = InferenceEngine(uks)
+    uks.add_statement("marriedTo", "hasProperty", "isCommutative")
+    uks.add_statement("hasPart", "inverseOf", "partOf")
+    uks.add_statement("alice", "marriedTo", "bob")
+    uks.add_statement("car", "hasPart", "wheel")
+
+    assert uks.get_relationship("bob", "marriedTo", "alice").inferred
+    assert uks.get_relationship("wheel", "partOf", "car").inferred
+
+    uks.remove_statement("car", "hasPart", "wheel")
+    assert uks.get_relationship("wheel", "partOf", "car") is None
+    engine.detach()
+    uks.shutdown()
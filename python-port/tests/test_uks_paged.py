@@ -0,0 +1,45 @@
+import gc
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from uks import ThingLabels, transient_relationships, PagedUKS
+
+
+def test_paged_uks_faults_evicts_and_persists(tmp_path):
+    path = str(tmp_path / "kb.db")
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = PagedUKS(path, capacity=8)
+    animal = uks.get_or_add_thing("animal", uks.labeled("Object"))
+    for i in range(40):
+        uks.add_relationship(f"pet{i}", "is-a", "animal", weight=i / 40)
+        uks.labeled(f"pet{i}").add_parent(animal)
+    uks.add_relationship("pet3", "likes", "pet4")
+
+    assert uks.pages.resident <= 8
+    assert uks.pages.evictions > 0
+    assert len(uks.UKSList) == 46
+    rel = uks.get_relationship("pet3", "likes", "pet4")
+    assert rel is not None and rel.target is uks.labeled("pet4")
+    assert len(uks.labeled("animal").Children) == 40
+    assert uks.labeled("pet7").Parents[-1].Label == "animal"
+    assert [r.source.Label for r in uks.top_k(reltype="is-a", k=2, by="weight")] == ["pet39", "pet38"]
+
+    # evicted relationships keep their identity while referenced
+    gc.collect()
+    assert uks.get_relationship("pet3", "likes", "pet4") is rel
+    rel.weight = 0.25
+    uks.remove_statement("pet5", "is-a", "animal")
+    uks.shutdown()
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    reopened = PagedUKS(path, capacity=8)
+    assert len(reopened.UKSList) == 46
+    assert reopened.get_relationship("pet3", "likes", "pet4").weight == 0.25
+    assert reopened.get_relationship("pet5", "is-a", "animal") is None
+    assert len(reopened.query(reltype="is-a")) == 39
+    reopened.shutdown()
+    assert ThingLabels._backing is None
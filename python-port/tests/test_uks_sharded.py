@@ -0,0 +1,52 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from uks import ShardedUKS, Statement
+
+
+def test_sharded_uks_routes_and_merges():
+    with ShardedUKS(shards=2) as store:
+        sources = ["cat", "dog", "bird", "fish", "cow", "pig"]
+        assert store.load_statements([Statement(s, "is-a", "animal") for s in sources]) == len(sources)
+        assert {store.shard_for(s) for s in sources} == {0, 1}
+
+        stmt = store.add_relationship("cat", "likes", "fish", weight=0.4)
+        assert stmt == Statement("cat", "likes", "fish", 0.4)
+        assert store.get_relationship("cat", "likes", "fish").weight == 0.4
+
+        animals = store.query(reltype="is-a", target="animal")
+        assert sorted(s.source for s in animals) == sorted(sources)
+        assert [s.target for s in store.query(source="cat", reltype="likes")] == ["fish"]
+
+        store.remove_statement("cat", "likes", "fish")
+        assert store.get_relationship("cat", "likes", "fish") is None
+        assert sum(s["relationships"] for s in store.stats()) > len(sources)
+
+
+def test_sharded_uks_keeps_ttl_and_serialises_concurrent_callers():
+    import threading
+
+    with ShardedUKS(shards=2) as store:
+        stmt = store.add_relationship("cat", "wants", "food", ttl=60)
+        assert stmt.ttl == 60
+        assert store.get_relationship("cat", "wants", "food").ttl == 60
+
+        labels = [f"thing{i}" for i in range(40)]
+        wrong = []
+
+        def worker(offset: int) -> None:
+            for label in labels[offset::4]:
+                store.add_relationship(label, "is-a", "animal")
+                stmt = store.get_relationship(label, "is-a", "animal")
+                if stmt is None or stmt.source != label:
+                    wrong.append(label)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert wrong == []
+        assert len(store.query(reltype="is-a")) == len(labels)
@@ -0,0 +1,45 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from uks import UKS, ThingLabels, transient_relationships, SQLiteEngine
+
+
+def test_sqlite_engine_queries_and_persists(tmp_path):
+    path = str(tmp_path / "kb.sqlite")
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    engine = SQLiteEngine(path)
+    uks = UKS(engine=engine)
+    with uks.transaction():
+        uks.add_relationship("cat", "likes", "fish", weight=0.5)
+        uks.add_relationship("cat", "likes", "milk")
+        uks.add_relationship("dog", "likes", "bone")
+        assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM relationships WHERE reltype = 'likes'").fetchone()[0] == 0
+    uks.labeled("cat").V = 3
+
+    likes = uks.query(reltype="likes", min_weight=0.8)
+    assert sorted((r.source.Label, r.target.Label) for r in likes) == [("cat", "milk"), ("dog", "bone")]
+    assert uks.get_relationship("cat", "likes", "milk").hits == 1
+    uks.query(source="cat", target="fish")
+    assert uks.get_relationship("cat", "likes", "milk").misses == 1
+    assert [r.target.Label for r in uks.query(source_regex="c.t", target_regex="m.*")] == ["milk"]
+    assert any("relationships_reltype" in step for step in engine.explain({"reltype": "likes", "target": "fish"}))
+    with uks.transaction():
+        uks.remove_statement("dog", "likes", "bone")
+
+    reader = sqlite3.connect(path)
+    assert reader.execute("SELECT COUNT(*) FROM relationships WHERE reltype = 'likes'").fetchone()[0] == 2
+    uks.shutdown()
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    reopened = UKS(engine=SQLiteEngine(path, readonly=True))
+    assert reopened.get_relationship("cat", "likes", "fish").weight == 0.5
+    assert reopened.get_relationship("dog", "likes", "bone") is None
+    assert reopened.labeled("cat").V == 3
+    assert reopened.labeled("animal") is None
+    assert [r.target.Label for r in reopened.query(source="cat", reltype="likes")] == ["fish", "milk"]
+    reopened.shutdown()
@@ -0,0 +1,448 @@
+"""Benchmark suite for the UKS and its agent modules.
+
+Builds a synthetic knowledge store of a given size and shape and times the
+core operations on it: creating Things and relationships, relationship
+lookup, every :meth:`UKS.query` filter, ``AncestorList``, TTL expiry,
+``save``/``load`` and each agent module's pass, alone and all five fused into
+one traversal.  Each benchmark records its wall time and, unless disabled,
+the peak memory allocated while it ran (via :mod:`tracemalloc`, which roughly
+doubles run times).  Results are emitted as JSON so runs from different
+releases can be compared::
+
+    python -m tools.benchmark --sizes 10000 100000 --topology deep scale-free \\
+        --output bench.json
+    python -m tools.benchmark --sizes 10000 --baseline bench.json
+
+Topologies
+----------
+``deep``
+    Binary tree of Things, so ancestor chains grow with ``log2(size)``.
+``wide``
+    Tree with a fan-out of 1000, two or three levels deep.
+``scale-free``
+    Each new Thing picks its parent by preferential attachment, giving a few
+    hubs with very many children and a long tail of leaves.
+
+Every Thing additionally gets an ``is colorN`` attribute so the agent modules
+and attribute queries have something to work on.  Agent modules mutate the
+store; each one runs inside a :meth:`UKS.checkpoint` which is rolled back
+(untimed) afterwards, so they all see the same graph.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Allow running as a script from the python-port directory
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from uks import UKS, Thing, ThingLabels, transient_relationships
+
+TOPOLOGIES = ("deep", "wide", "scale-free")
+
+# Number of distinct attribute values ("color0" ... "color9").
+ATTRIBUTE_VALUES = 10
+# Random lookups per sampled benchmark (get_relationship, AncestorList, ...).
+SAMPLES = 10_000
+WIDE_FANOUT = 1000
+
+# Agent modules are slow; above this many Things they are skipped by default.
+DEFAULT_AGENT_MAX = 10_000
+
+QUERY_CASES: Dict[str, Callable[["Context"], Dict[str, Any]]] = {
+    "source": lambda c: {"source": c.sample_label()},
+    "reltype": lambda c: {"reltype": "is"},
+    "target": lambda c: {"target": "color3"},
+    "source+reltype": lambda c: {"source": c.sample_label(), "reltype": "is"},
+    "source+target": lambda c: {"source": c.sample_label(), "target": "color3"},
+    "reltype+target": lambda c: {"reltype": "is", "target": "color3"},
+    "source+reltype+target": lambda c: {"source": c.sample_label(), "reltype": "is", "target": "color3"},
+    "source_regex": lambda c: {"source_regex": "n1[0-9]"},
+    "reltype_regex": lambda c: {"reltype_regex": "i."},
+    "target_regex": lambda c: {"target_regex": "color[0-4]"},
+    "min_weight": lambda c: {"reltype": "is", "min_weight": 0.5},
+    "max_ttl": lambda c: {"max_ttl": 60.0},
+    "include_inherited": lambda c: {"source": c.sample_label(), "include_inherited": True},
+    "created_after": lambda c: {"created_after": c.midpoint},
+    "last_used_before": lambda c: {"last_used_before": c.midpoint},
+}
+
+
+@dataclass
+class BenchmarkResult:
+    """Timing of one benchmark at one size and topology."""
+
+    name: str
+    topology: str
+    size: int
+    operations: int = 0
+    seconds: float = 0.0
+    peak_bytes: Optional[int] = None
+    skipped: Optional[str] = None
+
+    @property
+    def per_op(self) -> Optional[float]:
+        return self.seconds / self.operations if self.operations else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["per_op"] = self.per_op
+        return data
+
+
+@dataclass
+class Context:
+    """State shared by the benchmarks of one run."""
+
+    uks: UKS
+    things: List[Thing]
+    rng: random.Random
+    workdir: Path
+    # a time half way through building the graph, for the time filters
+    midpoint: datetime = field(default_factory=datetime.now)
+
+    def sample(self, k: int = SAMPLES) -> List[Thing]:
+        return [self.rng.choice(self.things) for _ in range(k)]
+
+    def sample_label(self) -> str:
+        return self.rng.choice(self.things).Label
+
+
+# ----------------------------------------------------------------------
+# Graph construction
+# ----------------------------------------------------------------------
+def _parent_index(topology: str, rng: random.Random) -> Callable[[int], int]:
+    """Return a function giving the index of the parent of node ``i > 0``."""
+
+    if topology == "deep":
+        return lambda i: (i - 1) // 2
+    if topology == "wide":
+        return lambda i: (i - 1) // WIDE_FANOUT
+    if topology == "scale-free":
+        # each node appears once for itself plus once per child it has
+        weighted = [0]
+
+        def pick(i: int) -> int:
+            parent = rng.choice(weighted)
+            weighted.extend((parent, i))
+            return parent
+
+        return pick
+    raise ValueError(f"Unknown topology: {topology}")
+
+
+def build_graph(uks: UKS, size: int, topology: str, rng: random.Random) -> List[Thing]:
+    """Populate *uks* with *size* Things in the given *topology*.
+
+    Node ``i`` is labelled ``n<i>``; node 0 is a child of ``Object``.
+    """
+
+    parent_of = _parent_index(topology, rng)
+    things: List[Thing] = []
+    for i in range(size):
+        parent = things[parent_of(i)] if i else uks.labeled("Object")
+        things.append(uks.get_or_add_thing(f"n{i}", parent))
+    return things
+
+
+def add_attributes(uks: UKS, things: Iterable[Thing], rng: random.Random) -> int:
+    color = uks.get_or_add_thing("color", uks.labeled("Object"))
+    values = [uks.get_or_add_thing(f"color{i}", color) for i in range(ATTRIBUTE_VALUES)]
+    is_ = uks.get_or_add_thing("is")
+    count = 0
+    for t in things:
+        uks.add_relationship(t, is_, rng.choice(values), weight=rng.choice((0.4, 0.9)))
+        count += 1
+    return count
+
+
+# ----------------------------------------------------------------------
+# Benchmarks
+# ----------------------------------------------------------------------
+def bench_get_relationship(ctx: Context) -> int:
+    is_ = ctx.uks.labeled("is")
+    color3 = ctx.uks.labeled("color3")
+    for t in ctx.sample():
+        ctx.uks.get_relationship(t, is_, color3)
+    return SAMPLES
+
+
+def bench_ancestor_list(ctx: Context) -> int:
+    for t in ctx.sample():
+        t.AncestorList()
+    return SAMPLES
+
+
+def _query_bench(name: str) -> Callable[[Context], int]:
+    make = QUERY_CASES[name]
+
+    def run(ctx: Context) -> int:
+        # queries for one source return little; repeat them for a stable time
+        repeat = 10 if "source" in make(ctx) else 1
+        for _ in range(repeat):
+            ctx.uks.query(**make(ctx))
+        return repeat
+
+    return run
+
+
+def bench_ttl_expiry(ctx: Context) -> Tuple[int, float]:
+    """Expire ``size / 100`` transient relationships in one sweep."""
+
+    count = max(1, len(ctx.things) // 100)
+    tmp = ctx.uks.get_or_add_thing("transientOf")
+    past = datetime.now() - timedelta(seconds=10)
+    for t in ctx.sample(count):
+        t.add_relationship(tmp, None, ttl=1.0).last_used = past
+    start = time.perf_counter()
+    ctx.uks.remove_expired_relationships()
+    return count, time.perf_counter() - start
+
+
+def bench_save(ctx: Context) -> int:
+    ctx.uks.save(str(ctx.workdir / "uks.json"))
+    return 1
+
+
+def bench_load(ctx: Context) -> int:
+    ctx.uks.load(str(ctx.workdir / "uks.json"))
+    return 1
+
+
+def _agent_bench(*cls_names: str) -> Callable[[Context], Tuple[int, float]]:
+    """Time one pass of the named agent modules, sharing a single traversal."""
+
+    def run(ctx: Context) -> Tuple[int, float]:
+        import modules
+
+        agents = [getattr(modules, name)() for name in cls_names]
+        for module in agents:
+            module.set_uks(ctx.uks)
+        cp = ctx.uks.checkpoint()
+        try:
+            start = time.perf_counter()
+            modules.AgentPass(ctx.uks, agents).run()
+            elapsed = time.perf_counter() - start
+        finally:
+            ctx.uks.rollback(cp)
+            ctx.uks.release(cp)
+            for module in agents:
+                module.set_uks(None)
+        return 1, elapsed
+
+    run.agent = True
+    return run
+
+
+AGENT_MODULES = (
+    "ModuleAddCounts",
+    "ModuleAttributeBubble",
+    "ModuleBalanceTree",
+    "ModuleClassCreate",
+    "ModuleRemoveRedundancy",
+)
+
+# Benchmarks run in this order against one graph; ``load`` replaces the
+# store and therefore comes last.
+BENCHMARKS: Dict[str, Callable[[Context], Any]] = {
+    "get_relationship": bench_get_relationship,
+    "AncestorList": bench_ancestor_list,
+    **{f"query:{name}": _query_bench(name) for name in QUERY_CASES},
+    "ttl_expiry": bench_ttl_expiry,
+    **{f"agent:{name}": _agent_bench(name) for name in AGENT_MODULES},
+    "agent:fused": _agent_bench(*AGENT_MODULES),
+    "save": bench_save,
+    "load": bench_load,
+}
+
+
+# ----------------------------------------------------------------------
+# Runner
+# ----------------------------------------------------------------------
+def _measure(fn: Callable[[], Any], memory: bool) -> Tuple[int, float, Optional[int]]:
+    """Run *fn* and return ``(operations, seconds, peak_bytes)``.
+
+    *fn* returns its operation count, or ``(count, seconds)`` when only part
+    of its work should be timed.
+    """
+
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        outcome = fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    if isinstance(outcome, tuple):
+        outcome, elapsed = outcome
+    return outcome, elapsed, peak
+
+
+def run_suite(
+    sizes: Iterable[int],
+    topologies: Iterable[str] = TOPOLOGIES,
+    *,
+    only: Optional[Iterable[str]] = None,
+    memory: bool = True,
+    agent_max: int = DEFAULT_AGENT_MAX,
+    seed: int = 0,
+) -> List[BenchmarkResult]:
+    """Run the selected benchmarks for every size and topology.
+
+    *only* holds benchmark names or prefixes such as ``"query"`` or
+    ``"agent"``; by default everything runs.
+    """
+
+    selected = list(only) if only else None
+
+    def wanted(name: str) -> bool:
+        return selected is None or any(name == s or name.startswith(s + ":") for s in selected)
+
+    if any(getattr(bench, "agent", False) and wanted(name) for name, bench in BENCHMARKS.items()):
+        # importing the module package is slow (it loads every module and
+        # their dependencies); do it before anything is timed
+        import modules  # noqa: F401
+
+    results: List[BenchmarkResult] = []
+    for topology in topologies:
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology: {topology}")
+        for size in sizes:
+            ThingLabels.clear_label_list()
+            transient_relationships.clear()
+            uks = UKS()
+            rng = random.Random(seed)
+            try:
+                with tempfile.TemporaryDirectory() as tmp:
+                    things: List[Thing] = []
+                    started = datetime.now()
+
+                    def build() -> int:
+                        things.extend(build_graph(uks, size, topology, rng))
+                        return size
+
+                    ops, secs, peak = _measure(build, memory)
+                    results.append(BenchmarkResult("add_thing", topology, size, ops, secs, peak))
+                    ops, secs, peak = _measure(lambda: add_attributes(uks, things, rng), memory)
+                    results.append(BenchmarkResult("add_relationship", topology, size, ops, secs, peak))
+
+                    midpoint = started + (datetime.now() - started) / 2
+                    ctx = Context(uks, things, rng, Path(tmp), midpoint)
+                    for name, bench in BENCHMARKS.items():
+                        if not wanted(name):
+                            continue
+                        result = BenchmarkResult(name, topology, size)
+                        if getattr(bench, "agent", False) and size > agent_max:
+                            result.skipped = f"size above agent limit {agent_max}"
+                        else:
+                            result.operations, result.seconds, result.peak_bytes = _measure(
+                                lambda: bench(ctx), memory
+                            )
+                        results.append(result)
+            finally:
+                uks.shutdown()
+    return results
+
+
+def report(results: List[BenchmarkResult], *, seed: int = 0) -> Dict[str, Any]:
+    """Wrap *results* with metadata describing the run."""
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "results": [r.to_dict() for r in results],
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.2) -> List[str]:
+    """Return descriptions of benchmarks more than *threshold* slower.
+
+    Benchmarks are matched on name, topology and size; ones missing from
+    either report or skipped in either are ignored.
+    """
+
+    def index(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        return {
+            f"{r['name']}/{r['topology']}/{r['size']}": r
+            for r in data.get("results", [])
+            if not r.get("skipped") and r.get("seconds")
+        }
+
+    old = index(baseline)
+    regressions = []
+    for key, new in index(current).items():
+        before = old.get(key)
+        if before is None:
+            continue
+        ratio = new["seconds"] / before["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append(f"{key}: {before['seconds']:.4f}s -> {new['seconds']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the UKS and agent modules")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000],
+                        help="Numbers of Things to build (default: 10000)")
+    parser.add_argument("--topology", nargs="+", choices=TOPOLOGIES, default=list(TOPOLOGIES),
+                        help="Graph shapes to benchmark (default: all)")
+    parser.add_argument("--only", nargs="+",
+                        help="Benchmark names or prefixes to run, e.g. query agent save")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip peak memory tracking for more accurate timings")
+    parser.add_argument("--agent-max", type=int, default=DEFAULT_AGENT_MAX,
+                        help="Largest size at which agent modules are run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown reported as a regression (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        args.sizes,
+        args.topology,
+        only=args.only,
+        memory=not args.no_memory,
+        agent_max=args.agent_max,
+        seed=args.seed,
+    )
+    data = report(results, seed=args.seed)
+    text = json.dumps(data, indent=2)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare(baseline, data, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
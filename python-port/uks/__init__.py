@@ -8,7 +8,19 @@ from .relationship import Relationship, Clause, QueryRelationship
 from .thing import Thing, transient_relationships
 from .thing_labels import ThingLabels
 from .statement import Statement
+from .garbage import GarbagePolicy, GarbageReport
 from .uks import UKS
+from .inference import InferenceEngine
+from .rules import Rule, RuleEngine
+from .pattern_query import PatternQuery
+from .sharded import ShardedUKS
+from .diff import UKSDiff
+from .change_feed import Change, ChangeFeed, FeedGapError, apply_changes
+from .checkpoint import Checkpoint
+from .paged import PagedUKS
+from .storage import StorageEngine, MemoryEngine, SQLiteEngine
+from .values import ValueColumn, ValueStore
+from .bloom import BloomFilter
 
 __all__ = [
     "Thing",
@@ -18,5 +30,25 @@ __all__ = [
     "ThingLabels",
     "UKS", 
     "Statement",
+    "GarbagePolicy",
+    "GarbageReport",
+    "InferenceEngine",
+    "Rule",
+    "RuleEngine",
+    "PatternQuery",
+    "ShardedUKS",
+    "UKSDiff",
+    "Change",
+    "ChangeFeed",
+    "FeedGapError",
+    "apply_changes",
+    "Checkpoint",
+    "PagedUKS",
+    "StorageEngine",
+    "MemoryEngine",
+    "SQLiteEngine",
+    "ValueColumn",
+    "ValueStore",
+    "BloomFilter",
     "transient_relationships",
 ]
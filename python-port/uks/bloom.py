@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+"""Compact set sketch of the labels held by a backing store.
+
+:class:`~uks.thing_labels.ThingLabels` consults it when a label is not in
+memory, so labels that were never stored skip the read from disk.
+
+:class:`BloomFilter` answers "definitely absent" or "possibly present".  It
+grows as a *scalable* Bloom filter: when the current layer has taken its
+planned number of keys a new, twice as large layer with a tighter error rate
+is added, so the overall false-positive rate stays below the configured
+bound without ever rebuilding the filter from the keys.
+
+Membership tests only read the bit arrays and take no lock.  Writers must be
+serialised by the caller, and a key must be added *before* it becomes
+visible elsewhere so a concurrent reader can never get a false negative.
+Keys cannot be removed; stale entries merely cost a read that finds
+nothing.
+"""
+
+import math
+from typing import List
+
+_MASK32 = 0xFFFFFFFF
+
+
+class _Layer:
+    __slots__ = ("bits", "size", "hashes", "capacity", "count")
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        size = max(64, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.size = size
+        self.hashes = max(1, int(round(size / capacity * math.log(2))))
+        self.bits = bytearray((size + 7) // 8)
+        self.capacity = capacity
+        self.count = 0
+
+    def add(self, h: int) -> None:
+        bits, size = self.bits, self.size
+        pos, step = h & _MASK32, ((h >> 32) & _MASK32) | 1
+        for _ in range(self.hashes):
+            pos %= size
+            bits[pos >> 3] |= 1 << (pos & 7)
+            pos += step
+        self.count += 1
+
+    def __contains__(self, h: int) -> bool:
+        bits, size = self.bits, self.size
+        pos, step = h & _MASK32, ((h >> 32) & _MASK32) | 1
+        for _ in range(self.hashes):
+            pos %= size
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+            pos += step
+        return True
+
+
+class BloomFilter:
+    """Scalable Bloom filter over string keys.
+
+    Parameters
+    ----------
+    capacity:
+        Keys the first layer is sized for.
+    error_rate:
+        Upper bound on the false-positive probability across all layers.
+    """
+
+    def __init__(self, capacity: int = 4096, error_rate: float = 0.01) -> None:
+        self.initial_capacity = capacity
+        self.error_rate = error_rate
+        self.clear()
+
+    def clear(self) -> None:
+        # the layer error rates form a geometric series summing to error_rate
+        self._layers: List[_Layer] = [_Layer(self.initial_capacity, self.error_rate / 2)]
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self._layers)
+
+    @property
+    def layers(self) -> int:
+        return len(self._layers)
+
+    @staticmethod
+    def key_hash(key: str) -> int:
+        return hash(key)
+
+    def add_hash(self, h: int) -> None:
+        layers = self._layers
+        if h in layers[-1]:
+            return
+        top = layers[-1]
+        if top.count >= top.capacity:
+            top = _Layer(top.capacity * 2, self.error_rate / 2 ** (len(layers) + 1))
+            # publish a new list so lock-free readers never see a half-built one
+            self._layers = layers + [top]
+        top.add(h)
+
+    def might_contain_hash(self, h: int) -> bool:
+        for layer in self._layers:
+            if h in layer:
+                return True
+        return False
+
+    def add(self, key: str) -> None:
+        self.add_hash(hash(key))
+
+    def __contains__(self, key: str) -> bool:
+        return self.might_contain_hash(hash(key))
+
+
+__all__ = ["BloomFilter"]
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+"""Sequence-numbered change feed for replicating a UKS.
+
+A :class:`ChangeFeed` attached to the primary store records every asserted
+relationship ``add``, ``update`` and ``remove`` as a :class:`Change` with a
+monotonically increasing sequence number.  A replica remembers the last
+sequence it applied, asks for :meth:`ChangeFeed.changes_since` that number and
+applies the result with :func:`apply_changes`, which writes through the bulk
+:meth:`UKS.load_statements` path.  Catching up therefore costs time in
+proportion to the number of changes rather than the size of the store.
+
+Changes serialise with :meth:`Change.to_dict` so they can be shipped between
+processes.  Inferred relationships are not recorded; replicas derive them
+again with their own :class:`~uks.inference.InferenceEngine`.
+"""
+
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .relationship import Relationship
+from .statement import Statement
+from .thing import remove_relationships, transient_relationships
+
+
+class FeedGapError(LookupError):
+    """Raised when requested changes have already been discarded."""
+
+
+@dataclass
+class Change:
+    seq: int
+    op: str
+    statement: Statement
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"seq": self.seq, "op": self.op, "statement": self.statement.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Change":
+        return cls(data["seq"], data["op"], Statement.from_dict(data["statement"]))
+
+
+class ChangeFeed:
+    """Record UKS relationship changes with sequence numbers.
+
+    Parameters
+    ----------
+    uks:
+        Store to observe.
+    capacity:
+        Maximum number of changes retained.  Older entries are dropped and a
+        replica that falls further behind gets :class:`FeedGapError` and must
+        resynchronise from a full snapshot.  ``None`` keeps everything.
+    """
+
+    def __init__(self, uks: "UKS", capacity: Optional[int] = None) -> None:
+        self.uks = uks
+        self.capacity = capacity
+        # identifies this feed so replicas notice when the primary restarts
+        self.epoch = uuid.uuid4().hex
+        self._log: List[Change] = []
+        self._first_seq = 1
+        self._lock = threading.Lock()
+        uks.on("add", self._on_add)
+        uks.on("update", self._on_update)
+        uks.on("remove", self._on_remove)
+
+    def detach(self) -> None:
+        self.uks.off("add", self._on_add)
+        self.uks.off("update", self._on_update)
+        self.uks.off("remove", self._on_remove)
+
+    def _on_add(self, rel: Relationship) -> None:
+        self._record("add", rel)
+
+    def _on_update(self, rel: Relationship) -> None:
+        self._record("update", rel)
+
+    def _on_remove(self, rel: Relationship) -> None:
+        self._record("remove", rel)
+
+    def _record(self, op: str, rel: Relationship) -> None:
+        if rel.inferred:
+            return
+        with self._lock:
+            self._log.append(Change(self.last_seq + 1, op, Statement.from_relationship(rel)))
+            if self.capacity is not None and len(self._log) > self.capacity:
+                drop = len(self._log) - self.capacity
+                del self._log[:drop]
+                self._first_seq += drop
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the most recent change (``0`` if none)."""
+        return self._first_seq + len(self._log) - 1
+
+    def changes_since(self, seq: int, *, compact: bool = True) -> List[Change]:
+        """Return changes with a sequence number greater than *seq*.
+
+        With ``compact`` only the latest change per ``(source, reltype,
+        target)`` triple is returned, so a relationship that was added,
+        re-weighted and removed again costs a single entry.
+        """
+
+        with self._lock:
+            if seq + 1 < self._first_seq:
+                raise FeedGapError(f"changes after {seq} were discarded; oldest kept is {self._first_seq}")
+            changes = self._log[max(seq + 1 - self._first_seq, 0):]
+        return compact_changes(changes) if compact else list(changes)
+
+
+def _key(st: Statement) -> Tuple[str, str, Optional[str]]:
+    return (st.source.lower(), st.reltype.lower(), st.target.lower() if st.target else None)
+
+
+def compact_changes(changes: Iterable[Change]) -> List[Change]:
+    """Keep only the latest change per ``(source, reltype, target)`` triple."""
+
+    latest: Dict[Tuple[str, str, Optional[str]], Change] = {}
+    for change in changes:
+        key = _key(change.statement)
+        latest.pop(key, None)
+        latest[key] = change
+    return list(latest.values())
+
+
+def apply_changes(uks: "UKS", changes: Iterable[Change]) -> int:
+    """Apply *changes* to *uks* in bulk and return the highest sequence seen."""
+
+    changes = list(changes)
+    last = max((c.seq for c in changes), default=0)
+    upserts: List[Statement] = []
+    removals: List[Relationship] = []
+    for change in compact_changes(changes):
+        st = change.statement
+        if change.op == "remove":
+            rel = uks.get_relationship(st.source, st.reltype, st.target)
+            if rel is not None:
+                removals.append(rel)
+        else:
+            upserts.append(st)
+    if removals:
+        remove_relationships(removals)
+    for st, rel in zip(upserts, uks.load_statements(upserts)):
+        # load_statements only ever raises weights and sets ttls; replicas
+        # mirror exactly
+        rel.weight = st.weight
+        if st.ttl is None and rel.time_to_live != timedelta.max:
+            rel.time_to_live = timedelta.max
+            if rel in transient_relationships:
+                transient_relationships.remove(rel)
+    return last
+
+
+__all__ = ["Change", "ChangeFeed", "FeedGapError", "apply_changes", "compact_changes"]
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+"""Undo-log checkpoints for cheap UKS rollback.
+
+While at least one checkpoint is open the :class:`UndoLog` owned by a
+:class:`~uks.UKS` records the inverse of every structural mutation:
+
+* relationships attached to or detached from a Thing;
+* changes to a relationship's ``weight``, ``time_to_live`` or ``inferred``
+  flag, with the previous value;
+* Things added to or deleted from the store.
+
+Taking a checkpoint only remembers the current length of the log, and rolling
+back replays the inverse operations recorded after it, newest first, so the
+cost is proportional to the number of mutations made since.  Removed
+relationships are restored as the very same objects, so clauses and other
+references to them stay valid.
+
+Usage counters (``hits``, ``misses`` and ``last_used``) are statistics that
+every query touches and are deliberately not logged, and neither are the
+typed values of :mod:`uks.values`.  Restored relationships
+and Things are appended to the end of their lists, so ``Children`` or
+``UKSList`` may come back in a different order.
+"""
+
+import itertools
+import threading
+from dataclasses import dataclass
+from typing import Dict, List
+
+from .relationship import Relationship
+from .thing import Thing, attach_relationship
+from .thing_labels import ThingLabels
+
+# Relationship attributes whose old values are logged.
+LOGGED_ATTRIBUTES = frozenset({"weight", "time_to_live", "inferred"})
+
+_ids = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    """Handle returned by :meth:`UKS.checkpoint`."""
+
+    id: int
+    position: int
+
+
+class UndoLog:
+    """Inverse operations recorded since the oldest open checkpoint."""
+
+    def __init__(self) -> None:
+        self._entries: List[tuple] = []
+        self._open: Dict[int, int] = {}
+        self._paused = False
+        self._lock = threading.RLock()
+
+    @property
+    def recording(self) -> bool:
+        return bool(self._open) and not self._paused
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def record_relationship(self, event: str, rel: Relationship) -> None:
+        if self.recording:
+            with self._lock:
+                self._entries.append((event, rel))
+
+    def record_attribute(self, rel: Relationship, name: str, old: object) -> None:
+        if self.recording and name in LOGGED_ATTRIBUTES:
+            with self._lock:
+                self._entries.append(("attribute", rel, name, old))
+
+    def record_thing(self, event: str, thing: Thing) -> None:
+        if self.recording:
+            with self._lock:
+                self._entries.append((event, thing))
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+    def mark(self) -> Checkpoint:
+        with self._lock:
+            cp = Checkpoint(next(_ids), len(self._entries))
+            self._open[cp.id] = cp.position
+            return cp
+
+    def release(self, cp: Checkpoint) -> None:
+        with self._lock:
+            self._open.pop(cp.id, None)
+            if not self._open:
+                self._entries.clear()
+            else:
+                # nothing before the oldest open checkpoint can be undone
+                oldest = min(self._open.values())
+                if oldest:
+                    del self._entries[:oldest]
+                    self._open = {k: pos - oldest for k, pos in self._open.items()}
+
+    def reset(self) -> None:
+        """Forget all checkpoints, e.g. after the store was replaced."""
+
+        with self._lock:
+            self._open.clear()
+            self._entries.clear()
+
+    def rollback(self, cp: Checkpoint, uks_list: List[Thing]) -> int:
+        """Undo everything recorded after *cp* and return how many entries.
+
+        *cp* stays open so it can be rolled back to again; checkpoints taken
+        after it are closed.
+        """
+
+        with self._lock:
+            position = self._open.get(cp.id)
+            if position is None:
+                raise ValueError("Checkpoint was released or rolled back past")
+            undo = self._entries[position:]
+            del self._entries[position:]
+            self._open = {k: pos for k, pos in self._open.items() if pos <= position}
+            self._paused = True
+            try:
+                self._apply(reversed(undo), uks_list)
+            finally:
+                self._paused = False
+            return len(undo)
+
+    @staticmethod
+    def _apply(entries, uks_list: List[Thing]) -> None:
+        # thing id -> [thing, present now, present at the checkpoint]
+        membership: Dict[int, List] = {}
+        for entry in entries:
+            kind = entry[0]
+            if kind == "add":
+                rel = entry[1]
+                rel.source.remove_relationship(rel)
+            elif kind == "remove":
+                rel = entry[1]
+                if not any(r is rel for r in rel.source.relationships):
+                    attach_relationship(rel)
+            elif kind == "attribute":
+                _, rel, name, old = entry
+                setattr(rel, name, old)
+            else:
+                thing = entry[1]
+                state = membership.setdefault(id(thing), [thing, kind == "thing_add", None])
+                state[2] = kind == "thing_remove"
+        dropped = set()
+        for thing, now, then in membership.values():
+            if now == then:
+                continue
+            if then:
+                ThingLabels.add_thing_label(thing.Label, thing)
+                uks_list.append(thing)
+            else:
+                if ThingLabels.get_thing(thing.Label) is thing:
+                    ThingLabels.remove_thing_label(thing.Label)
+                dropped.add(id(thing))
+        if dropped:
+            uks_list[:] = [t for t in uks_list if id(t) not in dropped]
+
+
+__all__ = ["Checkpoint", "UndoLog", "LOGGED_ATTRIBUTES"]
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+"""Structural diff and merge support for UKS snapshots.
+
+Both sides are reduced to a table keyed by the case-folded ``(source,
+reltype, target)`` triple, so comparing two stores is a pair of hash lookups
+per relationship.  :meth:`UKS.merge` then applies only the resulting
+additions, removals and weight changes in bulk instead of replaying every
+statement through :meth:`UKS.add_relationship`.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .statement import Statement
+
+TripleKey = Tuple[str, str, Optional[str]]
+
+MERGE_STRATEGIES = ("union", "max_weight", "replace")
+
+
+def triple_key(st: Statement) -> TripleKey:
+    return (st.source.lower(), st.reltype.lower(), st.target.lower() if st.target is not None else None)
+
+
+@dataclass
+class UKSDiff:
+    """Differences that turn one store into another.
+
+    ``changed`` holds ``(old, new)`` statement pairs for triples present on
+    both sides whose weight or TTL differ.
+    """
+
+    added: List[Statement] = field(default_factory=list)
+    removed: List[Statement] = field(default_factory=list)
+    changed: List[Tuple[Statement, Statement]] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    def summary(self) -> Dict[str, int]:
+        return {"added": len(self.added), "removed": len(self.removed), "changed": len(self.changed)}
+
+
+def statement_table(source: Union["UKS", Dict[str, Any], Iterable[Statement]]) -> Dict[TripleKey, Statement]:
+    """Return asserted statements of *source* keyed by triple.
+
+    *source* may be a :class:`UKS`, a dictionary produced by
+    :meth:`UKS.to_dict` or any iterable of :class:`Statement` objects.
+    """
+
+    if hasattr(source, "export_statements"):
+        statements: Iterable[Statement] = source.export_statements()
+    elif isinstance(source, dict):
+        statements = (Statement.from_dict(d) for d in source.get("statements", []))
+    else:
+        statements = source
+    return {triple_key(st): st for st in statements}
+
+
+def diff_tables(mine: Dict[TripleKey, Statement], theirs: Dict[TripleKey, Statement]) -> UKSDiff:
+    result = UKSDiff()
+    for key, st in theirs.items():
+        old = mine.get(key)
+        if old is None:
+            result.added.append(st)
+        elif old.weight != st.weight or old.ttl != st.ttl:
+            result.changed.append((old, st))
+    result.removed = [st for key, st in mine.items() if key not in theirs]
+    return result
+
+
+__all__ = ["UKSDiff", "MERGE_STRATEGIES", "diff_tables", "statement_table", "triple_key"]
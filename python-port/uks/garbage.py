@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+"""Garbage collection policy and reporting for :meth:`UKS.collect_garbage`.
+
+Agents such as ``ModuleBalanceTree`` and ``ModuleClassCreate`` create
+intermediate Things, and transient relationships leave their endpoints behind
+when they expire.  A :class:`GarbagePolicy` decides which of those Things are
+no longer carrying information so they can be removed in a single batch.
+"""
+
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import FrozenSet, List, Optional
+
+from .thing import Thing
+
+DEFAULT_PROTECTED = frozenset({"Object", "has-child", "unknownObject"})
+
+
+@dataclass
+class GarbagePolicy:
+    """Rules describing which Things are garbage.
+
+    Parameters
+    ----------
+    min_age:
+        Only Things created at least this many seconds ago are considered.
+    min_value:
+        Relationships with ``value`` below this threshold do not keep their
+        endpoints alive.  ``0.0`` means only Things with no relationships at
+        all are collected.
+    ignore_parent_links:
+        When ``True`` the ``has-child`` link from a parent does not count as a
+        relationship, so a childless Thing with no other edges is an orphan.
+        Off by default, since that also makes every plain taxonomy leaf
+        (``dog`` under ``Animal`` and nothing else) garbage.
+    protected:
+        Labels that are never collected.
+    """
+
+    min_age: float = 60.0
+    min_value: float = 0.0
+    ignore_parent_links: bool = False
+    protected: FrozenSet[str] = field(default_factory=lambda: DEFAULT_PROTECTED)
+
+    def is_garbage(self, thing: Thing, cutoff: datetime, has_child: Optional[Thing]) -> bool:
+        if thing.Label in self.protected or thing.created > cutoff:
+            return False
+        # Relationship types and parents of other Things are structural.
+        if thing.relationships_as_type:
+            return False
+        for r in thing.relationships:
+            if r.reltype is has_child or r.value >= self.min_value:
+                return False
+        for r in thing.relationships_from:
+            if self.ignore_parent_links and r.reltype is has_child:
+                continue
+            if r.value >= self.min_value:
+                return False
+        return True
+
+
+@dataclass
+class GarbageReport:
+    """Summary of a :meth:`UKS.collect_garbage` pass."""
+
+    things_removed: List[str] = field(default_factory=list)
+    relationships_removed: int = 0
+    bytes_reclaimed: int = 0
+
+
+def estimate_size(thing: Thing) -> int:
+    """Approximate memory held by *thing* and the relationships it owns."""
+
+    size = sys.getsizeof(thing) + sys.getsizeof(thing.__dict__) + sys.getsizeof(thing.Label)
+    for lst in (thing.relationships, thing.relationships_from, thing.relationships_as_type):
+        size += sys.getsizeof(lst)
+    for r in thing.relationships:
+        size += sys.getsizeof(r) + sys.getsizeof(r.__dict__)
+    for r in thing.relationships_from:
+        if r.source is not thing:
+            size += sys.getsizeof(r) + sys.getsizeof(r.__dict__)
+    return size
+
+
+__all__ = ["GarbagePolicy", "GarbageReport", "estimate_size"]
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+"""Materialised inference for transitive, commutative and inverse reltypes.
+
+Reltype semantics follow the conventions used in the C# knowledge bases::
+
+    isSimilarTo hasProperty isTransitive
+    isSimilarTo hasProperty isCommutative
+    has-part    inverseOf   part-of
+
+:class:`InferenceEngine` listens to the UKS ``add`` and ``remove`` events and
+keeps every entailed edge materialised as a relationship with
+``inferred=True``.  Because the transitive closure is stored, a query such as
+"is *a* related to *c*" is a single :meth:`UKS.get_relationship` call.
+
+Additions are propagated semi-naively.  Removals use delete/rederive: every
+inferred edge that depended on the removed one is deleted, then those with an
+alternative one-step derivation are restored and propagated again.  Inferred
+edges are skipped by :meth:`UKS.export_statements` so they are never saved.
+"""
+
+from typing import List, Optional, Tuple
+
+from .relationship import Relationship
+from .thing import Thing
+from .thing_labels import ThingLabels
+
+Fact = Tuple[Thing, Thing, Thing]
+
+RULE_PROPERTIES = {"isTransitive", "isCommutative"}
+
+
+class InferenceEngine:
+    """Keep edges entailed by reltype properties materialised in a UKS."""
+
+    def __init__(self, uks: "UKS") -> None:
+        self.uks = uks
+        uks.on("add", self._on_add)
+        uks.on("remove", self._on_remove)
+        self.rebuild()
+
+    def detach(self) -> None:
+        """Stop tracking changes.  Materialised edges are left in place."""
+        self.uks.off("add", self._on_add)
+        self.uks.off("remove", self._on_remove)
+
+    # ------------------------------------------------------------------
+    # Full recomputation
+    # ------------------------------------------------------------------
+    def rebuild(self) -> None:
+        """Drop all inferred edges and re-derive them from asserted ones."""
+
+        for thing in list(self.uks.UKSList):
+            for rel in list(thing.relationships):
+                if rel.inferred:
+                    thing.remove_relationship(rel)
+        base = [
+            (rel.source, rel.reltype, rel.target)
+            for thing in list(self.uks.UKSList)
+            for rel in thing.relationships
+            if rel.target is not None
+        ]
+        self._propagate(base)
+
+    # ------------------------------------------------------------------
+    # Event handlers
+    # ------------------------------------------------------------------
+    def _on_add(self, rel: Relationship) -> None:
+        if rel.inferred or rel.target is None:
+            return
+        if self._is_rule(rel):
+            self.rebuild()
+            return
+        self._propagate([(rel.source, rel.reltype, rel.target)])
+
+    def _on_remove(self, rel: Relationship) -> None:
+        if rel.inferred or rel.target is None:
+            return
+        if self._is_rule(rel):
+            self.rebuild()
+            return
+        removed: Fact = (rel.source, rel.reltype, rel.target)
+        # Over-delete everything reachable from the removed fact ...
+        doomed: List[Relationship] = []
+        seen = set()
+        work = [removed]
+        while work:
+            for fact in self._consequences(*work.pop()):
+                existing = self.uks.get_relationship(*fact)
+                if existing is not None and existing.inferred and id(existing) not in seen:
+                    seen.add(id(existing))
+                    doomed.append(existing)
+                    work.append(fact)
+        for r in doomed:
+            r.source.remove_relationship(r)
+        # ... then rederive whatever still has support.
+        restored: List[Fact] = []
+        for fact in [removed] + [(r.source, r.reltype, r.target) for r in doomed]:
+            if self.uks.get_relationship(*fact) is None and self._derivable(*fact):
+                fact[0].add_relationship(fact[1], fact[2], inferred=True)
+                restored.append(fact)
+        self._propagate(restored)
+
+    # ------------------------------------------------------------------
+    # Rules
+    # ------------------------------------------------------------------
+    def _is_rule(self, rel: Relationship) -> bool:
+        if rel.reltype.Label == "inverseOf":
+            return True
+        return rel.reltype.Label.lower() == "hasproperty" and rel.target.Label in RULE_PROPERTIES
+
+    def _has(self, reltype: Thing, prop_label: str) -> bool:
+        prop = ThingLabels.get_thing(prop_label)
+        return prop is not None and reltype.has_property(prop)
+
+    def _inverses(self, reltype: Thing) -> List[Thing]:
+        inverse_of = ThingLabels.get_thing("inverseOf")
+        if inverse_of is None:
+            return []
+        out = [r.target for r in reltype.relationships if r.reltype is inverse_of and r.target is not None]
+        out.extend(r.source for r in reltype.relationships_from if r.reltype is inverse_of)
+        return out
+
+    def _consequences(self, s: Thing, rt: Thing, t: Thing) -> List[Fact]:
+        """Facts derivable in one step from ``s rt t`` and the current store."""
+
+        out: List[Fact] = []
+        if self._has(rt, "isCommutative"):
+            out.append((t, rt, s))
+        for inv in self._inverses(rt):
+            out.append((t, inv, s))
+        if self._has(rt, "isTransitive"):
+            preds = [s] + [r.source for r in s.relationships_from if r.reltype is rt]
+            succs = [t] + [r.target for r in t.relationships if r.reltype is rt and r.target is not None]
+            out.extend((p, rt, q) for p in preds for q in succs if p is not s or q is not t)
+        return [f for f in out if f[0] is not f[2]]
+
+    def _derivable(self, s: Thing, rt: Thing, t: Thing) -> bool:
+        """Return ``True`` if ``s rt t`` follows in one step from existing edges."""
+
+        if self._has(rt, "isCommutative") and self.uks.get_relationship(t, rt, s) is not None:
+            return True
+        for inv in self._inverses(rt):
+            if self.uks.get_relationship(t, inv, s) is not None:
+                return True
+        if self._has(rt, "isTransitive"):
+            middle = {id(r.target) for r in s.relationships if r.reltype is rt and r.target is not None}
+            return any(r.reltype is rt and id(r.source) in middle for r in t.relationships_from)
+        return False
+
+    def _propagate(self, work: List[Fact]) -> None:
+        while work:
+            for fact in self._consequences(*work.pop()):
+                if self.uks.get_relationship(*fact) is None:
+                    fact[0].add_relationship(fact[1], fact[2], inferred=True)
+                    work.append(fact)
+
+    def inferred_relationships(self, source: Optional[Thing] = None) -> List[Relationship]:
+        """Return materialised edges, optionally restricted to *source*."""
+
+        things = [source] if source is not None else self.uks.UKSList
+        return [r for t in things for r in t.relationships if r.inferred]
+
+
+__all__ = ["InferenceEngine"]
@@ -0,0 +1,626 @@
+from __future__ import annotations
+
+"""Lazily paged UKS backend for stores larger than memory.
+
+:class:`PagedUKS` keeps Things and relationships in a SQLite file and only a
+bounded *resident set* of Things in memory:
+
+* ``ThingLabels.get_thing`` faults a Thing in from disk when its label is not
+  resident.  Faulted Things start as light shells whose ``relationships``,
+  ``relationships_from`` and ``relationships_as_type`` are :class:`PagedList`
+  objects read from disk on first use.
+* Every access moves a Thing to the front of an LRU list.  Once more than
+  ``capacity`` Things are resident the coldest ones have their label and
+  value written back, their adjacency lists dropped and their label removed
+  from the in-memory table.
+* Relationship additions, removals and attribute changes are written through
+  to a pending table and flushed to SQLite in one transaction before the
+  next read or once :data:`FLUSH_BATCH` have accumulated, so disk is always
+  authoritative for lists not in memory.
+
+Objects are kept unique through weak identity maps: as long as anything
+still references an evicted Thing or Relationship, faulting it in again
+returns the same object, so ``is`` comparisons throughout the code base keep
+working.  ``UKSList`` becomes a view that iterates the Things on disk.
+
+Things must enter the store through the UKS (``add_thing``,
+``get_or_add_thing`` and friends); clauses and the in-memory ``top_k`` and
+timestamp indexes are not paged, ``top_k`` is answered by SQL instead and
+time-filtered queries fall back to a scan.  Only one paged store can be
+active per process because the label table is global.
+"""
+
+import pickle
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .relationship import Relationship
+from .thing import Thing, transient_relationships
+from .thing_labels import ThingLabels
+from .uks import UKS
+
+RelKey = Tuple[int, int, int]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS things (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    label TEXT NOT NULL,
+    value BLOB,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    source INTEGER NOT NULL,
+    reltype INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    ttl REAL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    created REAL NOT NULL,
+    inferred INTEGER NOT NULL,
+    PRIMARY KEY (source, reltype, target)
+);
+CREATE INDEX IF NOT EXISTS relationships_target ON relationships(target);
+CREATE INDEX IF NOT EXISTS relationships_reltype ON relationships(reltype);
+"""
+
+# adjacency list attribute -> column selecting its rows
+_COLUMNS = {"relationships": "source", "relationships_from": "target", "relationships_as_type": "reltype"}
+
+_ORDER = {
+    "value": "weight * (hits + 1.0) / (hits + misses + 2.0)",
+    "weight": "weight",
+}
+
+_NO_TARGET = 0  # stored for property-only relationships
+
+# pending writes are flushed in one transaction once this many accumulate
+FLUSH_BATCH = 1024
+
+
+def _paged(method):
+    def wrapper(self, *args):
+        self._page_in()
+        return method(self, *args)
+
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+def _paged_update(method):
+    def wrapper(self, *args):
+        self._page_in()
+        before = list.__len__(self)
+        result = method(self, *args)
+        self._store._resize(list.__len__(self) - before)
+        return result
+
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+class PagedList(list):
+    """Adjacency list that is read from the page store on first use.
+
+    Until it is read, ``append`` and ``remove`` are no-ops: the change is
+    already on its way to disk and will be part of the list once loaded.
+    """
+
+    def __init__(self, store: "PageStore", owner: Thing, attr: str, items: Optional[Iterable] = None) -> None:
+        super().__init__(items if items is not None else ())
+        self._store = store
+        self._owner = weakref.ref(owner)
+        self._attr = attr
+        self.loaded = items is not None
+
+    def _page_in(self) -> None:
+        owner = self._owner()
+        if owner is not None:
+            self._store.page_in(self, owner, self._attr)
+
+    def _fill(self, items: List[Relationship]) -> None:
+        list.extend(self, items)
+        self.loaded = True
+        self._store._resize(len(items))
+
+    def append(self, rel: Relationship) -> None:
+        if self.loaded:
+            list.append(self, rel)
+            self._store._resize(1)
+
+    def remove(self, rel: Relationship) -> None:
+        if self.loaded:
+            list.remove(self, rel)
+            self._store._resize(-1)
+
+    __iter__ = _paged(list.__iter__)
+    __len__ = _paged(list.__len__)
+    __getitem__ = _paged(list.__getitem__)
+    __contains__ = _paged(list.__contains__)
+    __reversed__ = _paged(list.__reversed__)
+    index = _paged(list.index)
+    count = _paged(list.count)
+    copy = _paged(list.copy)
+    sort = _paged(list.sort)
+    __setitem__ = _paged_update(list.__setitem__)
+    __delitem__ = _paged_update(list.__delitem__)
+    __iadd__ = _paged_update(list.__iadd__)
+    extend = _paged_update(list.extend)
+    insert = _paged_update(list.insert)
+    pop = _paged_update(list.pop)
+    clear = _paged_update(list.clear)
+
+    def __repr__(self) -> str:  # pragma: no cover - debugging helper
+        return list.__repr__(self) if self.loaded else "<PagedList not loaded>"
+
+
+class PageStore:
+    """SQLite page file plus the LRU resident set and identity maps.
+
+    Things are evicted while more than *capacity* are resident or their
+    loaded adjacency lists hold more than *relationship_capacity* entries
+    (default ``16 * capacity``), so a hub such as ``Object`` cannot pin the
+    whole store through its child list.
+    """
+
+    def __init__(self, path: str, capacity: int = 10_000, relationship_capacity: Optional[int] = None) -> None:
+        self.capacity = capacity
+        self.relationship_capacity = relationship_capacity or 16 * capacity
+        # entries held by loaded adjacency lists of this store
+        self._loaded = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._things: "weakref.WeakValueDictionary[int, Thing]" = weakref.WeakValueDictionary()
+        self._rels: "weakref.WeakValueDictionary[RelKey, Relationship]" = weakref.WeakValueDictionary()
+        self._resident: "OrderedDict[int, Thing]" = OrderedDict()
+        self._pending: Dict[RelKey, Optional[Relationship]] = {}
+        # > 0 while a fault or page-in is in progress; eviction waits for it
+        self._busy = 0
+        self.faults = 0
+        self.evictions = 0
+        # the PagedUKS using this store, set by :meth:`connect`
+        self._uks: Optional["weakref.ref[UKS]"] = None
+        ThingLabels.set_backing(self)
+        # labels on disk must pass the label table's negative-lookup filter
+        ThingLabels.remember(key for (key,) in self._db.execute("SELECT key FROM things"))
+
+    @property
+    def resident(self) -> int:
+        return len(self._resident)
+
+    def connect(self, uks: UKS) -> None:
+        """Write through the changes *uks* reports and hand it this store's Things."""
+        self._uks = weakref.ref(uks)
+        uks.listen(self._on_relationship_event, self._on_attribute_change, self._on_usage)
+
+    # ------------------------------------------------------------------
+    # Identity
+    # ------------------------------------------------------------------
+    def _id(self, thing: Optional[Thing]) -> Optional[int]:
+        tid = getattr(thing, "_page_id", None)
+        if tid is not None and self._things.get(tid) is thing:
+            return tid
+        return None
+
+    def _key(self, rel: Relationship) -> Optional[RelKey]:
+        s = self._id(rel.source)
+        rt = self._id(rel.reltype)
+        t = self._id(rel.target) if rel.target is not None else _NO_TARGET
+        if s is None or rt is None or t is None:
+            return None
+        return (s, rt, t)
+
+    def _shell(self, row: tuple) -> Thing:
+        tid, label, value, created = row
+        thing = self._things.get(tid)
+        if thing is None:
+            thing = Thing("", pickle.loads(value) if value is not None else None)
+            thing._label = label
+            thing.created = datetime.fromtimestamp(created)
+            thing._page_id = tid
+            thing._uks = self._uks
+            for attr in _COLUMNS:
+                setattr(thing, attr, PagedList(self, thing, attr))
+            self._things[tid] = thing
+            self.faults += 1
+        return thing
+
+    def thing(self, tid: int) -> Optional[Thing]:
+        """Return the Thing with page id *tid* without making it resident."""
+
+        with self._lock:
+            thing = self._things.get(tid)
+            if thing is not None:
+                return thing
+            row = self._db.execute("SELECT id, label, value, created FROM things WHERE id = ?", (tid,)).fetchone()
+            return self._shell(row) if row is not None else None
+
+    def things(self, batch: int = 1000) -> Iterator[Thing]:
+        """Yield every stored Thing in insertion order."""
+
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT id, label, value, created FROM things WHERE id > ? ORDER BY id LIMIT ?",
+                    (last, batch),
+                ).fetchall()
+                chunk = [self._shell(row) for row in rows]
+            if not chunk:
+                return
+            last = rows[-1][0]
+            yield from chunk
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM things").fetchone()[0]
+
+    def contains(self, thing: Thing) -> bool:
+        with self._lock:
+            return self._id(thing) is not None
+
+    # ------------------------------------------------------------------
+    # Faulting and the resident set
+    # ------------------------------------------------------------------
+    def fault(self, key: str) -> Optional[Thing]:
+        """Return the Thing labelled *key* (lower case), reading it if needed."""
+
+        with self._lock:
+            row = self._db.execute("SELECT id, label, value, created FROM things WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            thing = self._shell(row)
+            self._make_resident(row[0], thing)
+            return thing
+
+    def touch(self, thing: Thing) -> None:
+        with self._lock:
+            tid = self._id(thing)
+            if tid is None:
+                return
+            if tid in self._resident:
+                self._resident.move_to_end(tid)
+            else:
+                self._make_resident(tid, thing)
+
+    def _make_resident(self, tid: int, thing: Thing) -> None:
+        self._resident[tid] = thing
+        self._resident.move_to_end(tid)
+        ThingLabels.register(thing.Label, thing)
+        self._evict_cold()
+
+    def _resize(self, delta: int) -> None:
+        with self._lock:
+            self._loaded += delta
+            if delta > 0:
+                self._evict_cold()
+
+    def _evict_cold(self) -> None:
+        if self._busy:
+            return
+        while self._resident and (
+            len(self._resident) > self.capacity or self._loaded > self.relationship_capacity
+        ):
+            tid, thing = self._resident.popitem(last=False)
+            self._write_thing(tid, thing)
+            ThingLabels.remember([thing.Label])
+            ThingLabels.unregister(thing.Label, thing)
+            for attr in _COLUMNS:
+                items = getattr(thing, attr)
+                if getattr(items, "loaded", False):
+                    self._loaded -= list.__len__(items)
+                setattr(thing, attr, PagedList(self, thing, attr))
+            self.evictions += 1
+
+    def _write_thing(self, tid: int, thing: Thing) -> None:
+        self._db.execute(
+            "UPDATE things SET key = ?, label = ?, value = ? WHERE id = ?",
+            (thing.Label.lower(), thing.Label, pickle.dumps(thing.V), tid),
+        )
+
+    def page_in(self, items: PagedList, owner: Thing, attr: str) -> None:
+        with self._lock:
+            if not items.loaded:
+                self._busy += 1
+                try:
+                    items._fill(self._load(owner, attr))
+                finally:
+                    self._busy -= 1
+            self.touch(owner)
+
+    def _load(self, owner: Thing, attr: str) -> List[Relationship]:
+        tid = self._id(owner)
+        if tid is None:
+            return []
+        self.flush()
+        rows = self._db.execute(f"SELECT * FROM relationships WHERE {_COLUMNS[attr]} = ?", (tid,)).fetchall()
+        return [rel for rel in (self._relationship(row) for row in rows) if rel is not None]
+
+    def _relationship(self, row: tuple) -> Optional[Relationship]:
+        s, rt, t, weight, ttl, last_used, hits, misses, created, inferred = row
+        rel = self._rels.get((s, rt, t))
+        if rel is not None:
+            return rel
+        source = self.thing(s)
+        reltype = self.thing(rt)
+        target = self.thing(t) if t != _NO_TARGET else None
+        if source is None or reltype is None or (t != _NO_TARGET and target is None):
+            return None
+        rel = Relationship(
+            source,
+            reltype,
+            target,
+            weight,
+            timedelta(seconds=ttl) if ttl is not None else timedelta.max,
+            datetime.fromtimestamp(last_used),
+            hits,
+            misses,
+            created=datetime.fromtimestamp(created),
+            inferred=bool(inferred),
+        )
+        self._rels[(s, rt, t)] = rel
+        if ttl is not None:
+            transient_relationships.append(rel)
+        return rel
+
+    # ------------------------------------------------------------------
+    # Write-through
+    # ------------------------------------------------------------------
+    def _on_relationship_event(self, event: str, rel: Relationship) -> None:
+        with self._lock:
+            key = self._key(rel)
+            if key is None:
+                return
+            if event == "add":
+                self._rels[key] = rel
+                self._pending[key] = rel
+            elif self._rels.get(key) is rel:
+                del self._rels[key]
+                self._pending[key] = None
+            if len(self._pending) >= FLUSH_BATCH:
+                self.flush()
+
+    def _on_attribute_change(self, rel: Relationship, name: str, old: object) -> None:
+        self._on_usage([rel])
+
+    def _on_usage(self, rels: List[Relationship]) -> None:
+        with self._lock:
+            for rel in rels:
+                key = self._key(rel)
+                if key is not None and self._rels.get(key) is rel:
+                    self._pending[key] = rel
+            if len(self._pending) >= FLUSH_BATCH:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write pending relationship changes in a single transaction."""
+
+        with self._lock:
+            if not self._pending:
+                return
+            upserts = []
+            deletes = []
+            for key, rel in self._pending.items():
+                if rel is None:
+                    deletes.append(key)
+                    continue
+                ttl = rel.time_to_live
+                upserts.append(
+                    key
+                    + (
+                        rel.weight,
+                        ttl.total_seconds() if ttl != timedelta.max else None,
+                        rel.last_used.timestamp(),
+                        rel.hits,
+                        rel.misses,
+                        rel.created.timestamp(),
+                        int(rel.inferred),
+                    )
+                )
+            self._pending.clear()
+            with self._db:
+                self._db.executemany(
+                    "DELETE FROM relationships WHERE source = ? AND reltype = ? AND target = ?", deletes
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO relationships VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", upserts
+                )
+
+    # ------------------------------------------------------------------
+    # Membership
+    # ------------------------------------------------------------------
+    def adopt(self, thing: Thing) -> None:
+        """Store a Thing created in memory and make it resident."""
+
+        with self._lock:
+            if self._id(thing) is not None:
+                return
+            cur = self._db.execute(
+                "INSERT INTO things (key, label, value, created) VALUES (?, ?, ?, ?)",
+                (thing.Label.lower(), thing.Label, pickle.dumps(thing.V), thing.created.timestamp()),
+            )
+            tid = cur.lastrowid
+            thing._page_id = tid
+            thing._uks = self._uks
+            self._things[tid] = thing
+            rels: List[Relationship] = []
+            for attr in _COLUMNS:
+                items = getattr(thing, attr)
+                current = list(items) if getattr(items, "loaded", True) else []
+                if isinstance(items, PagedList) and items.loaded:
+                    self._loaded -= len(current)
+                setattr(thing, attr, PagedList(self, thing, attr, current))
+                self._loaded += len(current)
+                rels.extend(current)
+            # relationships made before the Thing was stored, e.g. its parent link
+            for rel in rels:
+                key = self._key(rel)
+                if key is not None:
+                    self._rels[key] = rel
+                    self._pending[key] = rel
+            if len(self._pending) >= FLUSH_BATCH:
+                self.flush()
+            self._make_resident(tid, thing)
+
+    def discard(self, thing: Thing) -> None:
+        with self._lock:
+            tid = self._id(thing)
+            if tid is None:
+                raise ValueError(f"{thing.Label} is not in the store")
+            self.flush()
+            with self._db:
+                self._db.execute("DELETE FROM things WHERE id = ?", (tid,))
+                self._db.execute(
+                    "DELETE FROM relationships WHERE source = ? OR reltype = ? OR target = ?", (tid, tid, tid)
+                )
+            if self._resident.pop(tid, None) is not None:
+                for attr in _COLUMNS:
+                    items = getattr(thing, attr)
+                    if getattr(items, "loaded", False):
+                        self._loaded -= list.__len__(items)
+            del self._things[tid]
+
+    def clear(self) -> None:
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM things")
+                self._db.execute("DELETE FROM relationships")
+            self._things.clear()
+            self._rels.clear()
+            self._resident.clear()
+            self._pending.clear()
+            self._loaded = 0
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def top(self, source: Optional[Thing], reltype: Optional[Thing], k: int, by: str) -> List[Relationship]:
+        with self._lock:
+            self.flush()
+            where = []
+            args: List[object] = []
+            for column, thing in (("source", source), ("reltype", reltype)):
+                if thing is not None:
+                    tid = self._id(thing)
+                    if tid is None:
+                        return []
+                    where.append(f"{column} = ?")
+                    args.append(tid)
+            rows = self._db.execute(
+                f"SELECT * FROM relationships WHERE {' AND '.join(where)} ORDER BY {_ORDER[by]} DESC LIMIT ?",
+                args + [k],
+            ).fetchall()
+            return [rel for rel in (self._relationship(row) for row in rows) if rel is not None]
+
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        """Write everything back and detach from the label table."""
+
+        with self._lock:
+            self.flush()
+            with self._db:
+                for tid, thing in self._resident.items():
+                    self._write_thing(tid, thing)
+            uks = self._uks() if self._uks is not None else None
+            if uks is not None:
+                uks.unlisten(self._on_relationship_event, self._on_attribute_change, self._on_usage)
+            self._uks = None
+            if ThingLabels._backing is self:
+                ThingLabels.set_backing(None)
+            self._db.close()
+
+
+class PagedThingList:
+    """``UKSList`` view over every Thing in a :class:`PageStore`."""
+
+    def __init__(self, store: PageStore) -> None:
+        self._store = store
+
+    def __iter__(self) -> Iterator[Thing]:
+        return self._store.things()
+
+    def __len__(self) -> int:
+        return self._store.count()
+
+    def __contains__(self, thing: object) -> bool:
+        return isinstance(thing, Thing) and self._store.contains(thing)
+
+    def __getitem__(self, index):
+        return list(self)[index]
+
+    def __setitem__(self, index: slice, things: Iterable[Thing]) -> None:
+        if index != slice(None):
+            raise TypeError("only whole-list assignment is supported")
+        keep = list(things)
+        wanted = {id(t) for t in keep}
+        for t in list(self):
+            if id(t) not in wanted:
+                self._store.discard(t)
+        for t in keep:
+            self._store.adopt(t)
+
+    def append(self, thing: Thing) -> None:
+        self._store.adopt(thing)
+
+    def remove(self, thing: Thing) -> None:
+        self._store.discard(thing)
+
+
+class PagedUKS(UKS):
+    """:class:`UKS` whose contents live in the SQLite file at *path*.
+
+    At most *capacity* Things, with their adjacency lists, are kept in
+    memory (see :class:`PageStore` for the relationship budget).  Opening an
+    existing file continues where the last session stopped; call
+    :meth:`shutdown` to write everything back.
+    """
+
+    def __init__(self, path: str, capacity: int = 10_000, relationship_capacity: Optional[int] = None) -> None:
+        self.pages = PageStore(path, capacity, relationship_capacity)
+        self._view = PagedThingList(self.pages)
+        super().__init__()
+
+    def _connect(self) -> None:
+        self.pages.connect(self)
+        # timestamp indexes would pin every relationship in memory
+        self._time_indexes = {}
+
+    @property
+    def UKSList(self) -> PagedThingList:
+        return self._view
+
+    @UKSList.setter
+    def UKSList(self, things: Iterable[Thing]) -> None:
+        if things is self._view:
+            return
+        things = list(things)
+        if not things:
+            self.pages.clear()
+        else:
+            self._view[:] = things
+
+    def _existing_things(self) -> PagedThingList:
+        return self._view
+
+    def _index_relationship(self, rel: Relationship) -> None:
+        pass
+
+    def _rebuild_indexes(self) -> None:
+        pass
+
+    def _top(self, s: Optional[Thing], rt: Optional[Thing], k: int, by: str) -> List[Relationship]:
+        return self.pages.top(s, rt, k, by)
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        self.pages.close()
+
+
+__all__ = ["PagedUKS", "PageStore", "PagedList", "PagedThingList"]
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+"""Multi-hop conjunctive pattern queries over the UKS.
+
+A query is a list of ``(source, reltype, target)`` triple patterns.  Terms
+starting with ``?`` are variables; any other string is a Thing label and
+Things may be passed directly::
+
+    uks.match([("?x", "has-child", "?y"), ("?y", "hasColor", "?z"), ("?z", "is", "warm")])
+
+yields ``{"x": ..., "y": ..., "z": ...}`` for every consistent binding.
+
+Patterns are ordered greedily by selectivity: the cheapest pattern runs first
+and each later step picks the cheapest pattern sharing a variable with what is
+already bound.  A pattern's cost is the length of the shortest adjacency list
+its constants select (``relationships`` of a constant source,
+``relationships_from`` of a constant target or ``relationships_as_type`` of a
+constant reltype).  Steps are combined with hash joins on the shared
+variables.  Each build side is materialised lazily on the first probe and
+joined bindings are produced as a stream.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from .relationship import Relationship
+from .thing import Thing
+from .thing_labels import ThingLabels
+
+Term = Union[str, Thing]
+Binding = Dict[str, Thing]
+
+
+def is_variable(term: object) -> bool:
+    return isinstance(term, str) and term.startswith("?")
+
+
+@dataclass
+class TriplePattern:
+    """A single ``(source, reltype, target)`` pattern with constants resolved."""
+
+    terms: Tuple[object, object, object]
+    # ``False`` when a constant label does not name an existing Thing
+    satisfiable: bool = True
+
+    @property
+    def variables(self) -> Set[str]:
+        return {t for t in self.terms if is_variable(t)}
+
+
+class PatternQuery:
+    """Plan and execute a conjunctive pattern query."""
+
+    def __init__(self, uks: "UKS", patterns: Iterable[Sequence[Term]]) -> None:
+        self.uks = uks
+        self.patterns = [self._resolve(p) for p in patterns]
+        self._total: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _resolve(pattern: Sequence[Term]) -> TriplePattern:
+        if len(pattern) != 3:
+            raise ValueError(f"Pattern must be a (source, reltype, target) triple: {pattern!r}")
+        terms = []
+        satisfiable = True
+        for term in pattern:
+            if isinstance(term, str) and not is_variable(term):
+                thing = ThingLabels.get_thing(term)
+                satisfiable = satisfiable and thing is not None
+                term = thing
+            terms.append(term)
+        return TriplePattern(tuple(terms), satisfiable)
+
+    def _access_path(self, p: TriplePattern) -> Optional[List[Relationship]]:
+        """Return the shortest adjacency list selected by *p*'s constants."""
+
+        source, reltype, target = p.terms
+        lists = []
+        if isinstance(source, Thing):
+            lists.append(source.relationships)
+        if isinstance(target, Thing):
+            lists.append(target.relationships_from)
+        if isinstance(reltype, Thing):
+            lists.append(reltype.relationships_as_type)
+        return min(lists, key=len) if lists else None
+
+    def cardinality(self, p: TriplePattern) -> int:
+        if not p.satisfiable:
+            return 0
+        path = self._access_path(p)
+        if path is not None:
+            return len(path)
+        if self._total is None:
+            self._total = sum(len(t.relationships) for t in self.uks.UKSList)
+        return self._total
+
+    def plan(self) -> List[TriplePattern]:
+        """Return the patterns in execution order."""
+
+        remaining = list(self.patterns)
+        bound: Set[str] = set()
+        order: List[TriplePattern] = []
+        while remaining:
+            connected = [p for p in remaining if p.variables & bound]
+            best = min(connected or remaining, key=self.cardinality)
+            order.append(best)
+            bound |= best.variables
+            remaining.remove(best)
+        return order
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+    def __iter__(self) -> Iterator[Binding]:
+        order = self.plan()
+        if not order or any(not p.satisfiable for p in order):
+            return
+        stream: Iterator[Binding] = self._rows(order[0])
+        bound = set(order[0].variables)
+        for p in order[1:]:
+            stream = self._hash_join(stream, p, sorted(bound & p.variables))
+            bound |= p.variables
+        for binding in stream:
+            yield {name[1:]: value for name, value in binding.items()}
+
+    def _scan(self, p: TriplePattern) -> Iterable[Relationship]:
+        path = self._access_path(p)
+        if path is not None:
+            return list(path)
+        return [r for t in list(self.uks.UKSList) for r in t.relationships]
+
+    def _rows(self, p: TriplePattern) -> Iterator[Binding]:
+        for rel in self._scan(p):
+            binding: Binding = {}
+            for term, value in zip(p.terms, (rel.source, rel.reltype, rel.target)):
+                if value is None:
+                    break
+                if is_variable(term):
+                    if binding.setdefault(term, value) is not value:
+                        break
+                elif term is not value:
+                    break
+            else:
+                yield binding
+
+    def _hash_join(self, left: Iterator[Binding], p: TriplePattern, shared: List[str]) -> Iterator[Binding]:
+        table: Optional[Dict[tuple, List[Binding]]] = None
+        for lb in left:
+            if table is None:
+                table = defaultdict(list)
+                for row in self._rows(p):
+                    table[tuple(id(row[v]) for v in shared)].append(row)
+            for row in table.get(tuple(id(lb[v]) for v in shared), ()):
+                merged = dict(lb)
+                merged.update(row)
+                yield merged
+
+
+__all__ = ["PatternQuery", "TriplePattern", "is_variable"]
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+"""Score-ordered relationship indexes used for top-k retrieval.
+
+Each :class:`RankedIndex` groups relationships by a key (their source or their
+reltype) and keeps one binary heap per group ordered by ``Relationship.value``
+and another ordered by ``Relationship.weight``.  Score changes are handled with
+lazy invalidation: the old heap entry is marked stale and a fresh one pushed,
+and a heap is compacted once stale entries outnumber live ones.  The best
+``k`` entries are read by a best-first walk over the implicit heap tree, which
+costs ``O(k log k)`` plus the stale entries skipped on the way.
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .relationship import Relationship
+
+SCORES: Dict[str, Callable[[Relationship], float]] = {
+    "value": lambda r: r.value,
+    "weight": lambda r: r.weight,
+}
+
+
+class _LazyHeap:
+    """Max-heap of relationships with O(log n) score updates."""
+
+    def __init__(self) -> None:
+        self._heap: List[list] = []
+        self._entries: Dict[int, list] = {}
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, rel: Relationship) -> bool:
+        return id(rel) in self._entries
+
+    def push(self, rel: Relationship, score: float, seq: int) -> None:
+        self._invalidate(rel)
+        entry = [-score, seq, rel]
+        self._entries[id(rel)] = entry
+        heapq.heappush(self._heap, entry)
+        self._maybe_compact()
+
+    def discard(self, rel: Relationship) -> None:
+        self._invalidate(rel)
+        self._maybe_compact()
+
+    def top(self) -> Iterator[Relationship]:
+        heap = self._heap
+        if not heap:
+            return
+        frontier = [(heap[0], 0)]
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            if entry[2] is not None:
+                yield entry[2]
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def _invalidate(self, rel: Relationship) -> None:
+        old = self._entries.pop(id(rel), None)
+        if old is not None:
+            old[2] = None
+            self._stale += 1
+
+    def _maybe_compact(self) -> None:
+        if self._stale > 16 and self._stale > len(self._entries):
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+
+class RankedIndex:
+    """Relationships grouped by ``key(rel)`` and ordered by score."""
+
+    def __init__(self, key: Callable[[Relationship], object]) -> None:
+        self._key = key
+        self._groups: Dict[object, Dict[str, _LazyHeap]] = {}
+        self._lock = threading.RLock()
+        self._seq = itertools.count()
+
+    def add(self, rel: Relationship) -> None:
+        with self._lock:
+            group = self._key(rel)
+            heaps = self._groups.get(group)
+            if heaps is None:
+                heaps = self._groups[group] = {by: _LazyHeap() for by in SCORES}
+            for by, score in SCORES.items():
+                heaps[by].push(rel, score(rel), next(self._seq))
+
+    def update(self, rel: Relationship, name: str) -> None:
+        """Re-score *rel* after its attribute *name* changed."""
+        with self._lock:
+            heaps = self._groups.get(self._key(rel))
+            if heaps is None or rel not in heaps["value"]:
+                return
+            for by, score in SCORES.items():
+                if by == "value" or by == name:
+                    heaps[by].push(rel, score(rel), next(self._seq))
+
+    def remove(self, rel: Relationship) -> None:
+        with self._lock:
+            group = self._key(rel)
+            heaps = self._groups.get(group)
+            if heaps is None:
+                return
+            for heap in heaps.values():
+                heap.discard(rel)
+            if not len(heaps["value"]):
+                del self._groups[group]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._groups.clear()
+
+    def size(self, group: object) -> int:
+        heaps = self._groups.get(group)
+        return len(heaps["value"]) if heaps else 0
+
+    def top(
+        self,
+        group: object,
+        k: int,
+        by: str = "value",
+        predicate: Optional[Callable[[Relationship], bool]] = None,
+    ) -> List[Relationship]:
+        """Return up to *k* relationships of *group* with the highest score."""
+        result: List[Relationship] = []
+        with self._lock:
+            heaps = self._groups.get(group)
+            if heaps is None or k <= 0:
+                return result
+            for rel in heaps[by].top():
+                if predicate is None or predicate(rel):
+                    result.append(rel)
+                    if len(result) >= k:
+                        break
+        return result
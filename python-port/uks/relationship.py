@@ -12,6 +12,43 @@ from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import List, Optional
 
+# Attributes whose changes are reported to the owning UKS, which keeps its
+# indexes, undo log and storage engine in step with direct ``rel.weight = ...``
+# style updates.  The usage counters ``hits``, ``misses`` and ``last_used``
+# change on every query and are left out; the UKS tracks those itself.
+_TRACKED_ATTRIBUTES = ("weight", "created", "time_to_live", "inferred")
+_UNSET = object()
+
+
+class _Tracked:
+    """Data descriptor reporting changes of one relationship attribute.
+
+    Only the tracked attributes pay for the hook; every other attribute is
+    a plain instance attribute.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __get__(self, rel: Optional["Relationship"], owner: type = None) -> object:
+        if rel is None:
+            return self
+        return rel.__dict__[self.name]
+
+    def __set__(self, rel: "Relationship", value: object) -> None:
+        values = rel.__dict__
+        old = values.get(self.name, _UNSET)
+        values[self.name] = value
+        if old is not _UNSET and old != value:
+            # same owner as ``thing.owner_of``, which cannot be imported here
+            for thing in (rel.source, rel.reltype, rel.target):
+                ref = getattr(thing, "_uks", None)
+                if ref is not None:
+                    uks = ref()
+                    if uks is not None:
+                        uks._on_attribute_change(rel, self.name, old)
+                    return
+
 
 @dataclass
 class Clause:
@@ -35,6 +72,9 @@ class Relationship:
     clauses: List[Clause] = field(default_factory=list)
     clauses_from: List["Relationship"] = field(default_factory=list)
     created: datetime = field(default_factory=datetime.now)
+    # ``True`` for edges materialised by :class:`~uks.inference.InferenceEngine`;
+    # such edges are derived state and are never persisted.
+    inferred: bool = False
 
     def touch(self) -> None:
         """Update the ``last_used`` timestamp to now."""
@@ -66,6 +106,13 @@ class Relationship:
         )
 
 
+# installed after ``@dataclass`` so the generated ``__init__`` keeps the plain
+# field defaults and assigns through the descriptors
+for _name in _TRACKED_ATTRIBUTES:
+    setattr(Relationship, _name, _Tracked(_name))
+del _name
+
+
 @dataclass
 class QueryRelationship:
     """A relationship returned from UKS queries with additional query metadata."""
@@ -77,6 +124,7 @@ class QueryRelationship:
     value: float = 0.0
     hits: int = 0
     misses: int = 0
+    time_to_live: timedelta = timedelta.max
     
     @classmethod
     def from_relationship(cls, rel: Relationship) -> "QueryRelationship":
@@ -88,6 +136,7 @@ class QueryRelationship:
             weight=rel.weight,
             value=rel.value,
             hits=rel.hits,
-            misses=rel.misses
+            misses=rel.misses,
+            time_to_live=rel.time_to_live,
         )
 
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+"""Incremental forward chaining over UKS clauses.
+
+A clause ``conclusion IF condition`` (see :meth:`UKS.add_clause`) is read as a
+rule over the instances of the conclusion's source Thing.  For example::
+
+    animal is happy   IF animal has food
+    animal is hungry  IF animal hasNot food
+
+means that every descendant *x* of ``animal`` with ``x has food`` asserted
+directly on it gains ``x is happy``.  All IF clauses attached to the same
+conclusion are joined into one rule.  Conditions whose source is a different
+Thing are ground facts that must simply exist.
+
+:class:`RuleEngine` compiles the clauses once and then works like a small
+Rete network: conditions are indexed by ``(reltype, target)`` so an added or
+removed fact only re-evaluates the rules that mention its pattern, and only
+for the Thing the fact is about.  Ground conditions are indexed by
+``(source, reltype, target)``; a change to such a fact re-evaluates its rules
+for every descendant of their subject.  Taxonomy changes re-evaluate the
+moved Thing and its descendants.  Conclusions are written back with
+:meth:`UKS.load_statements`, and ones the engine created are retracted again
+when their last supporting match disappears.
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Set, Tuple
+
+from .relationship import Relationship
+from .statement import Statement
+from .thing import Thing
+
+
+@dataclass
+class Rule:
+    """A compiled ``conclusion IF conditions`` rule."""
+
+    conclusion: Relationship
+    conditions: List[Relationship] = field(default_factory=list)
+
+    @property
+    def subject(self) -> Thing:
+        return self.conclusion.source
+
+    def variable_conditions(self) -> List[Relationship]:
+        return [c for c in self.conditions if c.source is self.subject]
+
+    def ground_conditions(self) -> List[Relationship]:
+        return [c for c in self.conditions if c.source is not self.subject]
+
+
+class RuleEngine:
+    """Forward-chain UKS clauses incrementally as facts change."""
+
+    def __init__(self, uks: "UKS", clause_types: Iterable[str] = ("IF",)) -> None:
+        self.uks = uks
+        self.clause_types = {c.lower() for c in clause_types}
+        self.rules: Dict[int, Rule] = {}
+        self._by_pattern: Dict[Tuple[int, int], List[Rule]] = {}
+        self._by_ground: Dict[Tuple[int, int, int], List[Rule]] = {}
+        # (id(x), id(rule)) -> conclusion produced for x by rule, and the
+        # reverse map from a conclusion to the matches supporting it
+        self._fired: Dict[Tuple[int, int], Relationship] = {}
+        self._supporters: Dict[int, List[Tuple[Thing, Rule]]] = {}
+        self._created: Set[int] = set()
+        self._agenda: deque[Tuple[str, object]] = deque()
+        self._running = False
+        self.firings = 0
+        for thing in list(uks.UKSList):
+            for rel in thing.relationships:
+                if rel.clauses:
+                    self._compile(rel)
+        for rule in list(self.rules.values()):
+            self._schedule("rule", rule)
+        uks.on("add", self._on_add)
+        uks.on("remove", self._on_remove)
+        uks.on("clause", self._on_clause)
+
+    def detach(self) -> None:
+        self.uks.off("add", self._on_add)
+        self.uks.off("remove", self._on_remove)
+        self.uks.off("clause", self._on_clause)
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+    def _compile(self, conclusion: Relationship) -> Rule | None:
+        old = self.rules.pop(id(conclusion), None)
+        if old is not None:
+            for cond in old.variable_conditions():
+                self._by_pattern.get(self._key(cond), []).remove(old)
+            for cond in old.ground_conditions():
+                self._by_ground.get(self._ground_key(cond), []).remove(old)
+        conditions = [c.clause for c in conclusion.clauses if c.clause_type.Label.lower() in self.clause_types]
+        if not conditions or conclusion.target is None:
+            return None
+        rule = Rule(conclusion, conditions)
+        self.rules[id(conclusion)] = rule
+        for cond in rule.variable_conditions():
+            self._by_pattern.setdefault(self._key(cond), []).append(rule)
+        for cond in rule.ground_conditions():
+            self._by_ground.setdefault(self._ground_key(cond), []).append(rule)
+        return rule
+
+    @staticmethod
+    def _key(rel: Relationship) -> Tuple[int, int]:
+        return (id(rel.reltype), id(rel.target))
+
+    @staticmethod
+    def _ground_key(rel: Relationship) -> Tuple[int, int, int]:
+        return (id(rel.source), id(rel.reltype), id(rel.target))
+
+    def _ground_candidates(self, rel: Relationship) -> List[Tuple[Thing, Rule]]:
+        # every instance of a rule whose ground condition *rel* matches
+        rules = self._by_ground.get(self._ground_key(rel), [])
+        return [(x, rule) for rule in rules for x in rule.subject.Descendents()]
+
+    # ------------------------------------------------------------------
+    # Event handlers
+    # ------------------------------------------------------------------
+    def _on_add(self, rel: Relationship) -> None:
+        self._schedule("add", rel)
+
+    def _on_remove(self, rel: Relationship) -> None:
+        self._schedule("remove", rel)
+
+    def _on_clause(self, rel: Relationship) -> None:
+        rule = self._compile(rel)
+        if rule is not None:
+            self._schedule("rule", rule)
+
+    def _schedule(self, kind: str, item: object) -> None:
+        # Conclusions written back re-enter through the UKS events; queue them
+        # so chained rules fire iteratively rather than recursively.
+        self._agenda.append((kind, item))
+        if self._running:
+            return
+        self._running = True
+        try:
+            while self._agenda:
+                kind, item = self._agenda.popleft()
+                if kind == "add":
+                    self._fact_added(item)
+                elif kind == "remove":
+                    self._fact_removed(item)
+                else:
+                    self._match([(x, item) for x in item.subject.Descendents()])
+        finally:
+            self._running = False
+
+    def _fact_added(self, rel: Relationship) -> None:
+        if rel.reltype.Label == "has-child" and rel.target is not None:
+            moved = [rel.target] + rel.target.Descendents()
+            self._match([(x, rule) for x in moved for rule in self.rules.values()])
+            return
+        rules = self._by_pattern.get(self._key(rel), [])
+        self._match([(rel.source, rule) for rule in rules] + self._ground_candidates(rel))
+
+    def _fact_removed(self, rel: Relationship) -> None:
+        self._created.discard(id(rel))
+        # A conclusion removed from outside is re-derived if still supported.
+        orphaned = self._supporters.pop(id(rel), [])
+        for x, rule in orphaned:
+            self._fired.pop((id(x), id(rule)), None)
+        self._match(orphaned)
+        if rel.reltype.Label == "has-child" and rel.target is not None:
+            moved = [rel.target] + rel.target.Descendents()
+            candidates = [(x, rule) for x in moved for rule in self.rules.values()]
+        else:
+            candidates = [(rel.source, rule) for rule in self._by_pattern.get(self._key(rel), [])]
+            candidates += self._ground_candidates(rel)
+        for x, rule in candidates:
+            if (id(x), id(rule)) in self._fired and not self._holds(x, rule):
+                self._retract(x, rule)
+
+    # ------------------------------------------------------------------
+    # Matching
+    # ------------------------------------------------------------------
+    def _holds(self, x: Thing, rule: Rule) -> bool:
+        if x is rule.subject or rule.subject not in x.AncestorList():
+            return False
+        for cond in rule.variable_conditions():
+            if self.uks.get_relationship(x, cond.reltype, cond.target) is None:
+                return False
+        for cond in rule.ground_conditions():
+            if self.uks.get_relationship(cond.source, cond.reltype, cond.target) is None:
+                return False
+        return True
+
+    def _match(self, candidates: List[Tuple[Thing, Rule]]) -> None:
+        unique = {(id(x), id(rule)): (x, rule) for x, rule in candidates}
+        new = [
+            (x, rule)
+            for key, (x, rule) in unique.items()
+            if key not in self._fired and self._holds(x, rule)
+        ]
+        if not new:
+            return
+        preexisting = {
+            i
+            for i, (x, rule) in enumerate(new)
+            if self.uks.get_relationship(x, rule.conclusion.reltype, rule.conclusion.target) is not None
+        }
+        stmts = [
+            Statement(x.Label, rule.conclusion.reltype.Label, rule.conclusion.target.Label, rule.conclusion.weight)
+            for x, rule in new
+        ]
+        for i, ((x, rule), rel) in enumerate(zip(new, self.uks.load_statements(stmts))):
+            self.firings += 1
+            self._fired[(id(x), id(rule))] = rel
+            self._supporters.setdefault(id(rel), []).append((x, rule))
+            if i not in preexisting:
+                self._created.add(id(rel))
+
+    def _retract(self, x: Thing, rule: Rule) -> None:
+        rel = self._fired.pop((id(x), id(rule)))
+        supporters = self._supporters.get(id(rel), [])
+        supporters[:] = [(y, r) for y, r in supporters if y is not x or r is not rule]
+        if supporters:
+            return
+        self._supporters.pop(id(rel), None)
+        if id(rel) in self._created:
+            self._created.discard(id(rel))
+            self.uks.remove_relationship(rel)
+
+
+__all__ = ["Rule", "RuleEngine"]
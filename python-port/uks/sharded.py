@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+"""UKS sharded across worker processes on one machine.
+
+:class:`ShardedUKS` hash-partitions Things by label over ``N`` worker
+processes.  Each worker owns an ordinary :class:`~uks.UKS` holding the
+relationships whose *source* hashes to it.  The coordinator in the calling
+process talks to the workers over :func:`multiprocessing.Pipe` connections:
+
+* single-statement calls are routed to the owning shard;
+* :meth:`ShardedUKS.load_statements` partitions a batch and sends every part
+  before waiting on any reply, so shards ingest in parallel;
+* queries without a ``source`` filter fan out to every shard in the same way
+  and the partial results are merged.
+
+An edge whose target lives on another shard keeps a *remote reference*: a
+stub Thing carrying the target's label in the source shard.  Labels are the
+global identity, so the stub and the real Thing are joined again when
+results are merged.  Inherited relationships and regex filters are resolved
+per shard, so ``include_inherited`` only sees ancestors stored on the same
+shard as the source.
+
+Results cross process boundaries as :class:`~uks.Statement` objects because
+Things hold locks and cannot be pickled.
+"""
+
+import multiprocessing
+import os
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .statement import Statement
+
+
+def shard_of(label: str, shards: int) -> int:
+    """Return the shard owning *label* (stable across processes)."""
+    return zlib.crc32(label.lower().encode("utf-8")) % shards
+
+
+# ----------------------------------------------------------------------
+# Worker side
+# ----------------------------------------------------------------------
+def _statements(rels: Iterable[Any]) -> List[Statement]:
+    return [Statement.from_relationship(r) for r in rels]
+
+
+def _op_add_relationship(uks, source, reltype, target, ttl=None, weight=1.0):
+    return _statements([uks.add_relationship(source, reltype, target, ttl, weight)])[0]
+
+
+def _op_load_statements(uks, statements):
+    return len(uks.load_statements(statements))
+
+
+def _op_get_relationship(uks, source, reltype, target=None):
+    rel = uks.get_relationship(source, reltype, target)
+    return _statements([rel])[0] if rel is not None else None
+
+
+def _op_remove_statement(uks, source, reltype, target):
+    uks.remove_statement(source, reltype, target)
+
+
+def _op_query(uks, **filters):
+    return _statements(uks.query(**filters))
+
+
+def _op_export_statements(uks):
+    return uks.export_statements()
+
+
+def _op_stats(uks):
+    return {"things": len(uks.UKSList), "relationships": sum(len(t.relationships) for t in uks.UKSList)}
+
+
+_OPS = {
+    "add_relationship": _op_add_relationship,
+    "load_statements": _op_load_statements,
+    "get_relationship": _op_get_relationship,
+    "remove_statement": _op_remove_statement,
+    "query": _op_query,
+    "export_statements": _op_export_statements,
+    "stats": _op_stats,
+}
+
+
+def _serve(conn) -> None:
+    """Worker loop: own one UKS shard and answer coordinator requests."""
+
+    from .thing import transient_relationships
+    from .thing_labels import ThingLabels
+    from .uks import UKS
+
+    ThingLabels.clear_label_list()
+    transient_relationships.clear()
+    uks = UKS()
+    try:
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            op, args, kwargs = msg
+            try:
+                conn.send(("ok", _OPS[op](uks, *args, **kwargs)))
+            except Exception as exc:  # report, keep serving
+                conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    finally:
+        uks.shutdown()
+        conn.close()
+
+
+# ----------------------------------------------------------------------
+# Coordinator side
+# ----------------------------------------------------------------------
+class ShardError(RuntimeError):
+    """Raised when a worker reports a failure."""
+
+
+class ShardedUKS:
+    """Coordinator routing UKS calls to hash-partitioned worker processes."""
+
+    def __init__(self, shards: Optional[int] = None, start_method: str = "spawn") -> None:
+        self.shards = shards or os.cpu_count() or 1
+        ctx = multiprocessing.get_context(start_method)
+        self._conns = []
+        self._procs = []
+        # one lock per pipe, held from a request until its reply is read so
+        # concurrent callers cannot receive each other's replies
+        self._locks = [threading.Lock() for _ in range(self.shards)]
+        for _ in range(self.shards):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_serve, args=(child,), daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def __enter__(self) -> "ShardedUKS":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.shutdown()
+
+    # ------------------------------------------------------------------
+    # Transport
+    # ------------------------------------------------------------------
+    def _call(self, shard: int, op: str, *args: Any, **kwargs: Any) -> Any:
+        return self._gather([(shard, op, args, kwargs)])[0]
+
+    def _gather(self, requests: List[Tuple[int, str, tuple, dict]]) -> List[Any]:
+        # Locks are taken in shard order so overlapping gathers cannot
+        # deadlock.  Everything is sent before receiving so the shards work
+        # concurrently.
+        locks = [self._locks[i] for i in sorted({shard for shard, _, _, _ in requests})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            for shard, op, args, kwargs in requests:
+                self._conns[shard].send((op, args, kwargs))
+            replies = [self._conns[shard].recv() for shard, _, _, _ in requests]
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+        results = []
+        errors = []
+        for (shard, _, _, _), (status, value) in zip(requests, replies):
+            if status != "ok":
+                errors.append(f"shard {shard}: {value}")
+            results.append(value)
+        if errors:
+            raise ShardError("; ".join(errors))
+        return results
+
+    def _broadcast(self, op: str, **kwargs: Any) -> List[Any]:
+        return self._gather([(i, op, (), kwargs) for i in range(self.shards)])
+
+    def shard_for(self, label: str) -> int:
+        return shard_of(label, self.shards)
+
+    # ------------------------------------------------------------------
+    # UKS API
+    # ------------------------------------------------------------------
+    def add_relationship(
+        self,
+        source: str,
+        reltype: str,
+        target: Optional[str],
+        ttl: Optional[float] = None,
+        weight: float = 1.0,
+    ) -> Statement:
+        return self._call(self.shard_for(source), "add_relationship", source, reltype, target, ttl, weight)
+
+    add_statement = add_relationship
+
+    def load_statements(self, statements: Iterable[Statement]) -> int:
+        """Partition *statements* by source and load all parts in parallel."""
+
+        parts: Dict[int, List[Statement]] = {}
+        for stmt in statements:
+            parts.setdefault(self.shard_for(stmt.source), []).append(stmt)
+        return sum(self._gather([(i, "load_statements", (part,), {}) for i, part in parts.items()]))
+
+    def get_relationship(self, source: str, reltype: str, target: Optional[str] = None) -> Optional[Statement]:
+        return self._call(self.shard_for(source), "get_relationship", source, reltype, target)
+
+    def remove_statement(self, source: str, reltype: str, target: Optional[str]) -> None:
+        self._call(self.shard_for(source), "remove_statement", source, reltype, target)
+
+    def query(self, **filters: Any) -> List[Statement]:
+        """Run :meth:`UKS.query` on the owning shard or on all shards.
+
+        Results from several shards are merged; relationships replicated on
+        several shards (such as ``Object has-child`` links created for remote
+        references) are reported once with their highest weight.
+        """
+
+        source = filters.get("source")
+        if source:
+            return self._call(self.shard_for(source), "query", **filters)
+        return self._merge(self._broadcast("query", **filters))
+
+    def export_statements(self) -> List[Statement]:
+        return self._merge(self._broadcast("export_statements"))
+
+    def stats(self) -> List[Dict[str, int]]:
+        return self._broadcast("stats")
+
+    @staticmethod
+    def _merge(parts: List[List[Statement]]) -> List[Statement]:
+        merged: Dict[Tuple[str, str, Optional[str]], Statement] = {}
+        for part in parts:
+            for stmt in part:
+                key = (stmt.source.lower(), stmt.reltype.lower(), stmt.target.lower() if stmt.target else None)
+                seen = merged.get(key)
+                if seen is None or stmt.weight > seen.weight:
+                    merged[key] = stmt
+        return list(merged.values())
+
+    # ------------------------------------------------------------------
+    def shutdown(self) -> None:
+        """Stop all worker processes."""
+
+        for conn, lock in zip(self._conns, self._locks):
+            with lock:
+                try:
+                    conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        for conn in self._conns:
+            conn.close()
+        self._conns = []
+        self._procs = []
+
+
+__all__ = ["ShardedUKS", "ShardError", "shard_of"]
@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+"""Pluggable storage engines for :class:`~uks.UKS`.
+
+A UKS always works on its in-memory Things and relationship lists; a storage
+engine decides what sits behind them.  :class:`MemoryEngine` (the default)
+adds nothing.  :class:`SQLiteEngine` mirrors every relationship into an
+indexed SQLite table:
+
+* writes arrive through the relationship and attribute listeners and are
+  batched, then written in one transaction once ``batch_size`` accumulate,
+  before a query reads the table, or when :meth:`UKS.transaction` exits;
+* :meth:`UKS.query` filters are translated into a ``WHERE`` clause served by
+  the table's B-tree indexes instead of a scan of every Thing;
+* the file is the persistent copy: opening a UKS on an existing file loads
+  its asserted relationships, and the database runs in WAL mode so other
+  processes can open it with ``readonly=True`` while one process writes.
+
+With the SQLite engine ``hits`` are counted for every match as usual, but
+``misses`` are only counted when the query names a ``source`` or
+``source_regex``; counting them for the whole store would rewrite every row.
+Queries with ``include_inherited`` still walk the in-memory graph.
+"""
+
+import functools
+import json
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .relationship import Relationship
+from .statement import Statement
+from .thing import Thing
+from .thing_labels import ThingLabels
+
+QueryResult = Tuple[List[Relationship], List[Relationship]]
+
+
+class StorageEngine:
+    """Interface between a :class:`UKS` and where its contents are kept."""
+
+    name = "base"
+
+    def attach(self, uks: "UKS") -> None:
+        """Called once the UKS has built its initial structure."""
+        self.uks = uks
+
+    def query(self, filters: Dict[str, Any], now: datetime) -> Optional[QueryResult]:
+        """Return ``(matches, misses)`` for *filters* or ``None`` to scan memory."""
+        return None
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        yield
+
+    def reset(self) -> None:
+        """Forget all stored content; the UKS is about to be repopulated."""
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryEngine(StorageEngine):
+    """Keep everything in the in-memory lists only (the default)."""
+
+    name = "memory"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS relationships (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    reltype TEXT NOT NULL,
+    target TEXT,
+    weight REAL NOT NULL,
+    ttl REAL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    created REAL NOT NULL,
+    inferred INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS relationships_source ON relationships(source, reltype);
+CREATE INDEX IF NOT EXISTS relationships_reltype ON relationships(reltype, target);
+CREATE INDEX IF NOT EXISTS relationships_target ON relationships(target);
+CREATE INDEX IF NOT EXISTS relationships_created ON relationships(created);
+CREATE INDEX IF NOT EXISTS relationships_last_used ON relationships(last_used);
+CREATE TABLE IF NOT EXISTS things (
+    label TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = "id, source, reltype, target, weight, ttl, last_used, hits, misses, created, inferred"
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(pattern: str) -> "re.Pattern[str]":
+    return re.compile(pattern)
+
+
+def _regexp(pattern: str, value: Optional[str]) -> bool:
+    return value is not None and _compile(pattern).fullmatch(value) is not None
+
+
+def translate(filters: Dict[str, Any], now: datetime) -> Tuple[List[str], List[Any], List[str], List[Any]]:
+    """Translate :meth:`UKS.query` filters into SQL conditions.
+
+    Returns ``(source_conditions, source_args, other_conditions,
+    other_args)`` so callers can select the misses of a source separately.
+    """
+
+    src: List[str] = []
+    src_args: List[Any] = []
+    other: List[str] = []
+    args: List[Any] = []
+    if filters.get("source"):
+        src.append("source = ?")
+        src_args.append(filters["source"])
+    if filters.get("source_regex"):
+        src.append("source REGEXP ?")
+        src_args.append(filters["source_regex"])
+    for column in ("reltype", "target"):
+        if filters.get(column):
+            other.append(f"{column} = ?")
+            args.append(filters[column])
+        if filters.get(f"{column}_regex"):
+            other.append(f"{column} REGEXP ?")
+            args.append(filters[f"{column}_regex"])
+    other.append("weight >= ?")
+    args.append(filters.get("min_weight", 0.0))
+    if filters.get("max_ttl") is not None:
+        other.append("(ttl IS NULL OR last_used + ttl - ? <= ?)")
+        args.extend([now.timestamp(), filters["max_ttl"]])
+    for column in ("created", "last_used"):
+        after = filters.get(f"{column}_after")
+        before = filters.get(f"{column}_before")
+        if after is not None:
+            other.append(f"{column} > ?")
+            args.append(after.timestamp())
+        if before is not None:
+            other.append(f"{column} < ?")
+            args.append(before.timestamp())
+    return src, src_args, other, args
+
+
+class SQLiteEngine(StorageEngine):
+    """Mirror the UKS into an indexed SQLite table.
+
+    Parameters
+    ----------
+    path:
+        Database file.  Its asserted relationships are loaded on attach.
+    readonly:
+        Open the file for reading only.  Local changes are then not written
+        back, and rows added by the writing process are materialised when a
+        query returns them.
+    batch_size:
+        Number of pending row changes that triggers a write outside an
+        explicit transaction.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, *, readonly: bool = False, batch_size: int = 1024) -> None:
+        self.path = path
+        self.readonly = readonly
+        self.batch_size = batch_size
+        if readonly:
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+        self._db.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self._lock = threading.RLock()
+        # row id <-> relationship
+        self._rels: Dict[int, Relationship] = {}
+        self._ids: Dict[int, int] = {}
+        self._next_id = 1
+        # rows to write: id(rel) -> relationship, and row ids to delete
+        self._pending: Dict[int, Relationship] = {}
+        self._deleted: List[int] = []
+        self._depth = 0
+        self._muted = False
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+    def attach(self, uks: "UKS") -> None:
+        super().attach(uks)
+        with self._lock:
+            if not self.readonly:
+                with self._db:
+                    # derived edges are re-derived by the inference engine
+                    self._db.execute("DELETE FROM relationships WHERE inferred = 1")
+            values = dict(self._db.execute("SELECT label, value FROM things"))
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM relationships WHERE inferred = 0 ORDER BY id"
+            ).fetchall()
+            self._materialise(rows, values)
+            self._next_id = max(self._rels, default=0) + 1
+            uks.listen(self._on_relationship_event, self._on_attribute_change, self._on_usage)
+            if not self.readonly:
+                # mirror whatever the UKS held before the file was opened
+                for thing in list(uks.UKSList):
+                    for rel in thing.relationships:
+                        if id(rel) not in self._ids:
+                            self._on_relationship_event("add", rel)
+                self.flush()
+
+    def _materialise(self, rows: List[tuple], values: Optional[Dict[str, Any]] = None) -> List[Relationship]:
+        self._muted = True
+        try:
+            labels = set(values or ())
+            for row in rows:
+                labels.update(label for label in row[1:4] if label is not None)
+            for label in labels:
+                if ThingLabels.get_thing(label) is None:
+                    # like from_dict, create Things bare so stored parents win
+                    raw = (values or {}).get(label)
+                    thing = self.uks._adopt(Thing(label, json.loads(raw) if raw is not None else None))
+                    self.uks.UKSList.append(thing)
+            statements = [
+                Statement(row[1], row[2], row[3], row[4], row[5]) for row in rows
+            ]
+            rels = self.uks.load_statements(statements)
+            for row, rel in zip(rows, rels):
+                rid, _, _, _, weight, _, last_used, hits, misses, created, inferred = row
+                rel.weight = weight
+                rel.last_used = datetime.fromtimestamp(last_used)
+                rel.hits = hits
+                rel.misses = misses
+                rel.created = datetime.fromtimestamp(created)
+                self._rels[rid] = rel
+                self._ids[id(rel)] = rid
+            self.uks.note_usage(rels)
+            return rels
+        finally:
+            self._muted = False
+
+    # ------------------------------------------------------------------
+    # Write-through
+    # ------------------------------------------------------------------
+    def _on_relationship_event(self, event: str, rel: Relationship) -> None:
+        if self._muted or self.readonly:
+            return
+        with self._lock:
+            if event == "add":
+                if id(rel) not in self._ids:
+                    rid = self._next_id
+                    self._next_id += 1
+                    self._rels[rid] = rel
+                    self._ids[id(rel)] = rid
+                self._pending[id(rel)] = rel
+            else:
+                rid = self._ids.pop(id(rel), None)
+                if rid is None:
+                    return
+                del self._rels[rid]
+                self._pending.pop(id(rel), None)
+                self._deleted.append(rid)
+            self._maybe_flush()
+
+    def _on_attribute_change(self, rel: Relationship, name: str, old: object) -> None:
+        self._on_usage([rel])
+
+    def _on_usage(self, rels: List[Relationship]) -> None:
+        if self._muted or self.readonly:
+            return
+        with self._lock:
+            ids = self._ids
+            for rel in rels:
+                if id(rel) in ids:
+                    self._pending[id(rel)] = rel
+            self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if not self._depth and len(self._pending) + len(self._deleted) >= self.batch_size:
+            self.flush()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Defer writes until the outermost block exits, then commit once."""
+
+        with self._lock:
+            self._depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if not self._depth:
+                    self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if self.readonly or not (self._pending or self._deleted):
+                self._pending.clear()
+                return
+            upserts = []
+            deletes = [(rid,) for rid in self._deleted]
+            for item in self._pending.values():
+                rid = self._ids.get(id(item))
+                if rid is None:
+                    continue
+                ttl = item.time_to_live
+                upserts.append(
+                    (
+                        rid,
+                        item.source.Label,
+                        item.reltype.Label,
+                        item.target.Label if item.target is not None else None,
+                        item.weight,
+                        ttl.total_seconds() if ttl != timedelta.max else None,
+                        item.last_used.timestamp(),
+                        item.hits,
+                        item.misses,
+                        item.created.timestamp(),
+                        int(item.inferred),
+                    )
+                )
+            self._pending.clear()
+            self._deleted.clear()
+            with self._db:
+                self._db.executemany("DELETE FROM relationships WHERE id = ?", deletes)
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO relationships ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    upserts,
+                )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._rels.clear()
+            self._ids.clear()
+            self._pending.clear()
+            self._deleted.clear()
+            if not self.readonly:
+                with self._db:
+                    self._db.execute("DELETE FROM relationships")
+                    self._db.execute("DELETE FROM things")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def query(self, filters: Dict[str, Any], now: datetime) -> Optional[QueryResult]:
+        src, src_args, other, args = translate(filters, now)
+        with self._lock:
+            self.flush()
+            where = " AND ".join(src + other)
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM relationships WHERE {where} ORDER BY id", src_args + args
+            ).fetchall()
+            missed: List[tuple] = []
+            if src:
+                missed = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM relationships WHERE {' AND '.join(src)} "
+                    f"AND NOT IFNULL(({' AND '.join(other)}), 0) ORDER BY id",
+                    src_args + args,
+                ).fetchall()
+            return self._resolve(rows), self._resolve(missed)
+
+    def explain(self, filters: Dict[str, Any], now: Optional[datetime] = None) -> List[str]:
+        """Return SQLite's query plan for *filters*, e.g. to check index use."""
+
+        src, src_args, other, args = translate(filters, now or datetime.now())
+        with self._lock:
+            plan = self._db.execute(
+                f"EXPLAIN QUERY PLAN SELECT id FROM relationships WHERE {' AND '.join(src + other)}",
+                src_args + args,
+            ).fetchall()
+        return [row[-1] for row in plan]
+
+    def _resolve(self, rows: List[tuple]) -> List[Relationship]:
+        known = [self._rels.get(row[0]) for row in rows]
+        # rows written by another process since this one loaded
+        unseen = [row for row, rel in zip(rows, known) if rel is None]
+        if unseen:
+            fresh = iter(self._materialise(unseen))
+            known = [rel if rel is not None else next(fresh) for rel in known]
+        return known
+
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        with self._lock:
+            uks = getattr(self, "uks", None)
+            if uks is not None:
+                uks.unlisten(self._on_relationship_event, self._on_attribute_change, self._on_usage)
+            self.flush()
+            if not self.readonly:
+                with self._db:
+                    self._db.execute("DELETE FROM things")
+                    self._db.executemany(
+                        "INSERT INTO things (label, value) VALUES (?, ?)",
+                        (
+                            (t.Label, json.dumps(t.V) if t.V is not None else None)
+                            for t in self.uks.UKSList
+                        ),
+                    )
+            self._db.close()
+
+
+__all__ = ["StorageEngine", "MemoryEngine", "SQLiteEngine", "translate"]
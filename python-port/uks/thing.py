@@ -3,20 +3,105 @@ from __future__ import annotations
 """Thing class representing nodes in the Universal Knowledge Store."""
 
 import threading
-from datetime import timedelta
-from typing import List, Optional
+import weakref
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
 from .relationship import Relationship
 from .thing_labels import ThingLabels
 
+if TYPE_CHECKING:  # pragma: no cover
+    from .uks import UKS
+
 # Registry of transient relationships used by UKS timers
 transient_relationships: List[Relationship] = []
 
 
+def owner_of(rel: Relationship) -> Optional["UKS"]:
+    """Return the UKS holding *rel*: the owner of its source, reltype or target."""
+    for thing in (rel.source, rel.reltype, rel.target):
+        ref = getattr(thing, "_uks", None)
+        if ref is not None:
+            return ref()
+    return None
+
+
+def _notify(event: str, rel: Relationship) -> None:
+    # ``"add"`` or ``"remove"`` goes to the owning store only
+    uks = owner_of(rel)
+    if uks is not None:
+        uks._on_relationship_event(event, rel)
+
+
+def _discard(items: List[Relationship], rel: Relationship) -> None:
+    # ``remove`` rather than a membership test first, so paged adjacency
+    # lists that are not in memory do not have to be read in
+    try:
+        items.remove(rel)
+    except ValueError:
+        pass
+
+
+def remove_relationships(rels: Iterable[Relationship]) -> List[Relationship]:
+    """Detach many relationships at once.
+
+    Every adjacency list touched by *rels* is rebuilt a single time instead of
+    calling ``list.remove`` per relationship.  Returns the relationships that
+    were actually attached to their source.
+    """
+
+    doomed = {id(r): r for r in rels}
+    if not doomed:
+        return []
+    touched: Dict[Tuple[int, str], Tuple["Thing", str]] = {}
+    for r in doomed.values():
+        touched[(id(r.source), "relationships")] = (r.source, "relationships")
+        if r.target is not None:
+            touched[(id(r.target), "relationships_from")] = (r.target, "relationships_from")
+        touched[(id(r.reltype), "relationships_as_type")] = (r.reltype, "relationships_as_type")
+    removed: List[Relationship] = []
+    for owner, attr in touched.values():
+        with owner._lock:
+            current = getattr(owner, attr)
+            if attr != "relationships" and not getattr(current, "loaded", True):
+                continue  # reverse list still on disk, nothing to detach
+            if attr == "relationships":
+                removed.extend(r for r in current if id(r) in doomed)
+            current[:] = [r for r in current if id(r) not in doomed]
+    transient_relationships[:] = [r for r in transient_relationships if id(r) not in doomed]
+    for r in removed:
+        _notify("remove", r)
+    return removed
+
+
+def attach_relationship(rel: Relationship) -> None:
+    """Link an existing relationship into the adjacency lists of its Things.
+
+    Used by :meth:`Thing.add_relationship` and to restore a previously removed
+    relationship object, for example when a checkpoint is rolled back.
+    """
+
+    with rel.source._lock:
+        rel.source.relationships.append(rel)
+    if rel.target is not None:
+        with rel.target._lock:
+            rel.target.relationships_from.append(rel)
+    with rel.reltype._lock:
+        rel.reltype.relationships_as_type.append(rel)
+    if rel.time_to_live != timedelta.max:
+        transient_relationships.append(rel)
+    _notify("add", rel)
+
+
 class Thing:
+    # weak reference to the UKS holding this Thing, set when a store adopts
+    # it; relationship events are delivered to that store
+    _uks: Optional["weakref.ref[UKS]"] = None
+
     def __init__(self, label: str, value: Optional[object] = None):
         self._label = ""
         self.V = value
+        self.created = datetime.now()
         self.relationships: List[Relationship] = []
         self.relationships_from: List[Relationship] = []
         self.relationships_as_type: List[Relationship] = []
@@ -59,6 +144,7 @@ class Thing:
         target: Optional["Thing"],
         ttl: Optional[float] = None,
         weight: float = 1.0,
+        inferred: bool = False,
     ) -> Relationship:
         """Create and register a new relationship from this Thing.
 
@@ -74,18 +160,12 @@ class Thing:
         weight:
             Strength of the relationship.  Used by some modules to adjust
             confidence levels.
+        inferred:
+            Marks the relationship as entailed rather than asserted.
         """
         ttl_td = timedelta(seconds=ttl) if ttl is not None else timedelta.max
-        rel = Relationship(self, reltype, target, weight, ttl_td)
-        with self._lock:
-            self.relationships.append(rel)
-        if target is not None:
-            with target._lock:
-                target.relationships_from.append(rel)
-        with reltype._lock:
-            reltype.relationships_as_type.append(rel)
-        if ttl is not None:
-            transient_relationships.append(rel)
+        rel = Relationship(self, reltype, target, weight, ttl_td, inferred=inferred)
+        attach_relationship(rel)
         return rel
 
     def add_parent(self, parent: "Thing") -> Relationship:
@@ -103,18 +183,20 @@ class Thing:
                 break
 
     def remove_relationship(self, rel: Relationship) -> None:
+        removed = False
         with self._lock:
             if rel in self.relationships:
                 self.relationships.remove(rel)
+                removed = True
         if rel.target:
             with rel.target._lock:
-                if rel in rel.target.relationships_from:
-                    rel.target.relationships_from.remove(rel)
+                _discard(rel.target.relationships_from, rel)
         with rel.reltype._lock:
-            if rel in rel.reltype.relationships_as_type:
-                rel.reltype.relationships_as_type.remove(rel)
+            _discard(rel.reltype.relationships_as_type, rel)
         if rel in transient_relationships:
             transient_relationships.remove(rel)
+        if removed:
+            _notify("remove", rel)
 
     # ------------------------------------------------------------------
     # Relationship queries
@@ -194,6 +276,7 @@ class Thing:
         reltype = ThingLabels.get_thing(rel_label)
         if reltype is None:
             reltype = Thing(rel_label)
+            reltype._uks = self._uks
         return self.add_relationship(reltype, attribute_value)
 
     def set_property(self, property_value: "Thing") -> Relationship:
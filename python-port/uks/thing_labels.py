@@ -9,12 +9,67 @@ stored case-insensitively but the original casing is preserved on the
 """
 
 import threading
-from typing import Dict, Optional
+from typing import Dict, Iterable, List, Optional
+
+from .bloom import BloomFilter
+
+# Number of independently locked partitions of the label table.
+SHARDS = 16
 
 
 class ThingLabels:
-    _labels: Dict[str, "Thing"] = {}
-    _lock = threading.Lock()
+    """Global case-insensitive label table.
+
+    The table is split into :data:`SHARDS` dictionaries, each with its own
+    lock, so writers of different labels rarely contend.  Lookups read the
+    dictionaries without a lock; a single ``dict.get`` is atomic.
+
+    When a backing store holds Things that are not in memory, a
+    :class:`~uks.bloom.BloomFilter` of the labels it may hold decides
+    whether a missing label is worth a read from the store.  Labels that
+    were never stored are reported missing without touching it.
+    """
+
+    _shards: List[Dict[str, "Thing"]] = [{} for _ in range(SHARDS)]
+    _locks = [threading.Lock() for _ in range(SHARDS)]
+    # labels the backing store may hold; only consulted when a lookup misses
+    _bloom = BloomFilter()
+    _bloom_lock = threading.Lock()
+    # Optional store consulted for labels not currently in memory, see
+    # :class:`uks.paged.PageStore`.  It provides ``fault(key)`` returning the
+    # Thing for a lower-cased label (or ``None``) and ``touch(thing)``.
+    _backing = None
+
+    @classmethod
+    def set_backing(cls, backing: object) -> None:
+        cls._backing = backing
+
+    @classmethod
+    def remember(cls, keys: Iterable[str]) -> None:
+        """Add labels held outside the table (e.g. on disk) to the filter.
+
+        A backing store must call this before a label leaves the table.
+        """
+        with cls._bloom_lock:
+            for key in keys:
+                cls._bloom.add_hash(hash(key.lower()))
+
+    @classmethod
+    def register(cls, label: str, thing: "Thing") -> None:
+        """Map *label* to *thing* without collision handling or faulting."""
+        key = label.lower()
+        i = hash(key) % SHARDS
+        with cls._locks[i]:
+            cls._shards[i][key] = thing
+
+    @classmethod
+    def unregister(cls, label: str, thing: "Thing") -> None:
+        """Drop *label* if it still maps to *thing*."""
+        key = label.lower()
+        i = hash(key) % SHARDS
+        with cls._locks[i]:
+            if cls._shards[i].get(key) is thing:
+                del cls._shards[i][key]
 
     @classmethod
     def add_thing_label(cls, label: str, thing: "Thing") -> str:
@@ -32,8 +87,7 @@ class ThingLabels:
         # Remove any previous label associated with this Thing
         old = getattr(thing, "_label", "")
         if old:
-            with cls._lock:
-                cls._labels.pop(old.lower(), None)
+            cls.remove_thing_label(old)
 
         base = label
         cur = -1
@@ -44,32 +98,56 @@ class ThingLabels:
 
         while True:
             key = label.lower()
-            with cls._lock:
-                existing = cls._labels.get(key)
+            h = hash(key)
+            i = h % SHARDS
+            backing = cls._backing
+            if backing is not None and key not in cls._shards[i] and cls._bloom.might_contain_hash(h):
+                backing.fault(key)
+            with cls._locks[i]:
+                existing = cls._shards[i].get(key)
                 if existing is None or existing is thing:
-                    cls._labels[key] = thing
+                    cls._shards[i][key] = thing
                     return label
             cur += 1
             label = f"{base}{cur}"
 
     @classmethod
     def get_thing(cls, label: str) -> Optional["Thing"]:
-        with cls._lock:
-            return cls._labels.get(label.lower())
+        key = label.lower()
+        h = hash(key)
+        thing = cls._shards[h % SHARDS].get(key)
+        backing = cls._backing
+        if backing is not None:
+            if thing is None:
+                return backing.fault(key) if cls._bloom.might_contain_hash(h) else None
+            backing.touch(thing)
+        return thing
 
     @classmethod
     def remove_thing_label(cls, label: str) -> None:
-        with cls._lock:
-            cls._labels.pop(label.lower(), None)
+        key = label.lower()
+        i = hash(key) % SHARDS
+        with cls._locks[i]:
+            cls._shards[i].pop(key, None)
 
     @classmethod
     def clear_label_list(cls) -> None:
-        with cls._lock:
-            cls._labels.clear()
+        for lock in cls._locks:
+            lock.acquire()
+        try:
+            for shard in cls._shards:
+                shard.clear()
+            with cls._bloom_lock:
+                cls._bloom.clear()
+        finally:
+            for lock in cls._locks:
+                lock.release()
 
     @classmethod
     def labels(cls) -> Dict[str, "Thing"]:
         """Return a copy of the current label mapping."""
-        with cls._lock:
-            return dict(cls._labels)
-
+        result: Dict[str, "Thing"] = {}
+        for lock, shard in zip(cls._locks, cls._shards):
+            with lock:
+                result.update(shard)
+        return result
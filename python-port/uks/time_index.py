@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+"""Time-ordered index over a relationship timestamp attribute.
+
+:class:`TimeIndex` keeps relationships sorted by ``created`` or ``last_used``
+so that range filters in :meth:`UKS.query` can bisect straight to the matching
+slice instead of scanning the whole store.  Entries live in a list of sorted
+chunks of at most ``2 * CHUNK`` entries, so an insert shifts one chunk rather
+than the whole index and bulk loads stay ``O(n log n)``.  Timestamps usually
+only move forward, so re-indexing a touched relationship lands in the last
+chunk; the superseded entry is tombstoned and swept out once tombstones
+outnumber live entries.
+"""
+
+import bisect
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .relationship import Relationship
+
+CHUNK = 512
+
+
+class TimeIndex:
+    """Relationships ordered by the timestamp stored in ``attribute``."""
+
+    def __init__(self, attribute: str) -> None:
+        self.attribute = attribute
+        # parallel lists of chunks: timestamps and the cells holding the
+        # relationships; ``_maxes`` is the last timestamp of each chunk
+        self._times: List[List[datetime]] = []
+        self._cells: List[List[list]] = []
+        self._maxes: List[datetime] = []
+        self._cell_of: Dict[int, list] = {}
+        self._stale = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._cell_of)
+
+    def add(self, rel: Relationship) -> None:
+        with self._lock:
+            self._discard(rel)
+            ts = getattr(rel, self.attribute)
+            cell = [rel]
+            self._cell_of[id(rel)] = cell
+            if not self._times:
+                self._times.append([ts])
+                self._cells.append([cell])
+                self._maxes.append(ts)
+                return
+            c = bisect.bisect_right(self._maxes, ts)
+            if c == len(self._maxes):
+                c -= 1
+            times, cells = self._times[c], self._cells[c]
+            i = bisect.bisect_right(times, ts)
+            times.insert(i, ts)
+            cells.insert(i, cell)
+            self._maxes[c] = times[-1]
+            if len(times) > 2 * CHUNK:
+                self._times[c + 1 : c + 1] = [times[CHUNK:]]
+                self._cells[c + 1 : c + 1] = [cells[CHUNK:]]
+                del times[CHUNK:], cells[CHUNK:]
+                self._maxes[c : c + 1] = [times[-1], self._times[c + 1][-1]]
+            self._maybe_compact()
+
+    def update(self, rel: Relationship) -> None:
+        """Re-position *rel* after its timestamp changed."""
+        with self._lock:
+            if id(rel) in self._cell_of:
+                self.add(rel)
+
+    def remove(self, rel: Relationship) -> None:
+        with self._lock:
+            self._discard(rel)
+            self._maybe_compact()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._times.clear()
+            self._cells.clear()
+            self._maxes.clear()
+            self._cell_of.clear()
+            self._stale = 0
+
+    def count(self, after: Optional[datetime] = None, before: Optional[datetime] = None) -> int:
+        """Return an upper bound on the entries inside the range (tombstones included)."""
+        with self._lock:
+            (c_lo, i_lo), (c_hi, i_hi) = self._bounds(after, before)
+            if (c_lo, i_lo) >= (c_hi, i_hi):
+                return 0
+            return sum(len(t) for t in self._times[c_lo:c_hi]) - i_lo + i_hi
+
+    def range(self, after: Optional[datetime] = None, before: Optional[datetime] = None) -> List[Relationship]:
+        """Return relationships with ``after < timestamp < before`` in time order."""
+        with self._lock:
+            (c_lo, i_lo), (c_hi, i_hi) = self._bounds(after, before)
+            result: List[Relationship] = []
+            for c in range(c_lo, min(c_hi + 1, len(self._cells))):
+                lo = i_lo if c == c_lo else 0
+                hi = i_hi if c == c_hi else len(self._cells[c])
+                result.extend(cell[0] for cell in self._cells[c][lo:hi] if cell[0] is not None)
+            return result
+
+    # ------------------------------------------------------------------
+    def _bounds(
+        self, after: Optional[datetime], before: Optional[datetime]
+    ) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        # (chunk, offset) of the first entry after *after* and of the first
+        # entry at or past *before*
+        if after is None:
+            lo = (0, 0)
+        else:
+            c = bisect.bisect_right(self._maxes, after)
+            lo = (c, bisect.bisect_right(self._times[c], after)) if c < len(self._times) else (c, 0)
+        if before is None:
+            hi = (len(self._times), 0)
+        else:
+            c = bisect.bisect_left(self._maxes, before)
+            hi = (c, bisect.bisect_left(self._times[c], before)) if c < len(self._times) else (c, 0)
+        return lo, hi
+
+    def _discard(self, rel: Relationship) -> None:
+        cell = self._cell_of.pop(id(rel), None)
+        if cell is not None:
+            cell[0] = None
+            self._stale += 1
+
+    def _maybe_compact(self) -> None:
+        if self._stale > 16 and self._stale > len(self._cell_of):
+            entries = [
+                (ts, cell)
+                for times, cells in zip(self._times, self._cells)
+                for ts, cell in zip(times, cells)
+                if cell[0] is not None
+            ]
+            self._times = [[ts for ts, _ in entries[i : i + CHUNK]] for i in range(0, len(entries), CHUNK)]
+            self._cells = [[cell for _, cell in entries[i : i + CHUNK]] for i in range(0, len(entries), CHUNK)]
+            self._maxes = [times[-1] for times in self._times]
+            self._stale = 0
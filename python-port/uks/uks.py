@@ -6,12 +6,21 @@ from datetime import datetime, timedelta
 import json
 import re
 import threading
-from typing import Callable, Dict, List, Optional, Iterable, Any
+import weakref
+from typing import Callable, Dict, Iterator, List, Optional, Iterable, Any
 
-from .thing import Thing, transient_relationships
+from .thing import Thing, transient_relationships, remove_relationships
 from .relationship import Relationship, QueryRelationship
 from .thing_labels import ThingLabels
 from .statement import Statement
+from .ranked_index import RankedIndex, SCORES
+from .time_index import TimeIndex
+from .garbage import GarbagePolicy, GarbageReport, estimate_size
+from .pattern_query import PatternQuery
+from .diff import MERGE_STRATEGIES, UKSDiff, diff_tables, statement_table
+from .checkpoint import Checkpoint, UndoLog
+from .storage import MemoryEngine, StorageEngine
+from .values import ValueStore
 
 
 
@@ -23,7 +32,37 @@ class UKS:
     expired.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, engine: Optional[StorageEngine] = None) -> None:
+        # where relationships are kept besides the in-memory lists
+        self.engine = engine or MemoryEngine()
+
+        # event handlers for relationship changes
+        self._handlers: Dict[str, List[Callable[[Relationship], None]]] = {}
+        # low-level listeners of storage layers, see :meth:`listen`
+        self._relationship_listeners: List[Callable[[str, Relationship], None]] = []
+        self._attribute_listeners: List[Callable[[Relationship, str, object], None]] = []
+        self._usage_listeners: List[Callable[[List[Relationship]], None]] = []
+        # Things point back at their store through this reference, so events
+        # reach only the owning store and do not keep it alive
+        self._ref = weakref.ref(self)
+        # relationships added, and relationships whose usage counters
+        # changed, since the score and timestamp indexes were brought up to
+        # date, by id; see :meth:`_refresh_indexes`
+        self._unindexed: Dict[int, Relationship] = {}
+        self._used: Dict[int, Relationship] = {}
+        self._used_lock = threading.Lock()
+
+        # score-ordered indexes backing :meth:`top_k`
+        self._by_source = RankedIndex(lambda r: r.source)
+        self._by_reltype = RankedIndex(lambda r: r.reltype)
+        # timestamp indexes backing the time filters of :meth:`query`
+        self._time_indexes = {"created": TimeIndex("created"), "last_used": TimeIndex("last_used")}
+        # inverse operations backing :meth:`checkpoint` / :meth:`rollback`
+        self._undo = UndoLog()
+        # typed numeric and vector properties of Things
+        self.values = ValueStore()
+        self._connect()
+
         # initialise UKS list only once
         if not ThingLabels.get_thing("has-child"):
             ThingLabels.clear_label_list()
@@ -31,10 +70,9 @@ class UKS:
             self.create_initial_structure()
         else:
             # Reuse existing list if UKS already initialised
-            self.UKSList = [t for t in ThingLabels._labels.values()]
-
-        # event handlers for relationship changes
-        self._handlers: Dict[str, List[Callable[[Relationship], None]]] = {}
+            self.UKSList = self._existing_things()
+            self._rebuild_indexes()
+        self.engine.attach(self)
 
         # Start background thread for TTL processing
         self._stop_event = threading.Event()
@@ -44,6 +82,24 @@ class UKS:
     # ------------------------------------------------------------------
     # Initialization helpers
     # ------------------------------------------------------------------
+    def _connect(self) -> None:
+        """Hook for subclasses to :meth:`listen` before the store is populated."""
+
+    def _existing_things(self) -> List[Thing]:
+        things = list(ThingLabels.labels().values())
+        for thing in things:
+            # a Thing held by another live store keeps sending its events
+            # there, or that store's indexes would silently go stale
+            owner = thing._uks() if thing._uks is not None else None
+            if owner is None or owner._stop_event.is_set():
+                self._adopt(thing)
+        return things
+
+    def _adopt(self, thing: Thing) -> Thing:
+        """Make this store the one that receives *thing*'s relationship events."""
+        thing._uks = self._ref
+        return thing
+
     def create_initial_structure(self) -> None:
         # Minimal structure: root thing and required relationship types
         root = self.add_thing("Object", None)
@@ -69,19 +125,23 @@ class UKS:
     # Thing management
     # ------------------------------------------------------------------
     def add_thing(self, label: str, parent: Optional[Thing]) -> Thing:
-        thing = Thing(label)
+        thing = self._adopt(Thing(label))
         if parent is not None:
             thing.add_parent(parent)
         self.UKSList.append(thing)
+        self._undo.record_thing("thing_add", thing)
         return thing
 
-    def get_or_add_thing(self, label: str, parent: Optional[Thing] = None, value: Optional[object] = None) -> Thing:
+    def get_or_add_thing(
+        self, label: str, parent: Optional[str | Thing] = None, value: Optional[object] = None
+    ) -> Thing:
         t = ThingLabels.get_thing(label)
         if t is None:
-            t = Thing(label, value)
+            t = self._adopt(Thing(label, value))
             self.UKSList.append(t)
+            self._undo.record_thing("thing_add", t)
             if parent is not None:
-                t.add_parent(parent)
+                t.add_parent(self._thing_from_param(parent))
         return t
 
     def labeled(self, label: str) -> Optional[Thing]:
@@ -93,8 +153,84 @@ class UKS:
         for rel in list(thing.relationships_from):
             rel.source.remove_relationship(rel)
         ThingLabels.remove_thing_label(thing.Label)
+        self.values.discard(thing)
         if thing in self.UKSList:
             self.UKSList.remove(thing)
+            self._undo.record_thing("thing_remove", thing)
+
+    def delete_things(self, things: Iterable[Thing]) -> int:
+        """Delete many Things in one batch and return the relationships removed.
+
+        Adjacency lists and :attr:`UKSList` are each rebuilt once rather than
+        once per Thing as repeated :meth:`delete_thing` calls would.
+        """
+
+        doomed = {id(t): t for t in things}
+        if not doomed:
+            return 0
+        rels: List[Relationship] = []
+        for t in doomed.values():
+            rels.extend(t.relationships)
+            rels.extend(t.relationships_from)
+        removed = remove_relationships(rels)
+        for t in doomed.values():
+            ThingLabels.remove_thing_label(t.Label)
+            self.values.discard(t)
+        kept = [t for t in self.UKSList if id(t) not in doomed]
+        if self._undo.recording:
+            present = {id(t) for t in self.UKSList}
+            for t in doomed.values():
+                if id(t) in present:
+                    self._undo.record_thing("thing_remove", t)
+        self.UKSList[:] = kept
+        return len(removed)
+
+    def reparent(self, moves: Iterable[tuple]) -> int:
+        """Move many children to new parents in one batch.
+
+        *moves* holds ``(child, old_parent, new_parent)`` triples.  All old
+        ``has-child`` links are found with one scan of each old parent's
+        relationships and detached together; the new links are then added in
+        the order given, so each new parent's children keep that order.
+        Returns the number of links removed.
+        """
+
+        moves = list(moves)
+        if not moves:
+            return 0
+        has_child = self.labeled("has-child")
+        leaving: Dict[int, tuple] = {}
+        for child, old, _ in moves:
+            leaving.setdefault(id(old), (old, set()))[1].add(id(child))
+        doomed = [
+            r
+            for old, children in leaving.values()
+            for r in old.relationships
+            if r.reltype is has_child and r.target is not None and id(r.target) in children
+        ]
+        removed = remove_relationships(doomed)
+        for child, _, new in moves:
+            new.add_relationship(has_child, child)
+        return len(removed)
+
+    def collect_garbage(self, policy: Optional[GarbagePolicy] = None) -> GarbageReport:
+        """Remove orphaned and low-value Things according to *policy*.
+
+        Candidates are found from each Thing's own and reverse relationship
+        lists, so the pass is linear in the size of the store, and all
+        deletions are applied with a single :meth:`delete_things` call.
+        """
+
+        policy = policy or GarbagePolicy()
+        cutoff = datetime.now() - timedelta(seconds=policy.min_age)
+        has_child = self.labeled("has-child")
+        doomed = [t for t in list(self.UKSList) if policy.is_garbage(t, cutoff, has_child)]
+        report = GarbageReport(
+            things_removed=[t.Label for t in doomed],
+            bytes_reclaimed=sum(estimate_size(t) for t in doomed),
+        )
+        report.relationships_removed = self.delete_things(doomed)
+        return report
 
     # ------------------------------------------------------------------
     # Relationship helpers
@@ -113,17 +249,17 @@ class UKS:
 
         existing = self.get_relationship(s, rt, t)
         if existing is not None:
+            existing.inferred = False
             if weight > existing.weight:
                 existing.weight = weight
             if ttl is not None:
                 existing.time_to_live = timedelta(seconds=ttl)
                 existing.last_used = datetime.now()
+                self.note_usage([existing])
             self._fire("update", existing)
             return existing
 
-        rel = s.add_relationship(rt, t, ttl, weight)
-        self._fire("add", rel)
-        return rel
+        return s.add_relationship(rt, t, ttl, weight)
 
     def add_clause(
         self,
@@ -135,6 +271,7 @@ class UKS:
 
         ct = self._thing_from_param(clause_type)
         source_rel.add_clause(ct, target_rel)
+        self._fire("clause", source_rel)
 
     def get_relationship(
         self,
@@ -186,13 +323,16 @@ class UKS:
 
         existing = self.get_relationship(s, rt, t)
         if existing is not None:
+            promoted = existing.inferred
+            existing.inferred = False
             if weight > existing.weight:
                 existing.weight = weight
+            elif promoted:
+                # a weight change fires "update" by itself, a promotion does not
+                self._fire("update", existing)
             return existing
 
-        rel = s.add_relationship(rt, t, ttl, weight)
-        self._fire("add", rel)
-        return rel
+        return s.add_relationship(rt, t, ttl, weight)
 
     def get_all_relationships(self, sources: List[Thing], reverse: bool) -> List[Relationship]:
         """Return relationships from ``sources`` including inherited ones."""
@@ -214,10 +354,14 @@ class UKS:
     def to_dict(self) -> Dict[str, Any]:
         """Return a JSON‑serialisable representation of the entire store."""
 
-        return {
+        data = {
             "things": [{"label": t.Label, "value": t.V} for t in self.UKSList],
             "statements": [s.to_dict() for s in self.export_statements()],
         }
+        values = self.values.to_dict()
+        if values:
+            data["values"] = values
+        return data
 
     def from_dict(self, data: Dict[str, Any], *, merge: bool = False) -> None:
         """Populate the store from *data* produced by :meth:`to_dict`."""
@@ -226,16 +370,92 @@ class UKS:
             ThingLabels.clear_label_list()
             transient_relationships.clear()
             self.UKSList = []
+            self._rebuild_indexes()
+            self._undo.reset()
+            self.engine.reset()
+            self.values.clear()
 
         mapping: Dict[str, Thing] = {t.Label: t for t in self.UKSList}
         for td in data.get("things", []):
             if td["label"] not in mapping:
-                t = Thing(td["label"], td.get("value"))
+                t = self._adopt(Thing(td["label"], td.get("value")))
                 self.UKSList.append(t)
+                self._undo.record_thing("thing_add", t)
                 mapping[t.Label] = t
 
         statements = [Statement.from_dict(sd) for sd in data.get("statements", [])]
-        self.load_statements(statements)
+        if merge:
+            self.merge(statements, strategy="max_weight")
+        else:
+            self.load_statements(statements)
+        self.values.load(data.get("values", {}), ThingLabels.get_thing)
+
+    def diff(self, other: "UKS" | Dict[str, Any] | Iterable[Statement]) -> UKSDiff:
+        """Return what would turn this store's asserted statements into *other*'s.
+
+        *other* may be another :class:`UKS`, a :meth:`to_dict` snapshot or an
+        iterable of :class:`Statement` objects.
+        """
+
+        return diff_tables(statement_table(self), statement_table(other))
+
+    def merge(
+        self,
+        other: "UKS" | Dict[str, Any] | Iterable[Statement],
+        strategy: str = "union",
+    ) -> UKSDiff:
+        """Merge *other* into this store, touching only what differs.
+
+        Strategies
+        ----------
+        ``"union"``
+            Add missing statements and take *other*'s weight and TTL where
+            they differ.  Nothing is removed.
+        ``"max_weight"``
+            Add missing statements and only ever raise weights, matching
+            :meth:`add_relationship` semantics.
+        ``"replace"``
+            Make this store mirror *other*, including removals.
+
+        Returns the :class:`UKSDiff` that was applied.
+        """
+
+        if strategy not in MERGE_STRATEGIES:
+            raise ValueError(f"Unknown merge strategy: {strategy}")
+        delta = self.diff(other)
+        if strategy == "max_weight":
+            delta.changed = [
+                (old, new)
+                for old, new in delta.changed
+                if new.weight > old.weight or (new.ttl is not None and new.ttl != old.ttl)
+            ]
+        if strategy != "replace":
+            delta.removed = []
+
+        if delta.removed:
+            remove_relationships(
+                r
+                for r in (self.get_relationship(st.source, st.reltype, st.target) for st in delta.removed)
+                if r is not None
+            )
+        self.load_statements(delta.added)
+        for old, new in delta.changed:
+            rel = self.get_relationship(old.source, old.reltype, old.target)
+            if rel is None:
+                continue
+            if strategy != "max_weight" or new.weight > rel.weight:
+                rel.weight = new.weight
+            if new.ttl is None and strategy != "max_weight":
+                rel.time_to_live = timedelta.max
+                if rel in transient_relationships:
+                    transient_relationships.remove(rel)
+            elif new.ttl is not None:
+                rel.time_to_live = timedelta(seconds=new.ttl)
+                rel.last_used = datetime.now()
+                self.note_usage([rel])
+                if rel not in transient_relationships:
+                    transient_relationships.append(rel)
+        return delta
 
     def save(self, path: str) -> None:
         """Serialise the entire UKS to ``path``."""
@@ -250,23 +470,100 @@ class UKS:
             data = json.load(f)
         self.from_dict(data, merge=merge)
 
+    def transaction(self):
+        """Context manager batching storage-engine writes into one commit."""
+
+        return self.engine.transaction()
+
+    # ------------------------------------------------------------------
+    # Checkpoints
+    # ------------------------------------------------------------------
+    def checkpoint(self) -> Checkpoint:
+        """Mark the current state so it can be restored with :meth:`rollback`.
+
+        This is O(1); from now on mutations are logged until every open
+        checkpoint has been released or rolled back past.  See
+        :mod:`uks.checkpoint` for what is covered.
+        """
+
+        return self._undo.mark()
+
+    def rollback(self, cp: Checkpoint) -> int:
+        """Undo every mutation made since *cp* and return how many were undone.
+
+        *cp* remains usable; checkpoints taken after it are discarded.
+        """
+
+        return self._undo.rollback(cp, self.UKSList)
+
+    def release(self, cp: Checkpoint) -> None:
+        """Keep the changes made since *cp* and stop tracking it."""
+
+        self._undo.release(cp)
+
     # ------------------------------------------------------------------
     # Statement helpers
     # ------------------------------------------------------------------
     def export_statements(self) -> List[Statement]:
-        """Return all relationships as :class:`Statement` objects."""
+        """Return all asserted relationships as :class:`Statement` objects.
+
+        Inferred relationships are skipped; they are re-derived on load.
+        """
 
         stmts: List[Statement] = []
         for thing in self.UKSList:
             for rel in thing.relationships:
-                stmts.append(Statement.from_relationship(rel))
+                if not rel.inferred:
+                    stmts.append(Statement.from_relationship(rel))
         return stmts
 
-    def load_statements(self, statements: Iterable[Statement]) -> None:
-        """Materialise *statements* into this UKS."""
+    def load_statements(self, statements: Iterable[Statement]) -> List[Relationship]:
+        """Materialise *statements* into this UKS in one batch.
+
+        This is the bulk counterpart of :meth:`add_relationship` with the same
+        duplicate handling.  Each distinct label is resolved once and
+        duplicates are found through a per-source lookup table rather than a
+        scan of the source's relationships for every statement.  With a
+        storage engine the whole batch is written in one transaction.
+        """
 
-        for stmt in statements:
-            stmt.to_relationship(self)
+        things: Dict[str, Thing] = {}
+        tables: Dict[int, tuple] = {}
+
+        def resolve(label: str) -> Thing:
+            t = things.get(label)
+            if t is None:
+                t = things[label] = self._thing_from_param(label)
+            return t
+
+        out: List[Relationship] = []
+        with self.engine.transaction():
+            for stmt in statements:
+                s = resolve(stmt.source)
+                rt = resolve(stmt.reltype)
+                t = resolve(stmt.target) if stmt.target is not None else None
+                entry = tables.get(id(s))
+                if entry is None or entry[0] != len(s.relationships):
+                    # (re)build when the source changed behind our back
+                    entry = (len(s.relationships), {(id(r.reltype), id(r.target)): r for r in s.relationships})
+                    tables[id(s)] = entry
+                key = (id(rt), id(t))
+                rel = entry[1].get(key)
+                if rel is None:
+                    rel = s.add_relationship(rt, t, stmt.ttl, stmt.weight)
+                    entry[1][key] = rel
+                    tables[id(s)] = (len(s.relationships), entry[1])
+                else:
+                    rel.inferred = False
+                    if stmt.weight > rel.weight:
+                        rel.weight = stmt.weight
+                    if stmt.ttl is not None:
+                        rel.time_to_live = timedelta(seconds=stmt.ttl)
+                        rel.last_used = datetime.now()
+                        self.note_usage([rel])
+                    self._fire("update", rel)
+                out.append(rel)
+        return out
 
     def remove_statement(self, source: str | Thing, reltype: str | Thing, target: Optional[str | Thing]) -> None:
         rel = self.get_relationship(source, reltype, target)
@@ -289,43 +586,135 @@ class UKS:
         max_ttl: Optional[float] = None,
         include_inherited: bool = False,
         detect_conflicts: bool = False,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        last_used_after: Optional[datetime] = None,
+        last_used_before: Optional[datetime] = None,
     ) -> List[Relationship]:
-        """Return relationships matching the given filters."""
+        """Return relationships matching the given filters.
+
+        The ``created_*`` and ``last_used_*`` bounds are exclusive.  Unless
+        ``include_inherited`` is set, time-filtered queries read their
+        candidates from the timestamp indexes rather than walking every Thing,
+        so they cost time proportional to the size of the matching range, or
+        to the relationships of ``source`` when it has fewer.
+        Only the relationships a query examines have their ``last_used`` and
+        ``hits``/``misses`` updated.  On the index path these are the
+        relationships inside the time range.  Relationships outside the range
+        are not examined, so they do not count a miss, just as the
+        relationships of other Things do not when ``source`` is given.
+        A storage engine that can answer the filters itself, such as
+        :class:`~uks.storage.SQLiteEngine`, is asked first.
+        """
 
         now = datetime.now()
         results: List[Relationship] = []
         s_re = re.compile(source_regex) if source_regex else None
         rt_re = re.compile(reltype_regex) if reltype_regex else None
         tgt_re = re.compile(target_regex) if target_regex else None
-
-        for t in self.UKSList:
+        time_ranges = [
+            (name, after, before)
+            for name, after, before in (
+                ("created", created_after, created_before),
+                ("last_used", last_used_after, last_used_before),
+            )
+            if after is not None or before is not None
+        ]
+
+        def source_matches(t: Thing) -> bool:
             if source and t.Label != source:
-                continue
+                return False
             if s_re and not s_re.fullmatch(t.Label):
-                continue
-            rels = self.get_all_relationships([t], False) if include_inherited else t.relationships
-            for r in rels:
-                matched = True
-                if reltype and r.reltype.Label != reltype:
-                    matched = False
-                if matched and rt_re and not rt_re.fullmatch(r.reltype.Label):
-                    matched = False
-                if matched and target and (r.target is None or r.target.Label != target):
-                    matched = False
-                if matched and tgt_re and (r.target is None or not tgt_re.fullmatch(r.target.Label)):
-                    matched = False
-                if matched and r.weight < min_weight:
-                    matched = False
-                if matched and max_ttl is not None and r.time_to_live != timedelta.max:
-                    remaining = (r.last_used + r.time_to_live - now).total_seconds()
-                    if remaining > max_ttl:
-                        matched = False
+                return False
+            return True
+
+        def in_ranges(r: Relationship) -> bool:
+            for name, after, before in time_ranges:
+                stamp = getattr(r, name)
+                if (after is not None and stamp <= after) or (before is not None and stamp >= before):
+                    return False
+            return True
+
+        def candidates() -> Iterable[Relationship]:
+            if time_ranges and not include_inherited and self._time_indexes:
+                if source:
+                    thing = ThingLabels.get_thing(source)
+                    if thing is None or not source_matches(thing):
+                        return
+                self._refresh_indexes()
+                size, name, after, before = min(
+                    (self._time_indexes[name].count(after, before), name, after, before)
+                    for name, after, before in time_ranges
+                )
+                if source and len(thing.relationships) < size:
+                    # the source's own relationships are the smaller set
+                    yield from (r for r in list(thing.relationships) if in_ranges(r))
+                    return
+                for r in self._time_indexes[name].range(after, before):
+                    if source_matches(r.source):
+                        yield r
+                return
+            for t in self.UKSList:
+                if not source_matches(t):
+                    continue
+                yield from (self.get_all_relationships([t], False) if include_inherited else t.relationships)
+
+        stored = None
+        if not include_inherited:
+            stored = self.engine.query(
+                {
+                    "source": source,
+                    "reltype": reltype,
+                    "target": target,
+                    "source_regex": source_regex,
+                    "reltype_regex": reltype_regex,
+                    "target_regex": target_regex,
+                    "min_weight": min_weight,
+                    "max_ttl": max_ttl,
+                    "created_after": created_after,
+                    "created_before": created_before,
+                    "last_used_after": last_used_after,
+                    "last_used_before": last_used_before,
+                },
+                now,
+            )
+        if stored is not None:
+            matches, misses = stored
+            for r in matches:
                 r.last_used = now
-                if matched:
-                    r.hits += 1
-                    results.append(r)
-                else:
-                    r.misses += 1
+                r.hits += 1
+            for r in misses:
+                r.last_used = now
+                r.misses += 1
+            results = matches
+            self.note_usage(matches + misses)
+
+        touched = list(candidates()) if stored is None else []
+        for r in touched:
+            matched = True
+            if reltype and r.reltype.Label != reltype:
+                matched = False
+            if matched and rt_re and not rt_re.fullmatch(r.reltype.Label):
+                matched = False
+            if matched and target and (r.target is None or r.target.Label != target):
+                matched = False
+            if matched and tgt_re and (r.target is None or not tgt_re.fullmatch(r.target.Label)):
+                matched = False
+            if matched and r.weight < min_weight:
+                matched = False
+            if matched and max_ttl is not None and r.time_to_live != timedelta.max:
+                remaining = (r.last_used + r.time_to_live - now).total_seconds()
+                if remaining > max_ttl:
+                    matched = False
+            if matched and not in_ranges(r):
+                matched = False
+            r.last_used = now
+            if matched:
+                r.hits += 1
+                results.append(r)
+            else:
+                r.misses += 1
+        self.note_usage(touched)
 
         if detect_conflicts:
             conflicts: List[Relationship] = []
@@ -342,19 +731,188 @@ class UKS:
 
         return [QueryRelationship.from_relationship(r) for r in results]
 
+    def match(self, patterns: Iterable[tuple]) -> Iterator[Dict[str, Thing]]:
+        """Stream variable bindings satisfying every triple in *patterns*.
+
+        See :class:`~uks.pattern_query.PatternQuery` for the pattern syntax and
+        how the join order is chosen.
+        """
+
+        return iter(PatternQuery(self, patterns))
+
+    def top_k(
+        self,
+        *,
+        source: Optional[str | Thing] = None,
+        reltype: Optional[str | Thing] = None,
+        k: int = 10,
+        by: str = "value",
+    ) -> List[Relationship]:
+        """Return the *k* strongest relationships of *source* and/or *reltype*.
+
+        Relationships are ordered by ``Relationship.value`` or, with
+        ``by="weight"``, by their raw weight.  The answer comes from indexes
+        maintained as relationships are added, removed or re-weighted, so no
+        scan of the store is needed.  When both filters are given the smaller
+        of the two groups is walked and filtered by the other.
+        """
+
+        if by not in SCORES:
+            raise ValueError(f"Unknown ordering: {by}")
+        if source is None and reltype is None:
+            raise ValueError("top_k requires a source or a reltype")
+        s = source if isinstance(source, Thing) or source is None else ThingLabels.get_thing(source)
+        rt = reltype if isinstance(reltype, Thing) or reltype is None else ThingLabels.get_thing(reltype)
+        if (source is not None and s is None) or (reltype is not None and rt is None):
+            return []
+        self._refresh_indexes()
+        return self._top(s, rt, k, by)
+
+    def _top(self, s: Optional[Thing], rt: Optional[Thing], k: int, by: str) -> List[Relationship]:
+        if rt is None:
+            return self._by_source.top(s, k, by)
+        if s is None:
+            return self._by_reltype.top(rt, k, by)
+        if self._by_source.size(s) <= self._by_reltype.size(rt):
+            return self._by_source.top(s, k, by, lambda r: r.reltype is rt)
+        return self._by_reltype.top(rt, k, by, lambda r: r.source is s)
+
     # ------------------------------------------------------------------
     # Event hooks
     # ------------------------------------------------------------------
     def on(self, event: str, callback: Callable[[Relationship], None]) -> None:
         self._handlers.setdefault(event, []).append(callback)
 
+    def off(self, event: str, callback: Callable[[Relationship], None]) -> None:
+        handlers = self._handlers.get(event, [])
+        if callback in handlers:
+            handlers.remove(callback)
+
+    def listen(
+        self,
+        relationship: Optional[Callable[[str, Relationship], None]] = None,
+        attribute: Optional[Callable[[Relationship, str, object], None]] = None,
+        usage: Optional[Callable[[List[Relationship]], None]] = None,
+    ) -> None:
+        """Register low-level listeners, as used by storage layers.
+
+        *relationship* is called as ``cb(event, rel)`` for every ``"add"`` and
+        ``"remove"`` on a Thing of this store, *attribute* as
+        ``cb(rel, name, old)`` when ``weight``, ``created``, ``time_to_live``
+        or ``inferred`` changes, and *usage* once per batch of relationships
+        whose ``hits``, ``misses`` or ``last_used`` changed.
+        """
+
+        for listeners, cb in (
+            (self._relationship_listeners, relationship),
+            (self._attribute_listeners, attribute),
+            (self._usage_listeners, usage),
+        ):
+            if cb is not None:
+                listeners.append(cb)
+
+    def unlisten(
+        self,
+        relationship: Optional[Callable[[str, Relationship], None]] = None,
+        attribute: Optional[Callable[[Relationship, str, object], None]] = None,
+        usage: Optional[Callable[[List[Relationship]], None]] = None,
+    ) -> None:
+        for listeners, cb in (
+            (self._relationship_listeners, relationship),
+            (self._attribute_listeners, attribute),
+            (self._usage_listeners, usage),
+        ):
+            if cb is not None and cb in listeners:
+                listeners.remove(cb)
+
+    def note_usage(self, rels: List[Relationship]) -> None:
+        """Record that the ``hits``, ``misses`` or ``last_used`` of *rels* changed.
+
+        :meth:`query` calls this for the relationships it touched; code that
+        changes the counters directly should too.  The score and ``last_used``
+        indexes catch up the next time :meth:`top_k` or a time filtered
+        query reads them.
+        """
+
+        if not rels:
+            return
+        with self._used_lock:
+            self._used.update((id(r), r) for r in rels)
+        for cb in self._usage_listeners:
+            cb(rels)
+
+    def _refresh_indexes(self) -> None:
+        # index the relationships added since the last refresh and re-score
+        # the used ones; holding the lock keeps a concurrent removal from
+        # slipping in between
+        with self._used_lock:
+            added, self._unindexed = self._unindexed, {}
+            used, self._used = self._used, {}
+            for rel in added.values():
+                self._by_source.add(rel)
+                self._by_reltype.add(rel)
+                for index in self._time_indexes.values():
+                    index.add(rel)
+            last_used = self._time_indexes.get("last_used")
+            for key, rel in used.items():
+                if key in added:
+                    continue
+                self._by_source.update(rel, "hits")
+                self._by_reltype.update(rel, "hits")
+                if last_used is not None:
+                    last_used.update(rel)
+
     def _fire(self, event: str, rel: Relationship) -> None:
         for cb in self._handlers.get(event, []):
             cb(rel)
 
+    def _on_relationship_event(self, event: str, rel: Relationship) -> None:
+        self._undo.record_relationship(event, rel)
+        if event == "add":
+            self._index_relationship(rel)
+        elif event == "remove":
+            with self._used_lock:
+                self._unindexed.pop(id(rel), None)
+                self._used.pop(id(rel), None)
+                self._by_source.remove(rel)
+                self._by_reltype.remove(rel)
+                for index in self._time_indexes.values():
+                    index.remove(rel)
+        for cb in self._relationship_listeners:
+            cb(event, rel)
+        self._fire(event, rel)
+
+    def _on_attribute_change(self, rel: Relationship, name: str, old: object) -> None:
+        self._undo.record_attribute(rel, name, old)
+        if name == "weight":
+            self._by_source.update(rel, name)
+            self._by_reltype.update(rel, name)
+        elif name in self._time_indexes:
+            self._time_indexes[name].update(rel)
+        for cb in self._attribute_listeners:
+            cb(rel, name, old)
+        if name in ("weight", "time_to_live"):
+            self._fire("update", rel)
+
+    def _index_relationship(self, rel: Relationship) -> None:
+        # indexed by the next :meth:`_refresh_indexes`, so adding stays cheap
+        with self._used_lock:
+            self._unindexed[id(rel)] = rel
+
+    def _rebuild_indexes(self) -> None:
+        with self._used_lock:
+            self._unindexed.clear()
+            self._used.clear()
+            self._by_source.clear()
+            self._by_reltype.clear()
+            for index in self._time_indexes.values():
+                index.clear()
+        for thing in self.UKSList:
+            for rel in thing.relationships:
+                self._index_relationship(rel)
+
     def remove_relationship(self, rel: Relationship) -> None:
         rel.source.remove_relationship(rel)
-        self._fire("remove", rel)
 
     def _thing_from_param(self, param: str | Thing) -> Thing:
         if isinstance(param, Thing):
@@ -368,6 +926,7 @@ class UKS:
     # Shutdown
     # ------------------------------------------------------------------
     def shutdown(self) -> None:
-        """Stop the background TTL pruning thread."""
+        """Stop the background TTL pruning thread and close the storage engine."""
         self._stop_event.set()
         self._thread.join()
+        self.engine.close()
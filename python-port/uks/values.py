@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+"""Typed value columns for Things.
+
+``Thing.V`` holds one arbitrary object.  Perceptual modules, however, attach
+several numeric properties to a Thing (an area, an angle, a colour vector)
+and historically turned each value into a new Thing labelled
+``str(value)``.  :class:`ValueStore` keeps such properties in NumPy columns
+instead:
+
+* every Thing that has a value gets a dense slot number;
+* each named property is a :class:`ValueColumn` of kind ``"float"``,
+  ``"int"`` or ``"vector"`` (fixed width) stored as one array indexed by
+  slot, with a mask of which slots are set;
+* range and nearest-neighbour queries compare whole columns at once.
+
+An ``"int"`` column is widened to ``"float"`` the first time a float is
+written to it.
+
+Values are not relationships and raise no UKS events, so they are outside
+the change tracking of the store: :meth:`UKS.checkpoint` /
+:meth:`UKS.rollback` leave them as they are, a
+:class:`~uks.change_feed.ChangeFeed` does not report them and
+:meth:`UKS.diff` does not compare them.  They are saved and restored with
+:meth:`UKS.to_dict` / :meth:`UKS.from_dict`.
+
+NumPy is an optional dependency of the UKS; it is only needed once a typed
+value is stored.  Without it :attr:`ValueStore.enabled` is ``False`` and
+callers keep such properties as relationships to value Things.
+"""
+
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:  # optional vectorised storage
+    import numpy as np  # type: ignore
+    _HAVE_NUMPY = True
+except Exception:  # pragma: no cover - optional dependency
+    _HAVE_NUMPY = False
+
+from .thing import Thing
+
+KINDS = ("float", "int", "vector")
+
+_INITIAL_CAPACITY = 64
+
+
+def infer_kind(value: Any) -> Tuple[str, Optional[int]]:
+    """Return the column ``(kind, width)`` that suits *value*."""
+
+    if isinstance(value, bool):
+        raise TypeError("boolean values are not supported; use a relationship")
+    if isinstance(value, int) or (_HAVE_NUMPY and isinstance(value, np.integer)):
+        return "int", None
+    if isinstance(value, float) or (_HAVE_NUMPY and isinstance(value, np.floating)):
+        return "float", None
+    if isinstance(value, (list, tuple)) or (_HAVE_NUMPY and isinstance(value, np.ndarray)):
+        return "vector", len(value)
+    raise TypeError(f"Cannot store {type(value).__name__} in a typed value column")
+
+
+class ValueColumn:
+    """One property stored for many Things."""
+
+    def __init__(self, name: str, kind: str, width: Optional[int] = None) -> None:
+        if not _HAVE_NUMPY:
+            raise RuntimeError("typed value columns require numpy")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown value kind: {kind}")
+        if kind == "vector" and not width:
+            raise ValueError("vector columns need a width")
+        self.name = name
+        self.kind = kind
+        self.width = width if kind == "vector" else None
+        dtype = np.int64 if kind == "int" else np.float64
+        shape = (_INITIAL_CAPACITY, width) if kind == "vector" else (_INITIAL_CAPACITY,)
+        self.data = np.zeros(shape, dtype=dtype)
+        self.present = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+
+    def __len__(self) -> int:
+        return int(self.present.sum())
+
+    def _grow(self, slot: int) -> None:
+        size = len(self.present)
+        if slot < size:
+            return
+        while size <= slot:
+            size *= 2
+        data = np.zeros((size,) + self.data.shape[1:], dtype=self.data.dtype)
+        data[: len(self.data)] = self.data
+        present = np.zeros(size, dtype=bool)
+        present[: len(self.present)] = self.present
+        self.data, self.present = data, present
+
+    def set(self, slot: int, value: Any) -> None:
+        kind, width = infer_kind(value)
+        if self.kind == "int" and kind == "float":
+            self.data = self.data.astype(np.float64)
+            self.kind = "float"
+        elif kind != self.kind and not (self.kind == "float" and kind == "int"):
+            raise TypeError(f"{self.name} holds {self.kind} values, not {kind}")
+        if width != self.width:
+            raise ValueError(f"{self.name} holds vectors of width {self.width}, not {width}")
+        self._grow(slot)
+        self.data[slot] = value
+        self.present[slot] = True
+
+    def get(self, slot: int) -> Any:
+        if slot >= len(self.present) or not self.present[slot]:
+            return None
+        value = self.data[slot]
+        return value.copy() if self.kind == "vector" else value.item()
+
+    def discard(self, slot: int) -> None:
+        if slot < len(self.present):
+            self.present[slot] = False
+
+    def between(self, low: Optional[float] = None, high: Optional[float] = None) -> "np.ndarray":
+        """Return slots whose value lies in ``[low, high]``.
+
+        Vector columns compare their Euclidean norm.
+        """
+
+        if self.kind == "vector":
+            values = np.linalg.norm(self.data, axis=1)
+        else:
+            values = self.data
+        mask = self.present.copy()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return np.flatnonzero(mask)
+
+    def nearest(self, value: Any, k: int = 1) -> List[Tuple[int, float]]:
+        """Return up to *k* ``(slot, distance)`` pairs closest to *value*."""
+
+        slots = np.flatnonzero(self.present)
+        if not len(slots) or k <= 0:
+            return []
+        target = np.asarray(value, dtype=np.float64)
+        rows = self.data[slots].astype(np.float64)
+        if self.kind == "vector":
+            dist = np.linalg.norm(rows - target, axis=1)
+        else:
+            dist = np.abs(rows - target)
+        k = min(k, len(slots))
+        best = np.argpartition(dist, k - 1)[:k]
+        best = best[np.argsort(dist[best], kind="stable")]
+        return [(int(slots[i]), float(dist[i])) for i in best]
+
+
+class ValueStore:
+    """Named :class:`ValueColumn` objects sharing one slot per Thing."""
+
+    def __init__(self) -> None:
+        # typed columns need numpy
+        self.enabled = _HAVE_NUMPY
+        self.columns: Dict[str, ValueColumn] = {}
+        self._slots: Dict[int, int] = {}
+        self._things: List[Optional[Thing]] = []
+        self._free: List[int] = []
+        self._lock = threading.RLock()
+
+    def define(self, name: str, kind: str, width: Optional[int] = None) -> ValueColumn:
+        """Create column *name* up front instead of inferring it on first use."""
+
+        with self._lock:
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = ValueColumn(name, kind, width)
+            elif (column.kind, column.width) != (kind, width if kind == "vector" else None):
+                # an int column may already have been widened to float
+                if (column.kind, kind) != ("float", "int"):
+                    raise ValueError(f"{name} already holds {column.kind} values")
+            return column
+
+    def _slot(self, thing: Thing, create: bool = False) -> Optional[int]:
+        slot = self._slots.get(id(thing))
+        if slot is None and create:
+            if self._free:
+                slot = self._free.pop()
+                self._things[slot] = thing
+            else:
+                slot = len(self._things)
+                self._things.append(thing)
+            self._slots[id(thing)] = slot
+        return slot
+
+    def set(self, thing: Thing, name: str, value: Any) -> None:
+        with self._lock:
+            column = self.columns.get(name)
+            if column is None:
+                kind, width = infer_kind(value)
+                column = self.define(name, kind, width)
+            column.set(self._slot(thing, create=True), value)
+
+    def get(self, thing: Thing, name: str) -> Any:
+        with self._lock:
+            slot = self._slot(thing)
+            column = self.columns.get(name)
+            if slot is None or column is None:
+                return None
+            return column.get(slot)
+
+    def items(self, thing: Thing) -> Dict[str, Any]:
+        """Return every typed value stored for *thing*."""
+
+        with self._lock:
+            slot = self._slot(thing)
+            if slot is None:
+                return {}
+            values = {name: column.get(slot) for name, column in self.columns.items()}
+            return {name: v for name, v in values.items() if v is not None}
+
+    def discard(self, thing: Thing) -> None:
+        """Forget all values of *thing*, e.g. when it is deleted."""
+
+        with self._lock:
+            slot = self._slots.pop(id(thing), None)
+            if slot is None:
+                return
+            for column in self.columns.values():
+                column.discard(slot)
+            self._things[slot] = None
+            self._free.append(slot)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.columns.clear()
+            self._slots.clear()
+            self._things.clear()
+            self._free.clear()
+
+    def range(self, name: str, low: Optional[float] = None, high: Optional[float] = None) -> List[Thing]:
+        """Return Things whose *name* value lies in ``[low, high]``."""
+
+        with self._lock:
+            column = self.columns.get(name)
+            if column is None:
+                return []
+            return [self._things[slot] for slot in column.between(low, high)]
+
+    def nearest(self, name: str, value: Any, k: int = 1) -> List[Tuple[Thing, float]]:
+        """Return up to *k* ``(thing, distance)`` pairs closest to *value*."""
+
+        with self._lock:
+            column = self.columns.get(name)
+            if column is None:
+                return []
+            return [(self._things[slot], dist) for slot, dist in column.nearest(value, k)]
+
+    def __iter__(self) -> Iterator[Tuple[Thing, str, Any]]:
+        with self._lock:
+            rows = []
+            for name, column in self.columns.items():
+                for slot in np.flatnonzero(column.present):
+                    rows.append((self._things[slot], name, column.get(int(slot))))
+        return iter(rows)
+
+    # ------------------------------------------------------------------
+    # Serialisation
+    # ------------------------------------------------------------------
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for thing, name, value in self:
+            out.setdefault(name, {})[thing.Label] = value.tolist() if hasattr(value, "tolist") else value
+        return out
+
+    def load(self, data: Dict[str, Dict[str, Any]], resolve) -> None:
+        """Restore values from :meth:`to_dict` output using *resolve(label)*."""
+
+        for name, values in data.items():
+            for label, value in values.items():
+                thing = resolve(label)
+                if thing is not None:
+                    self.set(thing, name, value)
+
+
+__all__ = ["KINDS", "ValueColumn", "ValueStore", "infer_kind"]